@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Measure the import time of jirax modules against a budget.
+
+Run ``python -X importtime`` in a fresh interpreter for each module, report
+its cumulative import time, and fail if it exceeds the budget or if the
+import pulled in `jira.resources`.
+
+Usage::
+
+    python benchmarks/import_time.py [--budget MS] [--runs N] [MODULE ...]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+DEFAULT_MODULES = ['jirax.webhook']
+DEFAULT_BUDGET_MS = 30
+"""Target cumulative import time budget, in milliseconds."""
+
+FORBIDDEN_MODULES = ['jira.resources', 'requests']
+"""Modules that must not be imported eagerly by jirax."""
+
+_LINE_RE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)$')
+
+
+def measure(module):
+    """Import *module* in a fresh interpreter.
+
+    :param module: the module name.
+    :type module: `str`
+    :return: the cumulative import time in microseconds, and the names of all
+        modules imported along the way.
+    :rtype: `tuple`
+    """
+    result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             'import {}'.format(module)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True)
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match is None:
+            continue
+        name = match.group(4)
+        imported.add(name)
+        if name == module:
+            cumulative = int(match.group(2))
+    if cumulative is None:
+        raise RuntimeError("{} not found in -X importtime output"
+                           .format(module))
+    return cumulative, imported
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS,
+                        help="budget in milliseconds (default: %(default)s)")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="runs per module; the best is reported "
+                             "(default: %(default)s)")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    args = parser.parse_args()
+    ok = True
+    for module in args.modules:
+        best = None
+        for _ in range(args.runs):
+            cumulative, imported = measure(module)
+            best = cumulative if best is None else min(best, cumulative)
+        best_ms = best / 1000
+        status = "ok" if best_ms <= args.budget else "OVER BUDGET"
+        print("{}: {:.1f} ms (budget {:.1f} ms) {}"
+              .format(module, best_ms, args.budget, status))
+        ok = ok and best_ms <= args.budget
+        for name in FORBIDDEN_MODULES:
+            if name in imported:
+                print("{}: eagerly imports {}".format(module, name))
+                ok = False
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
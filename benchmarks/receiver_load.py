@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Load-test the multi-worker webhook receiver on this machine.
+
+Start a `jirax.receiver.MultiWorkerReceiver` on a free local port, post a
+sample issue updated webhook from several client threads over keep-alive
+connections, and report the request rate and receiver counters.
+
+Usage::
+
+    python benchmarks/receiver_load.py [--workers N] [--clients N]
+                                       [--requests N]
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+
+from jirax.receiver import MultiWorkerReceiver
+
+SAMPLE_EVENT = {
+    'webhookEvent': 'jira:issue_updated',
+    'timestamp': 1525698237764,
+    'user': {'self': 'https://example.atlassian.net/rest/api/2/user?'
+                     'accountId=5b10ac8d82e05b22cc7d4ef5',
+             'accountId': '5b10ac8d82e05b22cc7d4ef5'},
+    'issue': {'self': 'https://example.atlassian.net/rest/api/2/issue/10001',
+              'id': '10001', 'key': 'TEST-1',
+              'fields': {'status': {'name': 'Done'}}},
+    'changelog': {'id': '10100', 'items': [
+        {'field': 'status', 'fieldId': 'status', 'fieldtype': 'jira',
+         'from': '1', 'fromString': 'Open', 'to': '3', 'toString': 'Done'}]},
+}
+
+
+def handle(event):
+    """Discard the event."""
+
+
+def client(port, requests, body, errors):
+    """Post *body* *requests* times over one connection."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    for _ in range(requests):
+        connection.request('POST', '/', body, headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 204:
+            errors.append(response.status)
+    connection.close()
+
+
+def main():
+    """Run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=None,
+                        help="receiver worker processes (default: CPUs)")
+    parser.add_argument('--clients', type=int, default=16,
+                        help="client threads (default: %(default)s)")
+    parser.add_argument('--requests', type=int, default=2000,
+                        help="requests per client (default: %(default)s)")
+    args = parser.parse_args()
+    receiver = MultiWorkerReceiver(handler=handle, host='127.0.0.1', port=0,
+                                   workers=args.workers)
+    receiver.start()
+    supervisor = threading.Thread(target=receiver.run)
+    supervisor.start()
+    time.sleep(0.5)
+    body = json.dumps(SAMPLE_EVENT).encode()
+    errors = []
+    clients = [threading.Thread(target=client,
+                                args=(receiver.port, args.requests, body,
+                                      errors))
+               for _ in range(args.clients)]
+    start = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    receiver.stop()
+    supervisor.join()
+    total = args.clients * args.requests
+    print("{} requests in {:.2f} s: {:.0f} requests/s, {} errors"
+          .format(total, elapsed, total / elapsed, len(errors)))
+    for index, metrics in enumerate(receiver.worker_metrics()):
+        print("worker {}: {}".format(index, metrics))
+    print("total: {}".format(receiver.metrics()))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
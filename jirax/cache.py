@@ -0,0 +1,531 @@
+"""Caches fed by Jira webhook events."""
+
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from collections.abc import Mapping
+import json
+import logging
+import re
+from threading import RLock
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .raw import InvalidRawData, RawFieldValueError, raw_to_jira_resource
+from .util import atomic_open, check_type
+from .webhook import (WithIssue, IssueDeletedEvent, IssueUpdatedEvent,
+                      CommentEvent, CommentDeletedEvent, WorklogEvent,
+                      WorklogDeletedEvent, IssueLinkEvent, UserEvent,
+                      UserDeletedEvent, ProjectEvent, ProjectDeletedEvent,
+                      BoardEvent, BoardDeletedEvent)
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+_issue_from_raw = raw_to_jira_resource('Issue')
+
+_ISSUE_ID_IN_URL_RE = re.compile(r'/issue/(\d+)/')
+
+_STRING_FIELDS = frozenset({'summary', 'description', 'environment'})
+"""Fields whose value is the changelog string."""
+
+
+def _apply_field_change(fields, change):
+    """Apply a `.changelog.FieldChange` to raw issue fields.
+
+    Only fields with a scalar value that the changelog carries in full are
+    supported: `_STRING_FIELDS` and ``labels``.  Other fields, such as
+    statuses or users, are resources whose other subfields (and, on Jira
+    Server, the user account ID) the changelog lacks.
+
+    :return: whether the change could be applied.
+    :rtype: `bool`
+    """
+    key = change.id
+    new = change.new
+    if key == 'labels':
+        fields[key] = list(new.decoded)
+    elif key in _STRING_FIELDS:
+        fields[key] = new.str
+    else:
+        return False
+    return True
+
+
+def _replace_in_list(fields, field, list_name, item, delete):
+    """Add, replace or delete *item* by ID in ``fields[field][list_name]``.
+
+    Copy ``fields[field]`` first, so that it may be shared with other raw
+    data.
+    """
+    container = fields.get(field)
+    if not isinstance(container, Mapping) or list_name not in container:
+        return
+    container = fields[field] = dict(container)
+    items = [existing for existing in container[list_name]
+             if existing.get('id') != item.get('id')]
+    if not delete:
+        items.append(item)
+    container[list_name] = items
+    if 'total' in container:
+        container['total'] = len(items)
+
+
+def _update_comments(fields, comment, delete):
+    _replace_in_list(fields, 'comment', 'comments', comment.raw, delete)
+
+
+def _update_worklogs(fields, worklog, delete):
+    _replace_in_list(fields, 'worklog', 'worklogs', worklog.raw, delete)
+
+
+class IssueCache(CtorRepr):
+    """Local cache of Jira issues, kept up to date by webhook events.
+
+    Feed every webhook event to `apply()`:
+
+    - Issue created and updated events store the issue, merging its raw
+      fields over those of the cached issue.  If the payload carries no
+      ``fields``, the changelog is applied to the cached fields instead.
+      Only changes to plain text fields and labels can be applied this way;
+      any other change evicts the issue.
+    - Issue deleted events evict the issue.
+    - Comment and worklog events update the comment and worklog lists of
+      the cached issue, if it has them.
+    - Issue link events evict both linked issues, as their payload does not
+      carry enough to update the cached links.
+
+    :param max_size:
+        the maximum number of issues to keep, evicting the least recently
+        used ones; if `None` (default), the cache is unbounded.
+    :type max_size: `int`
+    """
+
+    def __init__(self, *poargs, max_size=None, **kwargs):
+        """Initialize this instance."""
+        check_type(max_size, (int, 'NoneType'))
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size {!r} is not positive"
+                             .format(max_size))
+        super().__init__(*poargs, **kwargs)
+        self.__max_size = max_size
+        self.__issues = OrderedDict()
+        self.__ids_by_key = {}
+        self.__lock = RLock()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        if self.__max_size is not None:
+            kwargs.update(max_size=self.__max_size)
+
+    @property
+    def max_size(self):  # noqa: D401
+        """The maximum number of issues to keep, if any."""
+        return self.__max_size
+
+    def __len__(self):
+        """Return the number of cached issues."""
+        return len(self.__issues)
+
+    def __contains__(self, id_or_key):
+        """Return whether the given issue is cached."""
+        return self.__resolve(id_or_key) in self.__issues
+
+    def __resolve(self, id_or_key):
+        id_or_key = str(id_or_key)
+        return self.__ids_by_key.get(id_or_key, id_or_key)
+
+    def get(self, id_or_key, default=None):
+        """Return a cached issue.
+
+        :param id_or_key: the issue ID or key.
+        :return: the issue (`~jira.resources.Issue`), or *default*.
+        """
+        with self.__lock:
+            issue_id = self.__resolve(id_or_key)
+            try:
+                issue = self.__issues[issue_id]
+            except KeyError:
+                return default
+            self.__issues.move_to_end(issue_id)
+            return issue
+
+    def put(self, issue):
+        """Store an issue, replacing any cached one.
+
+        :param issue: the issue.
+        :type issue: `~jira.resources.Issue`
+        """
+        issue_id = str(issue.raw['id'])
+        with self.__lock:
+            previous = self.__issues.get(issue_id)
+            if previous is not None:
+                self.__ids_by_key.pop(previous.raw.get('key'), None)
+            self.__issues[issue_id] = issue
+            self.__issues.move_to_end(issue_id)
+            key = issue.raw.get('key')
+            if key is not None:
+                self.__ids_by_key[key] = issue_id
+            if self.__max_size is not None:
+                while len(self.__issues) > self.__max_size:
+                    _, evicted = self.__issues.popitem(last=False)
+                    self.__ids_by_key.pop(evicted.raw.get('key'), None)
+
+    def evict(self, id_or_key):
+        """Evict an issue, if cached.
+
+        :param id_or_key: the issue ID or key.
+        :return: the evicted issue, if any; otherwise `None`.
+        """
+        with self.__lock:
+            issue = self.__issues.pop(self.__resolve(id_or_key), None)
+            if issue is not None:
+                self.__ids_by_key.pop(issue.raw.get('key'), None)
+            return issue
+
+    def clear(self):
+        """Evict all issues."""
+        with self.__lock:
+            self.__issues.clear()
+            self.__ids_by_key.clear()
+
+    def apply(self, event):
+        """Update the cache from a webhook event.
+
+        Events of other types are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        with self.__lock:
+            if isinstance(event, IssueDeletedEvent):
+                self.evict(event.issue.raw['id'])
+            elif isinstance(event, WithIssue):
+                self.__apply_issue(event)
+            elif isinstance(event, CommentEvent):
+                self.__apply_comment(
+                        event.comment,
+                        delete=isinstance(event, CommentDeletedEvent))
+            elif isinstance(event, WorklogEvent):
+                self.__apply_worklog(
+                        event.worklog,
+                        delete=isinstance(event, WorklogDeletedEvent))
+            elif isinstance(event, IssueLinkEvent):
+                self.evict(event.issue_link.source)
+                self.evict(event.issue_link.destination)
+
+    def __apply_issue(self, event):
+        raw = event.issue.raw
+        cached = self.get(raw['id'])
+        if cached is None:
+            if 'fields' in raw:
+                self.put(event.issue)
+            return
+        merged = dict(cached.raw)
+        merged.update((name, value) for name, value in raw.items()
+                      if name != 'fields')
+        fields = dict(cached.raw.get('fields') or {})
+        if 'fields' in raw:
+            fields.update(raw['fields'])
+        elif isinstance(event, IssueUpdatedEvent) and event.change is not None:
+            for key in event.change.fields:
+                try:
+                    applied = _apply_field_change(fields,
+                                                  event.change.fields[key])
+                except (InvalidRawData, RawFieldValueError):
+                    applied = False
+                if not applied:
+                    logger.debug("cannot apply change to field %s, "
+                                 "evicting issue %s", key, raw['id'])
+                    self.evict(raw['id'])
+                    return
+        merged['fields'] = fields
+        if isinstance(event, IssueUpdatedEvent) and event.comment is not None:
+            _update_comments(fields, event.comment, delete=False)
+        self.put(_issue_from_raw(merged))
+
+    def __update_fields(self, issue_id, update):
+        cached = self.get(issue_id)
+        if cached is None:
+            return
+        merged = dict(cached.raw)
+        fields = merged['fields'] = dict(merged.get('fields') or {})
+        update(fields)
+        self.put(_issue_from_raw(merged))
+
+    def __apply_comment(self, comment, delete):
+        match = _ISSUE_ID_IN_URL_RE.search(comment.raw.get('self', ''))
+        if match is None:
+            return
+
+        self.__update_fields(
+                match.group(1),
+                lambda fields: _update_comments(fields, comment, delete))
+
+    def __apply_worklog(self, worklog, delete):
+        issue_id = worklog.raw.get('issueId')
+        if issue_id is None:
+            return
+
+        self.__update_fields(
+                issue_id,
+                lambda fields: _update_worklogs(fields, worklog, delete))
+
+
+class ResourceDirectory(CtorRepr, metaclass=ABCMeta):
+    """In-memory directory of Jira resources, kept up to date by events.
+
+    Resources are indexed by ID, by key (if the resource type has one), and
+    by case-insensitive name for prefix search.  The directory can be saved
+    to and warm-started from a JSON snapshot file.
+
+    Subclasses define the resource type, the events they consume and the raw
+    fields used for indexing.
+    """
+
+    RESOURCE_TYPE = None
+    """The Jira resource type name, e.g. ``'User'``."""
+
+    EVENT_TYPE = None
+    """The webhook event base class consumed by `apply()`."""
+
+    DELETED_EVENT_TYPE = None
+    """The webhook event class that removes a resource."""
+
+    ID_FIELDS = ('id',)
+    """Raw fields holding the resource ID, in order of preference."""
+
+    KEY_FIELDS = ()
+    """Raw fields holding the resource key, in order of preference."""
+
+    NAME_FIELD = 'name'
+    """Raw field holding the resource name."""
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, *poargs, **kwargs):
+        """Initialize this instance."""
+        super().__init__(*poargs, **kwargs)
+        self.__from_raw = raw_to_jira_resource(self.RESOURCE_TYPE)
+        self.__resources = {}
+        self.__ids_by_key = {}
+        self.__names = []
+        self.__lock = RLock()
+
+    @classmethod
+    def __first(cls, raw, fields):
+        for field in fields:
+            value = raw.get(field)
+            if value is not None:
+                return str(value)
+        return None
+
+    @classmethod
+    @abstractmethod
+    def _resource_of(cls, event):
+        """Return the resource carried by *event*."""
+
+    def __len__(self):
+        """Return the number of resources in the directory."""
+        return len(self.__resources)
+
+    def __contains__(self, id):
+        """Return whether a resource with the given ID is present."""
+        return str(id) in self.__resources
+
+    def get(self, id, default=None):
+        """Return a resource by ID.
+
+        :param id: the resource ID.
+        :return: the resource, or *default*.
+        """
+        return self.__resources.get(str(id), default)
+
+    def get_by_key(self, key, default=None):
+        """Return a resource by key.
+
+        :param key: the resource key.
+        :type key: `str`
+        :return: the resource, or *default*.
+        """
+        with self.__lock:
+            id = self.__ids_by_key.get(key)
+            return default if id is None else self.__resources[id]
+
+    def search(self, prefix, limit=None):
+        """Return resources whose name starts with *prefix*.
+
+        The match is case-insensitive.
+
+        :param prefix: the name prefix.
+        :type prefix: `str`
+        :param limit: the maximum number of resources to return, if any.
+        :type limit: `int`
+        :return: the resources, ordered by name.
+        :rtype: `list`
+        """
+        check_type(prefix, str)
+        prefix = prefix.casefold()
+        found = []
+        with self.__lock:
+            names = self.__names
+            for i in range(bisect_left(names, (prefix,)), len(names)):
+                name, id = names[i]
+                if not name.startswith(prefix) or len(found) == limit:
+                    break
+                found.append(self.__resources[id])
+        return found
+
+    def put(self, resource):
+        """Add or replace a resource.
+
+        :param resource: the resource.
+        :type resource: `~jira.resources.Resource`
+        """
+        raw = resource.raw
+        id = self.__first(raw, self.ID_FIELDS)
+        if id is None:
+            logger.warning("%s has no ID, ignoring: %r",
+                           self.RESOURCE_TYPE, raw)
+            return
+        with self.__lock:
+            self.remove(id)
+            self.__resources[id] = resource
+            key = self.__first(raw, self.KEY_FIELDS)
+            if key is not None:
+                self.__ids_by_key[key] = id
+            name = raw.get(self.NAME_FIELD)
+            if isinstance(name, str):
+                insort(self.__names, (name.casefold(), id))
+
+    def remove(self, id):
+        """Remove a resource by ID, if present.
+
+        :param id: the resource ID.
+        :return: the removed resource, if any; otherwise `None`.
+        """
+        with self.__lock:
+            resource = self.__resources.pop(str(id), None)
+            if resource is None:
+                return None
+            raw = resource.raw
+            key = self.__first(raw, self.KEY_FIELDS)
+            if key is not None and self.__ids_by_key.get(key) == str(id):
+                del self.__ids_by_key[key]
+            name = raw.get(self.NAME_FIELD)
+            if isinstance(name, str):
+                entry = (name.casefold(), str(id))
+                i = bisect_left(self.__names, entry)
+                if i < len(self.__names) and self.__names[i] == entry:
+                    del self.__names[i]
+            return resource
+
+    def clear(self):
+        """Remove all resources."""
+        with self.__lock:
+            self.__resources.clear()
+            self.__ids_by_key.clear()
+            del self.__names[:]
+
+    def apply(self, event):
+        """Update the directory from a webhook event.
+
+        Events of other types are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        if not isinstance(event, self.EVENT_TYPE):
+            return
+        resource = self._resource_of(event)
+        if isinstance(event, self.DELETED_EVENT_TYPE):
+            id = self.__first(resource.raw, self.ID_FIELDS)
+            if id is not None:
+                self.remove(id)
+        else:
+            self.put(resource)
+
+    def save(self, path):
+        """Save a snapshot of this directory.
+
+        :param path: the snapshot file path.
+        :type path: `str`
+        """
+        with self.__lock:
+            snapshot = {
+                'type': self.RESOURCE_TYPE,
+                'version': self.SNAPSHOT_VERSION,
+                'resources': [resource.raw
+                              for resource in self.__resources.values()],
+            }
+        with atomic_open(path) as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+
+    def load(self, path):
+        """Warm-start this directory from a snapshot saved with `save()`.
+
+        Resources in the snapshot are added to those already present.
+
+        :param path: the snapshot file path.
+        :type path: `str`
+        :raise `ValueError`: if the snapshot is not for this directory.
+        """
+        with open(path) as f:
+            snapshot = json.load(f)
+        if (snapshot.get('type') != self.RESOURCE_TYPE or
+                snapshot.get('version') != self.SNAPSHOT_VERSION):
+            raise ValueError("{} is not a version {} {} snapshot"
+                             .format(path, self.SNAPSHOT_VERSION,
+                                     self.RESOURCE_TYPE))
+        for raw in snapshot['resources']:
+            self.put(self.__from_raw(raw))
+
+
+class UserDirectory(ResourceDirectory):
+    """Directory of Jira users, fed by user events.
+
+    Users are indexed by account ID (or key or name on Jira Server), by key
+    or name, and by display name.
+    """
+
+    RESOURCE_TYPE = 'User'
+    EVENT_TYPE = UserEvent
+    DELETED_EVENT_TYPE = UserDeletedEvent
+    ID_FIELDS = ('accountId', 'key', 'name')
+    KEY_FIELDS = ('key', 'name')
+    NAME_FIELD = 'displayName'
+
+    @classmethod
+    def _resource_of(cls, event):
+        return event.user
+
+
+class ProjectDirectory(ResourceDirectory):
+    """Directory of Jira projects, fed by project events.
+
+    Projects are indexed by ID, key and name.
+    """
+
+    RESOURCE_TYPE = 'Project'
+    EVENT_TYPE = ProjectEvent
+    DELETED_EVENT_TYPE = ProjectDeletedEvent
+    KEY_FIELDS = ('key',)
+
+    @classmethod
+    def _resource_of(cls, event):
+        return event.project
+
+
+class BoardDirectory(ResourceDirectory):
+    """Directory of Jira boards, fed by board events.
+
+    Boards are indexed by ID and name.
+    """
+
+    RESOURCE_TYPE = 'Board'
+    EVENT_TYPE = BoardEvent
+    DELETED_EVENT_TYPE = BoardDeletedEvent
+
+    @classmethod
+    def _resource_of(cls, event):
+        return event.board
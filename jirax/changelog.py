@@ -1,16 +1,23 @@
 """Jira webhook changelog."""
 
+from collections import namedtuple
 from collections.abc import Mapping, Iterable
+from datetime import datetime
+from functools import partial
 from logging import getLogger
 
 from ctorrepr import CtorRepr
 
+from .decoders import find_decoder, is_multi_valued
 from .logging import LoggerProxy
-from .raw import FromRaw, RawFieldValueError, InvalidRawData
+from .raw import (FromRaw, RawFieldMover, RawFieldValueError, InvalidRawData,
+                  raw_to_jira_resource)
 from .util import check_type
 
 logger = LoggerProxy(default_logger=getLogger(__name__))
 
+_user_from_raw = raw_to_jira_resource('User')
+
 
 class InvalidChange(InvalidRawData):
     """Jira issue changelog is invalid."""
@@ -79,6 +86,7 @@ class Change(FromRaw, CtorRepr):
         super().__init__(*poargs, **kwargs)
         self.__id = id
         self.__fields = fields
+        self.__deltas = None
 
     def _collect_repr_args(self, poargs, kwargs):
         super()._collect_repr_args(poargs, kwargs)
@@ -91,31 +99,153 @@ class Change(FromRaw, CtorRepr):
 
     @property
     def fields(self):  # noqa: D401
-        """Fields that have changed, keyed by Jira field ID string."""
+        """Fields that have changed, keyed by Jira field ID string.
+
+        When parsed from raw data, this is a `FieldChanges` mapping that
+        parses each field change on first access.
+        """
         return self.__fields
 
+    def deltas(self):
+        """Return the values added to and removed from multi-valued fields.
+
+        Only multi-valued fields are parsed; see `FieldChange.added`.  The
+        result is computed once and cached.
+
+        :return: the deltas, keyed by Jira field ID string.
+        :rtype: `dict` of `FieldDelta`
+        """
+        if self.__deltas is None:
+            fields = self.__fields
+            if isinstance(fields, FieldChanges):
+                keys = [key for key, items in fields.raw.items()
+                        if is_multi_valued(items[0].get('fieldtype'),
+                                           items[0].get('fieldId'),
+                                           items[0].get('field'))]
+            else:
+                keys = [key for key, field in fields.items()
+                        if field.multi_valued]
+            self.__deltas = {key: FieldDelta(fields[key].added,
+                                             fields[key].removed)
+                             for key in keys}
+        return self.__deltas
+
+    def field_items(self):
+        """Return what each changelog item changed, without parsing it.
+
+        :return: one entry per changelog item.
+        :rtype: `list` of `FieldItem`
+        """
+        fields = self.__fields
+        if isinstance(fields, FieldChanges):
+            return fields.field_items()
+        return [FieldItem(field.id, field.name, field.old.raw, field.old.str,
+                          field.new.raw, field.new.str)
+                for field in fields.values()]
+
     @staticmethod
-    def __convert_items_to_fields(items):
-        fields = {}
+    def __convert_id(id):
+        try:
+            return int(id)
+        except ValueError as e:
+            raise RawFieldValueError from e
+
+    @staticmethod
+    def __field_change_from_raw(item, mode):
+        try:
+            return FieldChange.from_raw(item, mode=mode)
+        except InvalidRawData as e:
+            raise RawFieldValueError from e
+
+    @classmethod
+    def __convert_items_to_fields(cls, items, mode):
+        index = {}
         for item in items:
-            try:
-                field = FieldChange.from_raw(item)
-            except InvalidRawData as e:
-                raise RawFieldValueError from e
-            field_id = field.id or field.name
-            if field_id in fields:
-                raise DuplicateField(first=fields[field_id], second=field)
-            fields[field_id] = field
-        if not fields:
+            field_id = FieldChanges.field_id_of(item)
+            if field_id is None:
+                # Malformed; parse it now to report it.
+                field = cls.__field_change_from_raw(item, mode)
+                field_id = field.id or field.name
+            if field_id not in index:
+                index[field_id] = [item]
+            elif is_multi_valued(item.get('fieldtype'), item.get('fieldId'),
+                                 item.get('field')):
+                # Jira reports each component or version added or removed
+                # in one edit as a separate item.
+                index[field_id].append(item)
+            else:
+                raise DuplicateField(
+                        first=cls.__field_change_from_raw(index[field_id][0],
+                                                          mode),
+                        second=cls.__field_change_from_raw(item, mode))
+        if not index:
             raise EmptyChange()
-        return fields
+        return FieldChanges(items=index, mode=mode)
 
     @classmethod
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
-        mover.move('id', type=(int, str), filter=int)
+        mover.move('id', type=(int, str), filter=cls.__convert_id)
         mover.move('fields', source_name='items', type=Iterable,
-                   filter=cls.__convert_items_to_fields)
+                   filter=partial(cls.__convert_items_to_fields,
+                                  mode=mover.nested_mode))
+
+
+class HistoricalChange(Change):
+    """Jira issue changelog entry, as returned by the REST API.
+
+    Unlike webhook changelogs, the REST ``histories`` also carry who made the
+    change and when.
+
+    :param author: who made the change, if known.
+    :type author: `~jira.resources.User`
+    :param created: when the change was made.
+    :type created: `~datetime.datetime`
+    """
+
+    def __init__(self, *poargs, author, created, **kwargs):
+        """Initialize this instance."""
+        check_type(created, datetime)
+        super().__init__(*poargs, **kwargs)
+        self.__author = author
+        self.__created = created
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(author=self.__author, created=self.__created)
+
+    @property
+    def author(self):  # noqa: D401
+        """Who made the change, if known; otherwise `None`."""
+        return self.__author
+
+    @property
+    def created(self):  # noqa: D401
+        """When the change was made."""
+        return self.__created
+
+    @staticmethod
+    def __convert_created(created):
+        try:
+            return datetime.strptime(created, '%Y-%m-%dT%H:%M:%S.%f%z')
+        except ValueError as e:
+            raise RawFieldValueError from e
+
+    @classmethod
+    def _collect_ctor_args_from_raw(cls, mover):
+        super()._collect_ctor_args_from_raw(mover)
+        mover.move('author', type=Mapping, filter=_user_from_raw,
+                   required=False)
+        mover.move('created', type=str, filter=cls.__convert_created)
+        mover.move('', source_name='historyMetadata', required=False)
+
+
+FieldDelta = namedtuple('FieldDelta', 'added, removed')
+"""Values added to and removed from a multi-valued field."""
+
+FieldItem = namedtuple('FieldItem',
+                       'id, name, old_raw, old_str, new_raw, new_str')
+"""What a changelog item changed, read without parsing it."""
 
 
 class InvalidFieldChange(InvalidRawData):
@@ -154,6 +284,7 @@ class FieldChange(FromRaw, CtorRepr):
         self.__type = type_
         self.__old = old
         self.__new = new
+        self.__delta = None
 
     def _collect_repr_args(self, poargs, kwargs):
         super()._collect_repr_args(poargs, kwargs)
@@ -189,21 +320,84 @@ class FieldChange(FromRaw, CtorRepr):
         """The new value."""
         return self.__new
 
+    @property
+    def multi_valued(self):  # noqa: D401
+        """Whether this is a multi-valued field such as ``labels``.
+
+        See `.decoders.register_decoder()`.
+        """
+        return is_multi_valued(self.__type, self.__id, self.__name)
+
+    def __compute_delta(self):
+        if self.__delta is None:
+            if not self.multi_valued:
+                return None
+            old = set(self.__old.decoded)
+            new = set(self.__new.decoded)
+            self.__delta = FieldDelta(frozenset(new - old),
+                                      frozenset(old - new))
+        return self.__delta
+
+    @property
+    def added(self):  # noqa: D401
+        """Values added to a multi-valued field, as a `frozenset`.
+
+        The old and new values are tokenized by the decoder for the field,
+        e.g. space-separated for ``labels``.  `None` if the field is not
+        multi-valued.
+        """
+        delta = self.__compute_delta()
+        return None if delta is None else delta.added
+
+    @property
+    def removed(self):  # noqa: D401
+        """Values removed from a multi-valued field, as a `frozenset`.
+
+        See `added`.
+        """
+        delta = self.__compute_delta()
+        return None if delta is None else delta.removed
+
     @classmethod
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('name', source_name='field', type=str)
         mover.move('id', source_name='fieldId', type=str, required=False)
         mover.move('type', source_name='fieldtype', type=str)
+        # Jira Cloud adds these to user field changes; the account IDs are
+        # already in 'from' and 'to'.
+        mover.move('', source_name='tmpFromAccountId', required=False)
+        mover.move('', source_name='tmpToAccountId', required=False)
+        decoder = find_decoder(mover.target['type'], mover.target['id'],
+                               mover.target['name'])
         mover.target['old'] = FieldValue(
                 raw=mover.move('', source_name='from'),
-                str=mover.move('', source_name='fromString')
+                str=mover.move('', source_name='fromString'),
+                decoder=decoder
         )
         mover.target['new'] = FieldValue(
                 raw=mover.move('', source_name='to'),
-                str=mover.move('', source_name='toString')
+                str=mover.move('', source_name='toString'),
+                decoder=decoder
         )
 
+    @classmethod
+    def merge(cls, changes):
+        """Merge changes of the same multi-valued field into one.
+
+        The merged old and new values have lists of the raw values, the
+        strings joined with commas, and decode to the concatenated decoded
+        values, so that `added` and `removed` cover all *changes*.
+
+        :param changes: the changes, all of the same field.
+        :type changes: `~collections.abc.Sequence` of `FieldChange`
+        :rtype: `FieldChange`
+        """
+        first = changes[0]
+        return cls(name=first.name, id=first.id, type=first.type,
+                   old=_merged_value([change.old for change in changes]),
+                   new=_merged_value([change.new for change in changes]))
+
     def __str__(self):
         """Return a nicely printable string representation of this instance."""
         return ("field {!r} (ID {!r}, type {!r}) value {} -> {}"
@@ -216,13 +410,20 @@ class FieldValue(CtorRepr):
 
     :param raw: the raw, uncooked field value (may be `None`).
     :param str: the field value as a string (may be `None`).
+    :param decoder:
+        the decoder for `decoded`, if any; see `.decoders.find_decoder()`.
+    :type decoder: `~collections.abc.Callable`
     """
 
-    def __init__(self, *poargs, raw, str, **kwargs):
+    __UNDECODED = object()
+
+    def __init__(self, *poargs, raw, str, decoder=None, **kwargs):
         """Initialize this instance."""
         super().__init__(*poargs, **kwargs)
         self.__raw = raw
         self.__str = str
+        self.__decoder = decoder
+        self.__decoded = self.__UNDECODED
 
     def _collect_repr_args(self, poargs, kwargs):
         super()._collect_repr_args(poargs, kwargs)
@@ -238,6 +439,127 @@ class FieldValue(CtorRepr):
         """The field value string."""
         return self.__str
 
+    @property
+    def decoded(self):  # noqa: D401
+        """The decoded field value.
+
+        Decoded on first access by the decoder registered for the field (see
+        `.decoders.register_decoder()`), and cached.  Without a decoder, this
+        is the raw value.
+
+        :raise `.raw.RawFieldValueError`: if the value cannot be decoded.
+        """
+        if self.__decoded is self.__UNDECODED:
+            if self.__decoder is None:
+                self.__decoded = self.__raw
+            else:
+                try:
+                    self.__decoded = self.__decoder(self)
+                except (AttributeError, TypeError, ValueError) as e:
+                    raise RawFieldValueError("cannot decode {}"
+                                             .format(self)) from e
+        return self.__decoded
+
     def __str__(self):
         """Return a nicely printable string representation of this instance."""
         return "{!r} (string {!r})".format(self.__raw, self.__str)
+
+
+def _merged_value(values):
+    strings = [value.str for value in values if value.str is not None]
+
+    def decode(merged):
+        return [item for value in values for item in (value.decoded or ())]
+
+    return FieldValue(raw=[value.raw for value in values],
+                      str=', '.join(strings) if strings else None,
+                      decoder=decode)
+
+
+class FieldChanges(Mapping):
+    """Field changes of a changelog entry, parsed on demand.
+
+    The raw changelog items of each field are parsed into a `FieldChange`
+    when its key is first looked up, and cached; several items of the same
+    multi-valued field are merged with `FieldChange.merge()`.  Iteration,
+    length and membership tests do not parse anything.
+
+    Parsing never alters the raw items, so `raw` and `field_items()` stay
+    valid after lookups: `~.raw.RawFieldMover.CONSUME` mode, which would
+    empty them, is downgraded to `~.raw.RawFieldMover.TRACK`.
+
+    :param items: lists of raw changelog items, keyed by `field_id_of()`
+        them.
+    :type items: `~collections.abc.Mapping`
+    :param mode: how to parse the items; see `.raw.RawFieldMover`.
+    :type mode: `str`
+    :raise `.raw.InvalidRawData`: on lookup, if the raw item is invalid.
+    """
+
+    def __init__(self, *poargs, items, mode=RawFieldMover.COPY, **kwargs):
+        """Initialize this instance."""
+        check_type(items, Mapping)
+        super().__init__(*poargs, **kwargs)
+        if mode == RawFieldMover.CONSUME:
+            mode = RawFieldMover.TRACK
+        self.__items = items
+        self.__mode = mode
+        self.__fields = {}
+
+    @staticmethod
+    def field_id_of(item):
+        """Return the key of a raw changelog item without parsing it.
+
+        This is the field ID if any, otherwise the field name.
+
+        :param item: the raw changelog item.
+        :return: the key, or `None` if *item* is malformed.
+        :rtype: `str`
+        """
+        if not isinstance(item, Mapping):
+            return None
+        field_id = item.get('fieldId') or item.get('field')
+        return field_id if isinstance(field_id, str) else None
+
+    @property
+    def raw(self):  # noqa: D401
+        """The lists of raw changelog items, keyed by field ID."""
+        return self.__items
+
+    def field_items(self):
+        """Return what each raw changelog item changed, without parsing it.
+
+        :rtype: `list` of `FieldItem`
+        """
+        return [FieldItem(item.get('fieldId'), item.get('field'),
+                          item.get('from'), item.get('fromString'),
+                          item.get('to'), item.get('toString'))
+                for items in self.__items.values() for item in items]
+
+    def __getitem__(self, key):
+        """Return the field change for *key*, parsing it if necessary."""
+        try:
+            return self.__fields[key]
+        except KeyError:
+            pass
+        fields = [FieldChange.from_raw(item, mode=self.__mode)
+                  for item in self.__items[key]]
+        field = fields[0] if len(fields) == 1 else FieldChange.merge(fields)
+        self.__fields[key] = field
+        return field
+
+    def __contains__(self, key):
+        """Return whether *key* has changed, without parsing it."""
+        return key in self.__items
+
+    def __iter__(self):
+        """Iterate over the changed field keys."""
+        return iter(self.__items)
+
+    def __len__(self):
+        """Return the number of changed fields."""
+        return len(self.__items)
+
+    def __repr__(self):
+        """Return the parsed field changes as a `dict` representation."""
+        return repr(dict(self))
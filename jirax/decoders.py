@@ -0,0 +1,181 @@
+"""Jira issue field value decoders.
+
+A decoder turns a `.changelog.FieldValue` into a Python value, e.g. a
+`~datetime.date` for a due date or a list of sprint IDs for a sprint field.
+Decoders are registered by field type string plus field ID or name, and
+resolved once per key.
+"""
+
+from datetime import datetime
+import logging
+
+from .logging import LoggerProxy
+from .util import check_type
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+
+def decode_date(value):
+    """Decode a ``YYYY-MM-DD`` date, e.g. ``duedate``.
+
+    :rtype: `~datetime.date`
+    """
+    if value.raw is None:
+        return None
+    return datetime.strptime(value.raw[:10], '%Y-%m-%d').date()
+
+
+def decode_int(value):
+    """Decode an integer, e.g. a time estimate in seconds.
+
+    :rtype: `int`
+    """
+    if value.raw is None:
+        return None
+    return int(value.raw)
+
+
+def decode_number(value):
+    """Decode a number, e.g. a number custom field.
+
+    :rtype: `float`
+    """
+    text = value.raw if value.raw is not None else value.str
+    if text is None:
+        return None
+    return float(text)
+
+
+def decode_space_list(value):
+    """Decode a space-separated list of strings, e.g. ``labels``.
+
+    :rtype: `list` of `str`
+    """
+    if value.str is None:
+        return []
+    return value.str.split()
+
+
+def decode_comma_list(value):
+    """Decode a comma-separated list of strings, e.g. a multi-select field.
+
+    :rtype: `list` of `str`
+    """
+    if not value.str:
+        return []
+    return [item.strip() for item in value.str.split(',') if item.strip()]
+
+
+def decode_item(value):
+    """Decode a single-item list, e.g. ``Component`` or ``Fix Version``.
+
+    Jira reports each added or removed item of these fields as a separate
+    changelog item with the item name as the string value; see
+    `.changelog.FieldChange.merge()`.
+
+    :rtype: `list` of `str`
+    """
+    if value.str is None:
+        return []
+    return [value.str]
+
+
+def decode_id_list(value):
+    """Decode a comma-separated list of integer IDs, e.g. ``Sprint``.
+
+    :rtype: `list` of `int`
+    """
+    if not value.raw:
+        return []
+    return [int(item) for item in value.raw.split(',') if item.strip()]
+
+
+_decoders = {}
+_resolved = {}
+
+
+def register_decoder(type, key, decoder, multi_valued=False):
+    """Register a field value decoder.
+
+    Decoders for multi-valued fields must return a `list` of hashable items,
+    and should be registered with *multi_valued*; see
+    `.changelog.FieldChange.added`.
+
+    :param type: the field type string, e.g. ``'jira'`` or ``'custom'``.
+    :type type: `str`
+    :param key: the field ID (e.g. ``'customfield_10020'``) or name.
+    :type key: `str`
+    :param decoder:
+        the decoder, which takes a `.changelog.FieldValue` and returns the
+        decoded value, or `None` to unregister.
+    :type decoder: `~collections.abc.Callable`
+    :param multi_valued: whether the field is multi-valued.
+    :type multi_valued: `bool`
+    """
+    type_ = type
+    from builtins import type
+    check_type(type_, str)
+    check_type(key, str)
+    if decoder is None:
+        _decoders.pop((type_, key), None)
+    else:
+        _decoders[type_, key] = decoder, bool(multi_valued)
+    _resolved.clear()
+
+
+def _resolve(type, id, name):
+    try:
+        return _resolved[type, id, name]
+    except KeyError:
+        pass
+    except TypeError:
+        return None, False
+    registration = _decoders.get((type, id))
+    if registration is None:
+        registration = _decoders.get((type, name), (None, False))
+    _resolved[type, id, name] = registration
+    return registration
+
+
+def find_decoder(type, id, name):
+    """Find the decoder for a field.
+
+    A decoder registered under the field ID takes precedence over one
+    registered under the field name.
+
+    :param type: the field type string.
+    :type type: `str`
+    :param id: the field ID, if any.
+    :type id: `str`
+    :param name: the field name.
+    :type name: `str`
+    :return: the decoder, or `None` if none has been registered.
+    :rtype: `~collections.abc.Callable`
+    """
+    return _resolve(type, id, name)[0]
+
+
+def is_multi_valued(type, id, name):
+    """Return whether a field has been registered as multi-valued.
+
+    :param type: the field type string.
+    :type type: `str`
+    :param id: the field ID, if any.
+    :type id: `str`
+    :param name: the field name.
+    :type name: `str`
+    :rtype: `bool`
+    """
+    return _resolve(type, id, name)[1]
+
+
+register_decoder('jira', 'duedate', decode_date)
+for _key in ('timeoriginalestimate', 'timeestimate', 'timespent',
+             'WorklogId'):
+    register_decoder('jira', _key, decode_int)
+register_decoder('jira', 'labels', decode_space_list, multi_valued=True)
+for _key in ('components', 'fixVersions', 'versions'):
+    register_decoder('jira', _key, decode_item, multi_valued=True)
+register_decoder('custom', 'Sprint', decode_id_list, multi_valued=True)
+register_decoder('custom', 'Story Points', decode_number)
+del _key
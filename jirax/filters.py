@@ -0,0 +1,392 @@
+"""Declarative webhook event filters compiled into closures.
+
+A filter expression combines conditions with ``and``, ``or``, ``not`` and
+parentheses.  The conditions are:
+
+``type = jira:issue_updated``, ``type in (comment_created, ...)``
+    the webhook event type string.
+``FIELD = VALUE``, ``FIELD != VALUE``, ``FIELD is VALUE``
+    the current value of an issue field, by field ID (``project``,
+    ``status``, ``assignee``, ``customfield_10020``...).  Object values
+    match any of their ``key``, ``name``, ``value``, ``id``, ``accountId``
+    or ``displayName``; list values match if any element matches.
+``FIELD in (VALUE, ...)``, ``FIELD not in (VALUE, ...)``
+    the same, for several values.
+``FIELD is empty``, ``FIELD is not empty``
+    whether the issue field is missing, null or an empty list.
+``FIELD changed``, ``FIELD changed from VALUE to VALUE``
+    whether the changelog of the event changes the field, given by ID or
+    name, optionally from and/or to a value (the display string or the raw
+    value, such as an account ID).
+
+Keywords are case-insensitive; values containing spaces or punctuation
+must be quoted with ``"`` or ``'``.  For example::
+
+    project in (A, B) and status changed to Done and assignee is 5b10ac8d
+
+`compile_filter()` compiles an expression once.  The result can be applied
+to parsed events, or to raw events before they are parsed, so that
+non-matching events are rejected cheaply.
+"""
+
+from collections.abc import Mapping
+import logging
+import re
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+
+class FilterSyntaxError(ValueError):
+    """Filter expression is invalid."""
+
+
+_TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<string>"[^"]*"|'[^']*')
+      | (?P<op>!=|=|\(|\)|,)
+      | (?P<word>[^\s"'=!(),]+)
+    )''', re.VERBOSE)
+
+_KEYWORDS = frozenset(['and', 'or', 'not', 'in', 'is', 'empty', 'changed',
+                       'from', 'to'])
+
+_VALUE_KEYS = ('key', 'name', 'value', 'id', 'accountId', 'displayName')
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if match is None:
+            raise FilterSyntaxError("unexpected character at {}: {!r}"
+                                    .format(position, expression[position:]))
+        position = match.end()
+        if match.group('string') is not None:
+            tokens.append(('value', match.group('string')[1:-1]))
+        elif match.group('op') is not None:
+            tokens.append(('op', match.group('op')))
+        else:
+            word = match.group('word')
+            if word.lower() in _KEYWORDS:
+                tokens.append(('keyword', word.lower()))
+            else:
+                tokens.append(('value', word))
+    return tokens
+
+
+def _value_matches(value, expected):
+    if value is None:
+        return False
+    if isinstance(value, Mapping):
+        return any(str(value.get(key)) == expected
+                   for key in _VALUE_KEYS if value.get(key) is not None)
+    if isinstance(value, list):
+        return any(_value_matches(element, expected) for element in value)
+    return str(value) == expected
+
+
+def _is_empty(value):
+    return value is None or value == [] or value == ''
+
+
+# Accessors for the two event representations.  Each returns the same shape,
+# so that conditions compile to one closure over them.
+
+def _raw_type(raw):
+    return raw.get('webhookEvent')
+
+
+def _raw_issue_fields(raw):
+    issue = raw.get('issue')
+    if isinstance(issue, Mapping):
+        fields = issue.get('fields')
+        if isinstance(fields, Mapping):
+            return fields
+    return None
+
+
+def _item_tuples(items):
+    return [(item.get('fieldId'), item.get('field'),
+             item.get('from'), item.get('fromString'),
+             item.get('to'), item.get('toString'))
+            for item in items if isinstance(item, Mapping)]
+
+
+def _raw_change_items(raw):
+    changelog = raw.get('changelog')
+    if isinstance(changelog, Mapping):
+        items = changelog.get('items')
+        if isinstance(items, list):
+            return _item_tuples(items)
+    return ()
+
+
+def _event_type(event):
+    return event.type
+
+
+def _event_issue_fields(event):
+    issue = getattr(event, 'issue', None)
+    if issue is None:
+        return None
+    fields = issue.raw.get('fields')
+    return fields if isinstance(fields, Mapping) else None
+
+
+def _event_change_items(event):
+    change = getattr(event, 'change', None)
+    if change is None:
+        return ()
+    return change.field_items()
+
+
+_RAW_ACCESSORS = (_raw_type, _raw_issue_fields, _raw_change_items)
+_EVENT_ACCESSORS = (_event_type, _event_issue_fields, _event_change_items)
+
+
+class _Parser:
+    """Recursive descent parser producing predicate compilers.
+
+    Each parse method returns a function that takes the accessor triple and
+    returns the predicate closure, so one parse serves both event
+    representations.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise FilterSyntaxError("unexpected end of {!r}"
+                                    .format(self.expression))
+        self.position += 1
+        return token
+
+    def accept(self, kind, text=None):
+        token = self.peek()
+        if token[0] == kind and (text is None or token[1] == text):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind, text=None):
+        token = self.next()
+        if token[0] != kind or (text is not None and token[1] != text):
+            raise FilterSyntaxError("expected {} but got {!r} in {!r}"
+                                    .format(text or kind, token[1],
+                                            self.expression))
+        return token[1]
+
+    def parse(self):
+        compile = self.parse_or()
+        if self.peek()[0] is not None:
+            raise FilterSyntaxError("unexpected {!r} in {!r}"
+                                    .format(self.peek()[1], self.expression))
+        return compile
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.accept('keyword', 'or'):
+            operands.append(self.parse_and())
+        if len(operands) == 1:
+            return operands[0]
+
+        def compile(accessors):
+            predicates = [operand(accessors) for operand in operands]
+            return lambda event: any(p(event) for p in predicates)
+        return compile
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.accept('keyword', 'and'):
+            operands.append(self.parse_not())
+        if len(operands) == 1:
+            return operands[0]
+
+        def compile(accessors):
+            predicates = [operand(accessors) for operand in operands]
+            return lambda event: all(p(event) for p in predicates)
+        return compile
+
+    def parse_not(self):
+        if self.accept('keyword', 'not'):
+            operand = self.parse_not()
+
+            def compile(accessors):
+                predicate = operand(accessors)
+                return lambda event: not predicate(event)
+            return compile
+        if self.accept('op', '('):
+            compile = self.parse_or()
+            self.expect('op', ')')
+            return compile
+        return self.parse_condition()
+
+    def parse_values(self):
+        self.expect('op', '(')
+        values = [self.expect('value')]
+        while self.accept('op', ','):
+            values.append(self.expect('value'))
+        self.expect('op', ')')
+        return values
+
+    def parse_condition(self):
+        field = self.expect('value')
+        if self.accept('keyword', 'changed'):
+            old = self.expect('value') if self.accept('keyword',
+                                                      'from') else None
+            new = self.expect('value') if self.accept('keyword',
+                                                      'to') else None
+            return _changed(field, old, new)
+        negate = False
+        if self.accept('op', '='):
+            values = [self.expect('value')]
+        elif self.accept('op', '!='):
+            negate = True
+            values = [self.expect('value')]
+        elif self.accept('keyword', 'is'):
+            negate = self.accept('keyword', 'not')
+            if self.accept('keyword', 'empty'):
+                return _negated(_empty(field), negate)
+            values = [self.expect('value')]
+        else:
+            negate = self.accept('keyword', 'not')
+            self.expect('keyword', 'in')
+            values = self.parse_values()
+        if field == 'type':
+            return _negated(_type_in(frozenset(values)), negate)
+        return _negated(_field_in(field, values), negate)
+
+
+def _negated(compile, negate):
+    if not negate:
+        return compile
+
+    def compile_negated(accessors):
+        predicate = compile(accessors)
+        return lambda event: not predicate(event)
+    return compile_negated
+
+
+def _type_in(types):
+    def compile(accessors):
+        get_type = accessors[0]
+        return lambda event: get_type(event) in types
+    return compile
+
+
+def _field_in(field, values):
+    def compile(accessors):
+        get_fields = accessors[1]
+
+        def predicate(event):
+            fields = get_fields(event)
+            if fields is None:
+                return False
+            value = fields.get(field)
+            return any(_value_matches(value, expected) for expected in values)
+        return predicate
+    return compile
+
+
+def _empty(field):
+    def compile(accessors):
+        get_fields = accessors[1]
+
+        def predicate(event):
+            fields = get_fields(event)
+            return fields is None or _is_empty(fields.get(field))
+        return predicate
+    return compile
+
+
+def _changed(field, old, new):
+    def compile(accessors):
+        get_items = accessors[2]
+
+        def predicate(event):
+            for id, name, from_, from_str, to, to_str in get_items(event):
+                if field != id and field != name:
+                    continue
+                if old is not None and old not in (from_, from_str):
+                    continue
+                if new is not None and new not in (to, to_str):
+                    continue
+                return True
+            return False
+        return predicate
+    return compile
+
+
+class EventFilter(CtorRepr):
+    """A compiled event filter; see `compile_filter()`.
+
+    Call it with a parsed `.webhook.WebhookEvent`, or call `match_raw()`
+    with a raw event before parsing it; both give the same answer for the
+    same event.
+
+    :param expression: the filter expression.
+    :type expression: `str`
+    :raise `FilterSyntaxError`: if *expression* is invalid.
+    """
+
+    def __init__(self, *poargs, expression, **kwargs):
+        """Initialize this instance."""
+        compile = _Parser(expression).parse()
+        super().__init__(*poargs, **kwargs)
+        self.__expression = expression
+        self.__match_event = compile(_EVENT_ACCESSORS)
+        self.__match_raw = compile(_RAW_ACCESSORS)
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(expression=self.__expression)
+
+    @property
+    def expression(self):  # noqa: D401
+        """The filter expression."""
+        return self.__expression
+
+    def __call__(self, event):
+        """Return whether a parsed event matches this filter.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        :rtype: `bool`
+        """
+        return self.__match_event(event)
+
+    def match_raw(self, raw):
+        """Return whether a raw event matches this filter.
+
+        :param raw: the raw event.
+        :type raw: `~collections.abc.Mapping`
+        :rtype: `bool`
+        """
+        return self.__match_raw(raw)
+
+
+def compile_filter(expression):
+    """Compile a filter expression.
+
+    :param expression: the filter expression; see the module documentation.
+    :type expression: `str`
+    :return: the compiled filter.
+    :rtype: `EventFilter`
+    :raise `FilterSyntaxError`: if *expression* is invalid.
+    """
+    return EventFilter(expression=expression)
@@ -0,0 +1,562 @@
+"""Issue flow analytics maintained incrementally from webhook events."""
+
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+import json
+import logging
+from threading import RLock
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .util import atomic_open, check_type
+from .webhook import IssueCreatedEvent, IssueDeletedEvent, IssueUpdatedEvent
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+
+def issue_project(issue):
+    """Return the project key of an issue.
+
+    Use the issue ``project`` field if present, otherwise the issue key
+    prefix.
+
+    :param issue: the issue.
+    :type issue: `~jira.resources.Issue`
+    :return: the project key, or `None` if unknown.
+    :rtype: `str`
+    """
+    fields = issue.raw.get('fields') or {}
+    project = fields.get('project')
+    if isinstance(project, Mapping) and project.get('key'):
+        return project['key']
+    key = issue.raw.get('key')
+    if isinstance(key, str) and '-' in key:
+        return key.rsplit('-', 1)[0]
+    return None
+
+
+def issue_status(issue):
+    """Return the status name of an issue, if present in its fields.
+
+    :param issue: the issue.
+    :type issue: `~jira.resources.Issue`
+    :rtype: `str`
+    """
+    fields = issue.raw.get('fields') or {}
+    status = fields.get('status')
+    if isinstance(status, Mapping):
+        return status.get('name')
+    return None
+
+
+def status_transition(event):
+    """Return the status transition in an issue event, if any.
+
+    :param event: the webhook event.
+    :type event: `.webhook.WebhookEvent`
+    :return: the old and new status names (the old one is `None` for a
+        created issue), or `None` if *event* is not a status transition.
+    :rtype: `tuple`
+    """
+    if isinstance(event, IssueCreatedEvent):
+        status = issue_status(event.issue)
+        return None if status is None else (None, status)
+    if isinstance(event, IssueUpdatedEvent) and event.change is not None:
+        fields = event.change.fields
+        if 'status' in fields:
+            change = fields['status']
+            return change.old.str, change.new.str
+    return None
+
+
+class _StatusIndex:
+    """Interns status names into small integers."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.indices = {}
+        for name in names:
+            self.index(name)
+
+    def index(self, name):
+        try:
+            return self.indices[name]
+        except KeyError:
+            index = self.indices[name] = len(self.names)
+            self.names.append(name)
+            return index
+
+
+def _grow(values, size):
+    if len(values) < size:
+        values.extend([0] * (size - len(values)))
+
+
+class _IssueState:
+
+    __slots__ = ('project', 'status', 'entered', 'durations')
+
+    def __init__(self, project, status, entered, durations=()):
+        self.project = project
+        self.status = status
+        self.entered = entered
+        self.durations = array('d', durations)
+
+
+class TimeInStatus(CtorRepr):
+    """Time spent by issues in each status, maintained incrementally.
+
+    Feed issue events to `apply()`.  For each issue, the engine keeps the
+    current status, when it was entered, and the total time spent in each
+    status left so far; per-project totals are kept alongside, so both
+    per-issue and per-project lookups take constant time.
+
+    Transitions older than the time the issue entered its current status
+    are ignored, so replaying events already applied is harmless.  The state
+    can be checkpointed with `save()` and restored with `load()`.
+    """
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, *poargs, **kwargs):
+        """Initialize this instance."""
+        super().__init__(*poargs, **kwargs)
+        self.__statuses = _StatusIndex()
+        self.__issues = {}
+        self.__projects = {}
+        self.__lock = RLock()
+
+    def __len__(self):
+        """Return the number of issues tracked."""
+        return len(self.__issues)
+
+    @property
+    def statuses(self):  # noqa: D401
+        """The status names seen so far."""
+        return tuple(self.__statuses.names)
+
+    def apply(self, event):
+        """Update from a webhook event.
+
+        Issue created events start tracking the issue in its initial status,
+        issue updated events with a status change move it, and issue deleted
+        events stop tracking it.  Other events are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        if isinstance(event, IssueDeletedEvent):
+            self.remove(event.issue.raw['id'])
+            return
+        transition = status_transition(event)
+        if transition is None:
+            return
+        self.transition(event.issue.raw['id'], issue_project(event.issue),
+                        transition[1], event.timestamp.timestamp())
+
+    def transition(self, issue, project, status, timestamp):
+        """Record that an issue entered a status.
+
+        :param issue: the issue ID.
+        :param project: the project key.
+        :type project: `str`
+        :param status: the status name.
+        :type status: `str`
+        :param timestamp: when the issue entered *status* (POSIX time).
+        :type timestamp: `float`
+        """
+        issue = str(issue)
+        with self.__lock:
+            index = self.__statuses.index(status)
+            state = self.__issues.get(issue)
+            if state is None:
+                self.__issues[issue] = _IssueState(project, index, timestamp)
+                return
+            if timestamp < state.entered:
+                logger.debug("ignoring stale transition of issue %s to %s",
+                             issue, status)
+                return
+            elapsed = timestamp - state.entered
+            size = len(self.__statuses.names)
+            _grow(state.durations, size)
+            state.durations[state.status] += elapsed
+            totals = self.__projects.setdefault(state.project, array('d'))
+            _grow(totals, size)
+            totals[state.status] += elapsed
+            state.status = index
+            state.entered = timestamp
+
+    def remove(self, issue):
+        """Stop tracking an issue and remove it from its project totals.
+
+        :param issue: the issue ID.
+        """
+        with self.__lock:
+            state = self.__issues.pop(str(issue), None)
+            if state is None:
+                return
+            totals = self.__projects.get(state.project)
+            if totals is not None:
+                for index, duration in enumerate(state.durations):
+                    totals[index] -= duration
+
+    def current_status(self, issue):
+        """Return the current status of an issue and when it was entered.
+
+        :param issue: the issue ID.
+        :return: the status name and POSIX time, or `None` if not tracked.
+        :rtype: `tuple`
+        """
+        state = self.__issues.get(str(issue))
+        if state is None:
+            return None
+        return self.__statuses.names[state.status], state.entered
+
+    def time_in(self, issue, status, now=None):
+        """Return how long an issue has spent in a status.
+
+        :param issue: the issue ID.
+        :param status: the status name.
+        :type status: `str`
+        :param now: if given (POSIX time), include the time spent so far in
+            the current status.
+        :type now: `float`
+        :return: the time in seconds.
+        :rtype: `float`
+        """
+        state = self.__issues.get(str(issue))
+        index = self.__statuses.indices.get(status)
+        if state is None or index is None:
+            return 0.0
+        total = (state.durations[index]
+                 if index < len(state.durations) else 0.0)
+        if now is not None and state.status == index:
+            total += max(0.0, now - state.entered)
+        return total
+
+    def issue_durations(self, issue, now=None):
+        """Return how long an issue has spent in each status.
+
+        :param issue: the issue ID.
+        :param now: see `time_in()`.
+        :return: the time in seconds, keyed by status name.
+        :rtype: `dict`
+        """
+        durations = {}
+        for name in self.__statuses.names:
+            duration = self.time_in(issue, name, now=now)
+            if duration:
+                durations[name] = duration
+        return durations
+
+    def project_time_in(self, project, status):
+        """Return the total time issues of a project have spent in a status.
+
+        Only time in statuses that have been left is counted.
+
+        :param project: the project key.
+        :type project: `str`
+        :param status: the status name.
+        :type status: `str`
+        :return: the time in seconds.
+        :rtype: `float`
+        """
+        totals = self.__projects.get(project)
+        index = self.__statuses.indices.get(status)
+        if totals is None or index is None or index >= len(totals):
+            return 0.0
+        return totals[index]
+
+    def project_durations(self, project):
+        """Return the total time issues of a project have spent per status.
+
+        :param project: the project key.
+        :type project: `str`
+        :return: the time in seconds, keyed by status name.
+        :rtype: `dict`
+        """
+        totals = self.__projects.get(project, ())
+        return {self.__statuses.names[index]: duration
+                for index, duration in enumerate(totals) if duration}
+
+    def save(self, path):
+        """Checkpoint the state to a file.
+
+        :param path: the checkpoint file path.
+        :type path: `str`
+        """
+        with self.__lock:
+            snapshot = {
+                'version': self.SNAPSHOT_VERSION,
+                'statuses': self.__statuses.names,
+                'issues': {issue: [state.project, state.status, state.entered,
+                                   state.durations.tolist()]
+                           for issue, state in self.__issues.items()},
+                'projects': {project: totals.tolist()
+                             for project, totals in self.__projects.items()},
+            }
+            with atomic_open(path) as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        """Restore the state checkpointed with `save()`.
+
+        :param path: the checkpoint file path.
+        :type path: `str`
+        :return: the restored engine.
+        :rtype: `TimeInStatus`
+        :raise `ValueError`: if the checkpoint version is not supported.
+        """
+        check_type(path, str)
+        with open(path) as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != cls.SNAPSHOT_VERSION:
+            raise ValueError("{} is not a version {} checkpoint"
+                             .format(path, cls.SNAPSHOT_VERSION))
+        engine = cls()
+        engine.__statuses = _StatusIndex(snapshot['statuses'])
+        engine.__issues = {issue: _IssueState(*state)
+                           for issue, state in snapshot['issues'].items()}
+        engine.__projects = {project: array('d', totals)
+                             for project, totals
+                             in snapshot['projects'].items()}
+        return engine
+
+
+FlowBucket = namedtuple('FlowBucket', 'start, counts, created, completed')
+"""Cumulative flow and throughput of a project in a time bucket.
+
+``start`` is the bucket start (POSIX time), ``counts`` the number of issues
+per status name at the end of the bucket, and ``created`` and ``completed``
+the number of issues created and moved into a done status in the bucket.
+"""
+
+
+class _ProjectFlow:
+
+    __slots__ = ('current', 'snapshots', 'epochs', 'created', 'completed',
+                 'last')
+
+    def __init__(self, capacity):
+        self.current = array('l')
+        self.snapshots = [array('l') for _ in range(capacity)]
+        self.epochs = array('q', [-1] * capacity)
+        self.created = array('l', [0] * capacity)
+        self.completed = array('l', [0] * capacity)
+        self.last = None
+
+
+class CumulativeFlow(CtorRepr):
+    """Cumulative flow and throughput per project, in time buckets.
+
+    Feed issue events to `apply()`.  For each project, the aggregator keeps
+    the current number of issues per status, plus a ring buffer of the last
+    *capacity* buckets holding the per-status counts at the end of each
+    bucket and the number of issues created and completed in it.  `series()`
+    reads any window within the ring without rescanning history.
+
+    :param bucket: the bucket width, in seconds.
+    :type bucket: `int`
+    :param capacity: how many buckets to keep per project.
+    :type capacity: `int`
+    :param done_statuses: the status names that count as completed.
+    :type done_statuses: `~collections.abc.Iterable` of `str`
+    """
+
+    def __init__(self, *poargs, bucket=3600, capacity=24 * 30,
+                 done_statuses=('Done',), **kwargs):
+        """Initialize this instance."""
+        check_type(bucket, int)
+        check_type(capacity, int)
+        if bucket <= 0 or capacity <= 0:
+            raise ValueError("bucket and capacity must be positive")
+        super().__init__(*poargs, **kwargs)
+        self.__bucket = bucket
+        self.__capacity = capacity
+        self.__done_statuses = frozenset(done_statuses)
+        self.__statuses = _StatusIndex()
+        self.__issues = {}
+        self.__projects = {}
+        self.__lock = RLock()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(bucket=self.__bucket, capacity=self.__capacity,
+                      done_statuses=sorted(self.__done_statuses))
+
+    @property
+    def projects(self):  # noqa: D401
+        """The project keys seen so far."""
+        return tuple(self.__projects)
+
+    def apply(self, event):
+        """Update from a webhook event.
+
+        Issue created events add the issue to its initial status, issue
+        updated events with a status change move it, and issue deleted
+        events remove it.  Other events are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        timestamp = event.timestamp.timestamp()
+        if isinstance(event, IssueDeletedEvent):
+            self.remove(event.issue.raw['id'], timestamp)
+            return
+        transition = status_transition(event)
+        if transition is None:
+            return
+        self.transition(event.issue.raw['id'], issue_project(event.issue),
+                        transition[1], timestamp,
+                        created=isinstance(event, IssueCreatedEvent))
+
+    def __project(self, project, epoch):
+        flow = self.__projects.get(project)
+        if flow is None:
+            flow = self.__projects[project] = _ProjectFlow(self.__capacity)
+        if flow.last is None:
+            start = epoch
+        elif epoch > flow.last:
+            start = max(flow.last + 1, epoch - self.__capacity + 1)
+        else:
+            return flow
+        for k in range(start, epoch + 1):
+            slot = k % self.__capacity
+            flow.snapshots[slot] = array('l', flow.current)
+            flow.epochs[slot] = k
+            flow.created[slot] = 0
+            flow.completed[slot] = 0
+        flow.last = epoch
+        return flow
+
+    def __add(self, flow, epoch, status, delta):
+        size = len(self.__statuses.names)
+        _grow(flow.current, size)
+        flow.current[status] += delta
+        for k in range(max(epoch, flow.last - self.__capacity + 1),
+                       flow.last + 1):
+            slot = k % self.__capacity
+            if flow.epochs[slot] == k:
+                _grow(flow.snapshots[slot], size)
+                flow.snapshots[slot][status] += delta
+
+    def __count(self, counters, flow, epoch):
+        slot = epoch % self.__capacity
+        if flow.epochs[slot] == epoch:
+            counters[slot] += 1
+
+    def transition(self, issue, project, status, timestamp, created=False):
+        """Record that an issue entered a status.
+
+        Transitions older than the last one recorded for the issue arrived
+        out of order and are ignored.
+
+        :param issue: the issue ID.
+        :param project: the project key.
+        :type project: `str`
+        :param status: the status name.
+        :type status: `str`
+        :param timestamp: when the issue entered *status* (POSIX time).
+        :type timestamp: `float`
+        :param created: whether the issue was just created.
+        :type created: `bool`
+        """
+        issue = str(issue)
+        epoch = int(timestamp // self.__bucket)
+        with self.__lock:
+            index = self.__statuses.index(status)
+            previous = self.__issues.get(issue)
+            if previous is not None:
+                if timestamp < previous[2]:
+                    logger.debug("ignoring stale transition of issue %s to "
+                                 "%s", issue, status)
+                    return
+                project = previous[0]
+            flow = self.__project(project, epoch)
+            if previous is not None:
+                if previous[1] == index:
+                    self.__issues[issue] = project, index, timestamp
+                    return
+                self.__add(flow, epoch, previous[1], -1)
+            self.__add(flow, epoch, index, +1)
+            self.__issues[issue] = project, index, timestamp
+            if created:
+                self.__count(flow.created, flow, epoch)
+            was_done = (previous is not None and
+                        self.__statuses.names[previous[1]]
+                        in self.__done_statuses)
+            if status in self.__done_statuses and not was_done:
+                self.__count(flow.completed, flow, epoch)
+
+    def remove(self, issue, timestamp):
+        """Record that an issue was deleted.
+
+        :param issue: the issue ID.
+        :param timestamp: when the issue was deleted (POSIX time).
+        :type timestamp: `float`
+        """
+        with self.__lock:
+            previous = self.__issues.pop(str(issue), None)
+            if previous is None:
+                return
+            epoch = int(timestamp // self.__bucket)
+            flow = self.__project(previous[0], epoch)
+            self.__add(flow, epoch, previous[1], -1)
+
+    def current(self, project):
+        """Return the current number of issues per status in a project.
+
+        :param project: the project key.
+        :type project: `str`
+        :rtype: `dict`
+        """
+        flow = self.__projects.get(project)
+        if flow is None:
+            return {}
+        names = self.__statuses.names
+        return {names[index]: count
+                for index, count in enumerate(flow.current) if count}
+
+    def series(self, project, start, end):
+        """Return the cumulative flow and throughput of a project.
+
+        Buckets older than the ring are omitted; buckets after the last
+        event carry the current counts forward.
+
+        :param project: the project key.
+        :type project: `str`
+        :param start: the window start (POSIX time).
+        :type start: `float`
+        :param end: the window end (POSIX time, exclusive).
+        :type end: `float`
+        :return: the buckets overlapping the window, oldest first.
+        :rtype: `list` of `FlowBucket`
+        """
+        flow = self.__projects.get(project)
+        if flow is None:
+            return []
+        names = self.__statuses.names
+        buckets = []
+        with self.__lock:
+            first = int(start // self.__bucket)
+            last = int(-(-end // self.__bucket))
+            for k in range(max(first, flow.last - self.__capacity + 1),
+                           last):
+                slot = k % self.__capacity
+                if k > flow.last:
+                    counts, created, completed = flow.current, 0, 0
+                elif flow.epochs[slot] == k:
+                    counts = flow.snapshots[slot]
+                    created = flow.created[slot]
+                    completed = flow.completed[slot]
+                else:
+                    continue
+                buckets.append(FlowBucket(
+                        k * self.__bucket,
+                        {names[index]: count
+                         for index, count in enumerate(counts) if count},
+                        created, completed))
+        return buckets
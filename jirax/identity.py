@@ -0,0 +1,130 @@
+"""Identity map for Jira resources."""
+
+from collections import OrderedDict
+import logging
+from threading import Lock
+from weakref import WeakValueDictionary
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .util import check_type
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+
+class ResourceIdentityMap(CtorRepr):
+    """Identity map for Jira resources.
+
+    Map a resource type name plus the resource identity (the first of
+    `IDENTITY_FIELDS` found in its raw data) to a shared resource instance.
+    The shared instance is reused only while the raw data it was built from
+    compares equal to the new raw data; otherwise a new instance replaces
+    it.
+
+    Shared instances must be treated as read-only.
+
+    :param max_size:
+        the maximum number of resources to keep, evicting the least recently
+        used ones; if `None` (default), keep resources only as long as they
+        are referenced elsewhere.
+    :type max_size: `int`
+    """
+
+    IDENTITY_FIELDS = ('accountId', 'id', 'key', 'name')
+    """Raw fields that identify a resource, in order of preference."""
+
+    def __init__(self, *poargs, max_size=None, **kwargs):
+        """Initialize this instance."""
+        check_type(max_size, (int, 'NoneType'))
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size {!r} is not positive"
+                             .format(max_size))
+        super().__init__(*poargs, **kwargs)
+        self.__max_size = max_size
+        if max_size is None:
+            self.__resources = WeakValueDictionary()
+        else:
+            self.__resources = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        if self.__max_size is not None:
+            kwargs.update(max_size=self.__max_size)
+
+    @property
+    def max_size(self):  # noqa: D401
+        """The maximum number of resources to keep, if any."""
+        return self.__max_size
+
+    @property
+    def hits(self):  # noqa: D401
+        """How many times a shared instance was returned."""
+        return self.__hits
+
+    @property
+    def misses(self):  # noqa: D401
+        """How many times a new instance had to be created."""
+        return self.__misses
+
+    def __len__(self):
+        """Return the number of resources kept."""
+        return len(self.__resources)
+
+    def clear(self):
+        """Forget all resources."""
+        with self.__lock:
+            self.__resources.clear()
+
+    def identity_of(self, type_name, raw):
+        """Return the identity key of a raw resource.
+
+        :param type_name: the resource type name.
+        :type type_name: `str`
+        :param raw: the raw resource.
+        :type raw: `~collections.abc.Mapping`
+        :return: the key, or `None` if *raw* has no identity field.
+        :rtype: `tuple`
+        """
+        for field in self.IDENTITY_FIELDS:
+            value = raw.get(field)
+            if isinstance(value, (str, int)):
+                return type_name, field, value
+        return None
+
+    def get_or_create(self, type_name, raw, factory):
+        """Return the shared resource for *raw*, creating it if necessary.
+
+        :param type_name: the resource type name.
+        :type type_name: `str`
+        :param raw: the raw resource.
+        :type raw: `~collections.abc.Mapping`
+        :param factory:
+            called with *raw* to create a new resource, which must keep *raw*
+            as its ``raw`` attribute.
+        :type factory: `~collections.abc.Callable`
+        :return: the resource.
+        """
+        key = self.identity_of(type_name, raw)
+        if key is None:
+            return factory(raw)
+        resources = self.__resources
+        with self.__lock:
+            resource = resources.get(key)
+            if resource is not None and resource.raw == raw:
+                self.__hits += 1
+                if self.__max_size is not None:
+                    resources.move_to_end(key)
+                return resource
+        resource = factory(raw)
+        with self.__lock:
+            self.__misses += 1
+            resources[key] = resource
+            if self.__max_size is not None:
+                resources.move_to_end(key)
+                while len(resources) > self.__max_size:
+                    resources.popitem(last=False)
+        return resource
@@ -1,5 +1,6 @@
 """Jira webhook changelog."""
 
+from functools import partial
 from logging import getLogger
 
 from ctorrepr import CtorRepr
@@ -157,9 +158,9 @@ class IssueLink(FromRaw, CtorRepr):
         return self.__is_system
 
     @staticmethod
-    def __convert_link_type(raw):
+    def __convert_link_type(raw, mode):
         try:
-            return IssueLinkType.from_raw(raw)
+            return IssueLinkType.from_raw(raw, mode=mode)
         except InvalidRawData as e:
             raise RawFieldValueError from e
 
@@ -168,7 +169,8 @@ class IssueLink(FromRaw, CtorRepr):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('id', type=int)
         mover.move('type', source_name='issueLinkType', type=dict,
-                   filter=cls.__convert_link_type)
+                   filter=partial(cls.__convert_link_type,
+                                  mode=mover.nested_mode))
         mover.move('source', source_name='sourceIssueId', type=int)
         mover.move('destination', source_name='destinationIssueId',
                    type=int)
@@ -0,0 +1,282 @@
+"""Priority lanes with weighted-fair scheduling by webhook event type."""
+
+from collections import deque, namedtuple
+import json
+import logging
+import os
+from threading import Condition
+from time import monotonic
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .util import check_type
+from .webhook import KNOWN_WEBHOOK_EVENTS
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+SHED = 'shed'
+SPILL = 'spill'
+OVERFLOW_POLICIES = (SHED, SPILL)
+
+Lane = namedtuple('Lane', 'weight, max_depth, overflow')
+Lane.__new__.__defaults__ = (1, None, SHED)
+Lane.__doc__ = """Configuration of a priority lane.
+
+:param weight: the share of dequeues the lane gets while others are busy.
+:param max_depth: the maximum number of queued events, or `None`.
+:param overflow: what to do with events arriving at a full lane:
+    `SHED` drops them, `SPILL` appends them to a spill file.
+"""
+
+LaneStats = namedtuple('LaneStats',
+                       'depth, enqueued, dequeued, shed, spilled')
+LaneStats.__doc__ = """Counters of a priority lane.
+
+:param depth: events currently queued.
+:param enqueued: events queued so far.
+:param dequeued: events taken so far.
+:param shed: events dropped because the lane was full.
+:param spilled: events written to the spill file because the lane was full;
+    events spilled again by `PriorityLanes.replay_spill()` are not counted
+    again.
+"""
+
+
+class _LaneState:
+
+    __slots__ = ('name', 'config', 'queue', 'deficit', 'enqueued',
+                 'dequeued', 'shed', 'spilled')
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.queue = deque()
+        self.deficit = 0
+        self.enqueued = 0
+        self.dequeued = 0
+        self.shed = 0
+        self.spilled = 0
+
+    def stats(self):
+        return LaneStats(len(self.queue), self.enqueued, self.dequeued,
+                         self.shed, self.spilled)
+
+
+class PriorityLanes(CtorRepr):
+    """Queue of raw webhook events split into weighted priority lanes.
+
+    Raw events are routed to a lane by their ``webhookEvent`` type string,
+    read from the envelope without parsing.  `get()` takes events from the
+    lanes in deficit round-robin order, so that while several lanes have
+    events queued, each gets a share of dequeues proportional to its
+    weight; an idle lane's share goes to the others.
+
+    When a lane is full, new events routed to it are shed or spilled to a
+    file according to its `Lane.overflow` policy, before any parsing cost
+    is paid.  Spilled events can be queued again with `replay_spill()`.
+
+    :param lanes: the lane configurations, keyed by lane name, in round-robin
+        order.
+    :type lanes: `~collections.abc.Mapping` of `Lane`
+    :param routes: the lane name of each event type; types must be keys of
+        `.webhook.KNOWN_WEBHOOK_EVENTS`.
+    :type routes: `~collections.abc.Mapping`
+    :param default_lane: the lane of other event types.
+    :type default_lane: `str`
+    :param spill_dir: the directory of spill files, required if any lane
+        spills.
+    :type spill_dir: `str`
+    :raise `ValueError`: if the configuration is inconsistent.
+    """
+
+    def __init__(self, *poargs, lanes, routes, default_lane, spill_dir=None,
+                 **kwargs):
+        """Initialize this instance."""
+        check_type(default_lane, str)
+        super().__init__(*poargs, **kwargs)
+        self.__lanes = {}
+        for name, config in lanes.items():
+            check_type(config, Lane)
+            if not isinstance(config.weight, int) or config.weight <= 0:
+                raise ValueError("lane {!r} weight {!r} is not a positive "
+                                 "integer".format(name, config.weight))
+            if config.overflow not in OVERFLOW_POLICIES:
+                raise ValueError("lane {!r} overflow {!r} is not one of {}"
+                                 .format(name, config.overflow,
+                                         OVERFLOW_POLICIES))
+            if config.overflow == SPILL and spill_dir is None:
+                raise ValueError("lane {!r} spills but spill_dir is not set"
+                                 .format(name))
+            self.__lanes[name] = _LaneState(name, config)
+        if not self.__lanes:
+            raise ValueError("no lanes")
+        for type, lane in routes.items():
+            if type not in KNOWN_WEBHOOK_EVENTS:
+                raise ValueError("unknown webhook event type {!r}"
+                                 .format(type))
+            if lane not in self.__lanes:
+                raise ValueError("unknown lane {!r} for {!r}"
+                                 .format(lane, type))
+        if default_lane not in self.__lanes:
+            raise ValueError("unknown default lane {!r}".format(default_lane))
+        self.__routes = dict(routes)
+        self.__default_lane = default_lane
+        self.__spill_dir = spill_dir
+        self.__order = list(self.__lanes.values())
+        self.__current = 0
+        self.__depth = 0
+        self.__condition = Condition()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(lanes={name: lane.config
+                             for name, lane in self.__lanes.items()},
+                      routes=self.__routes, default_lane=self.__default_lane)
+        if self.__spill_dir is not None:
+            kwargs.update(spill_dir=self.__spill_dir)
+
+    def __len__(self):
+        """Return the number of events queued in all lanes."""
+        return self.__depth
+
+    def lane_of(self, raw):
+        """Return the lane name of a raw webhook event.
+
+        :param raw: the raw webhook event.
+        :type raw: `~collections.abc.Mapping`
+        :rtype: `str`
+        """
+        type = raw.get('webhookEvent')
+        try:
+            return self.__routes[type]
+        except (KeyError, TypeError):
+            return self.__default_lane
+
+    def spill_path(self, lane):
+        """Return the spill file path of a lane.
+
+        :param lane: the lane name.
+        :type lane: `str`
+        :rtype: `str`
+        """
+        return os.path.join(self.__spill_dir, '{}.jsonl'.format(lane))
+
+    def put(self, raw):
+        """Queue a raw webhook event in its lane.
+
+        :param raw: the raw webhook event.
+        :type raw: `~collections.abc.Mapping`
+        :return: whether the event was queued (rather than shed or spilled).
+        :rtype: `bool`
+        """
+        return self.__put(raw, False)
+
+    def __put(self, raw, replaying):
+        with self.__condition:
+            lane = self.__lanes[self.lane_of(raw)]
+            config = lane.config
+            if (config.max_depth is not None and
+                    len(lane.queue) >= config.max_depth):
+                if config.overflow == SPILL:
+                    with open(self.spill_path(lane.name), 'a') as f:
+                        f.write(json.dumps(raw, separators=(',', ':')))
+                        f.write('\n')
+                    if not replaying:
+                        lane.spilled += 1
+                else:
+                    lane.shed += 1
+                    logger.debug("shedding %s event from full lane %s",
+                                 raw.get('webhookEvent'), lane.name)
+                return False
+            lane.queue.append(raw)
+            lane.enqueued += 1
+            self.__depth += 1
+            self.__condition.notify()
+            return True
+
+    def __take(self):
+        # Deficit round robin with a quantum of the lane weight per visit.
+        order = self.__order
+        while True:
+            lane = order[self.__current]
+            if lane.queue and lane.deficit > 0:
+                lane.deficit -= 1
+                lane.dequeued += 1
+                self.__depth -= 1
+                raw = lane.queue.popleft()
+                if not lane.queue:
+                    lane.deficit = 0
+                return raw
+            if not lane.queue:
+                lane.deficit = 0
+            self.__current = (self.__current + 1) % len(order)
+            next_lane = order[self.__current]
+            if next_lane.queue:
+                next_lane.deficit += next_lane.config.weight
+
+    def get(self, timeout=None):
+        """Take the next raw webhook event.
+
+        :param timeout: the maximum time to wait, in seconds (default: wait
+            forever).
+        :type timeout: `float`
+        :return: the raw event, or `None` on timeout.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.__condition:
+            while not self.__depth:
+                remaining = (None if deadline is None
+                             else deadline - monotonic())
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.__condition.wait(remaining)
+            return self.__take()
+
+    def replay_spill(self, lane):
+        """Queue the events spilled from a lane again.
+
+        The spill file is consumed; events that overflow the lane again are
+        shed or spilled anew.  Events left over by an interrupted replay are
+        replayed first, and lines that cannot be decoded are logged and
+        skipped.
+
+        :param lane: the lane name.
+        :type lane: `str`
+        :return: the number of events queued.
+        :rtype: `int`
+        """
+        path = self.spill_path(lane)
+        replay_path = '{}.replay'.format(path)
+        queued = 0
+        if os.path.exists(replay_path):
+            queued += self.__replay(replay_path)
+        with self.__condition:
+            try:
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                return queued
+        return queued + self.__replay(replay_path)
+
+    def __replay(self, path):
+        queued = 0
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    raw = json.loads(line)
+                except ValueError:
+                    logger.warning("skipping undecodable line %d of %s",
+                                   number, path)
+                    continue
+                queued += self.__put(raw, True)
+        os.remove(path)
+        return queued
+
+    def stats(self):
+        """Return the counters of each lane.
+
+        :return: the counters, keyed by lane name.
+        :rtype: `dict` of `LaneStats`
+        """
+        with self.__condition:
+            return {name: lane.stats() for name, lane in self.__lanes.items()}
@@ -5,6 +5,9 @@
 import logging
 from threading import local as tls
 
+thread_local = tls()
+"""Thread-local storage consulted by `LoggerProxy`."""
+
 _logger = logging.getLogger(__name__)
 
 if __name__ == '__main__':
@@ -46,16 +49,32 @@ LEVEL_NAMES = ['DEBUG5', 'DEBUG4', 'DEBUG3', 'DEBUG2', 'DEBUG1', 'DEBUG',
 
 _add_level_names(LEVEL_NAMES)
 
+_LEVEL_METHODS = {name.lower(): globals()[name] for name in LEVEL_NAMES}
+
+
+def _make_level_method(logger, level):
+    def log(msg, *poargs, **kwargs):
+        if logger.isEnabledFor(level):
+            logger._log(level, msg, poargs, **kwargs)
+    log.__name__ = log.__qualname__ = logging.getLevelName(level).lower()
+    return log
+
 
 class LoggerProxy:
     """Logger proxy.
 
     Proxy to the first logger defined in the following sequence:
 
-    - One defined in the thread-local storage under the given *logger_name*;
+    - One defined in `thread_local` under the given *logger_name*;
     - One supplied as the *default_logger*; or
     - The root logger.
 
+    Level methods (``debug()``, ``debug3()``, ``notice()``…) are resolved
+    once per underlying logger and cached.  Synthesized methods for extended
+    levels check `~logging.Logger.isEnabledFor()` before doing anything else,
+    so callers may also use ``isEnabledFor()`` to skip formatting arguments
+    for disabled levels.
+
     :param logger_name:
         the thread-local storage attribute name that has the thread-local
         logger.
@@ -70,10 +89,11 @@ class LoggerProxy:
         super().__init__(*poargs, **kwargs)
         self.__logger_name = logger_name
         self.__default_logger = default_logger
+        self.__methods = {}
 
     def __get_logger(self):
         try:
-            return getattr(tls(), self.__logger_name)
+            return getattr(thread_local, self.__logger_name)
         except AttributeError:
             if self.__default_logger is not None:
                 return self.__default_logger
@@ -88,10 +108,19 @@ class LoggerProxy:
         """
         logger = self.__get_logger()
         try:
-            return getattr(logger, name)
+            methods = self.__methods[logger]
+        except KeyError:
+            methods = self.__methods[logger] = {}
+        try:
+            return methods[name]
+        except KeyError:
+            pass
+        try:
+            attr = getattr(logger, name)
         except AttributeError:
-            if name == name.lower() and name.upper() in LEVEL_NAMES:
-                level = globals()[name.upper()]
-                return (lambda *poargs, **kwargs:
-                        logger.log(level, *poargs, **kwargs))
-            raise
+            if name not in _LEVEL_METHODS:
+                raise
+            attr = _make_level_method(logger, _LEVEL_METHODS[name])
+        if name in _LEVEL_METHODS:
+            methods[name] = attr
+        return attr
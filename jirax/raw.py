@@ -5,7 +5,6 @@ from collections.abc import Callable, Iterable, Mapping, MutableMapping
 import logging
 
 from ctorrepr import CtorRepr
-from jira.resilientsession import ResilientSession
 
 from .logging import LoggerProxy
 from .util import is_of_type, check_type, type_names
@@ -181,27 +180,181 @@ class ExtraRawFields(InvalidRawData):
                 ", ".join(sorted(self.__fields)))
 
 
+class RawProjection(CtorRepr):
+    """An allow-list of raw field paths.
+
+    Applying a projection to raw data returns a pruned copy that contains
+    only the listed paths.  Only the mappings along the kept paths are
+    copied; kept values are shared with the original.
+
+    :param paths:
+        dotted field paths to keep, e.g. ``['key', 'fields.status']``.  A
+        path keeps its whole subtree; missing fields are silently skipped.
+    :type paths: `~collections.abc.Iterable` of `str`
+    """
+
+    def __init__(self, *poargs, paths, **kwargs):
+        """Initialize this instance."""
+        check_type(paths, Iterable)
+        paths = tuple(paths)
+        tree = {}
+        for path in paths:
+            check_type(path, str)
+            *parents, leaf = path.split('.')
+            node = tree
+            for name in parents:
+                child = node.setdefault(name, {})
+                if child is None:
+                    break
+                node = child
+            else:
+                node[leaf] = None
+        super().__init__(*poargs, **kwargs)
+        self.__paths = paths
+        self.__tree = tree
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(paths=self.__paths)
+
+    @property
+    def paths(self):  # noqa: D401
+        """The dotted field paths to keep."""
+        return self.__paths
+
+    @classmethod
+    def __apply(cls, raw, tree):
+        if not isinstance(raw, Mapping):
+            return raw
+        pruned = {}
+        for name, subtree in tree.items():
+            try:
+                value = raw[name]
+            except KeyError:
+                continue
+            pruned[name] = (value if subtree is None
+                            else cls.__apply(value, subtree))
+        return pruned
+
+    def apply(self, raw):
+        """Return a pruned copy of *raw*.
+
+        :param raw: the raw data.
+        :type raw: `~collections.abc.Mapping`
+        :return: the pruned raw data.
+        :rtype: `dict`
+        """
+        return self.__apply(raw, self.__tree)
+
+
+def project_raw(raw, project):
+    """Apply field projections to the top-level fields of raw data.
+
+    :param raw: the raw data.
+    :type raw: `~collections.abc.Mapping`
+    :param project:
+        projections, keyed by top-level field name.  Each projection is a
+        `RawProjection` or an iterable of paths to construct one from.
+        Top-level fields without a projection are kept as is.
+    :type project: `~collections.abc.Mapping`
+    :return: the projected raw data (*raw* itself if nothing was projected).
+    :rtype: `~collections.abc.Mapping`
+    """
+    check_type(project, Mapping)
+    projected = None
+    for name, projection in project.items():
+        if name not in raw:
+            continue
+        if not isinstance(projection, RawProjection):
+            projection = RawProjection(paths=projection)
+        if projected is None:
+            projected = dict(raw)
+        projected[name] = projection.apply(raw[name])
+    return raw if projected is None else projected
+
+
+class _UnmovedFields(Mapping):
+    """Fields of a raw mapping that have not been moved, computed on read."""
+
+    def __init__(self, source, moved):
+        self.__source = source
+        self.__moved = moved
+
+    def __getitem__(self, key):
+        if key in self.__moved:
+            raise KeyError(key)
+        return self.__source[key]
+
+    def __iter__(self):
+        moved = self.__moved
+        return (key for key in self.__source if key not in moved)
+
+    def __len__(self):
+        return len(self.__source) - len(self.__moved)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class RawFieldMover:
     """Move raw fields.
 
+    The *mode* determines how the mover keeps track of the fields that
+    remain to be moved:
+
+    `COPY`
+        Copy *source* up front and pop fields from the copy.  This is the
+        default, and leaves *source* intact.
+    `CONSUME`
+        Pop fields from *source* itself, which must be mutable.  The caller
+        transfers ownership of *source*, which is left holding only the
+        unmoved fields.  Errors still report the whole of *source*, and
+        `restore()` puts the moved fields back.  Nested raw data is parsed
+        in `TRACK` mode (see `nested_mode`), so it stays intact.
+    `TRACK`
+        Record the names of moved fields and read values from *source*
+        without copying it.  `remaining` is then a read-only view of the
+        unmoved fields, computed only when read.
+
     :param kind: the kind of raw source data.
     :type kind: `str`
     :param source: the raw source data.
     :type source: `~collections.abc.Mapping`
     :param target: where to move the fields.
     :type target: `~collections.abc.MutableMapping`
+    :param mode: `COPY` (default), `CONSUME` or `TRACK`.
+    :type mode: `str`
     """
 
-    def __init__(self, *poargs, kind, source, target, **kwargs):
+    COPY = 'copy'
+    CONSUME = 'consume'
+    TRACK = 'track'
+    MODES = frozenset({COPY, CONSUME, TRACK})
+
+    def __init__(self, *poargs, kind, source, target, mode=COPY, **kwargs):
         """Initialize this instance."""
         check_type(kind, str)
         check_type(source, Mapping)
         check_type(target, MutableMapping)
+        if mode not in self.MODES:
+            raise ValueError("invalid mode {!r}, should be one of: {}"
+                             .format(mode, ", ".join(sorted(self.MODES))))
         super().__init__(*poargs, **kwargs)
         self.__source = source
         self.__target = target
         self.__kind = kind
-        self.__remaining = dict(source)
+        self.__mode = mode
+        self.__moved = None
+        self.__consumed = None
+        if mode == self.CONSUME:
+            check_type(source, MutableMapping)
+            self.__remaining = source
+            self.__consumed = {}
+        elif mode == self.TRACK:
+            self.__remaining = None
+            self.__moved = set()
+        else:
+            self.__remaining = dict(source)
 
     @property
     def kind(self):  # noqa: D401
@@ -218,11 +371,76 @@ class RawFieldMover:
         """Where to move the fields."""
         return self.__target
 
+    @property
+    def mode(self):  # noqa: D401
+        """How the mover tracks remaining fields."""
+        return self.__mode
+
+    @property
+    def nested_mode(self):  # noqa: D401
+        """The mode in which to parse nested raw data.
+
+        This is `mode`, except that nested data is tracked rather than
+        consumed, so that an error reported later can still show it.
+        """
+        if self.__mode == self.CONSUME:
+            return self.TRACK
+        return self.__mode
+
     @property
     def remaining(self):  # noqa: D401
         """The remaining raw source data."""
+        if self.__moved is not None:
+            return _UnmovedFields(self.__source, self.__moved)
         return self.__remaining
 
+    def __pop(self, name):
+        if self.__moved is None:
+            value = self.__remaining.pop(name)
+            if self.__consumed is not None:
+                self.__consumed[name] = value
+            return value
+        if name in self.__moved:
+            raise KeyError(name)
+        value = self.__source[name]
+        self.__moved.add(name)
+        return value
+
+    def __raw_to_report(self):
+        if not self.__consumed:
+            return self.__source
+        raw = dict(self.__consumed)
+        raw.update(self.__source)
+        return raw
+
+    def restore(self):
+        """Put the fields consumed so far back into the source.
+
+        This only does something in `CONSUME` mode, for when the parsing
+        fails.
+        """
+        if self.__consumed:
+            self.__source.update(self.__consumed)
+            self.__consumed.clear()
+
+    def nested(self, cls, strict=True):
+        """Return a filter that constructs a `FromRaw` from a nested field.
+
+        The nested raw data is parsed in `nested_mode`.
+
+        :param cls: the type to construct.
+        :type cls: `type`
+        :param strict: passed to `FromRaw.from_raw()`.
+        :return: the filter.
+        :rtype: `~collections.abc.Callable`
+        """
+        mode = self.nested_mode
+
+        def convert(raw):
+            return cls.from_raw(raw, strict=strict, mode=mode)
+
+        return convert
+
     def move(self, name, type=None, filter=None, source_name=None,
              required=True):
         """Move a field.
@@ -246,22 +464,24 @@ class RawFieldMover:
         else:
             check_type(source_name, str)
         try:
-            value = self.__remaining.pop(source_name)
+            value = self.__pop(source_name)
         except KeyError:
             if required:
-                raise MissingRawField(raw=self.__source, kind=self.__kind,
+                raise MissingRawField(raw=self.__raw_to_report(),
+                                      kind=self.__kind,
                                       name=source_name) from None
             value = None
         else:
             if type_ is not None and not is_of_type(value, type_):
-                raise InvalidRawFieldType(raw=self.__source, kind=self.__kind,
+                raise InvalidRawFieldType(raw=self.__raw_to_report(),
+                                          kind=self.__kind,
                                           name=source_name, value=value,
                                           type=type_)
             if filter_ is not None:
                 try:
                     value = filter_(value)
                 except RawFieldValueError as e:
-                    raise InvalidRawFieldValue(raw=self.__source,
+                    raise InvalidRawFieldValue(raw=self.__raw_to_report(),
                                                kind=self.__kind,
                                                name=source_name,
                                                value=value) from e
@@ -280,13 +500,13 @@ class RawFieldMover:
         :rtype: `~collections.abc.Set`
         :raise `ExtraRawFields`: if there are still fields to move.
         """
-        fields = self.__remaining.keys()
+        fields = self.remaining.keys()
         if fields:
-            exc = ExtraRawFields(raw=self.__source, kind=self.__kind,
-                                 fields=self.__remaining.keys())
+            exc = ExtraRawFields(raw=self.__raw_to_report(), kind=self.__kind,
+                                 fields=fields)
             if strict:
                 raise exc
-            logger.warn(exc)
+            logger.warning(exc)
         return fields
 
 
@@ -322,39 +542,111 @@ class FromRaw(CtorRepr):
         """Collect ``__init__()`` arguments from raw data."""
 
     @classmethod
-    def from_raw(cls, raw, strict=True):
-        """Create a new instance from raw data."""
+    def from_raw(cls, raw, strict=True, mode=RawFieldMover.COPY):
+        """Create a new instance from raw data.
+
+        :param raw: the raw data.
+        :type raw: `~collections.abc.Mapping`
+        :param strict:
+            whether to raise `ExtraRawFields` (`True`), warn (`False`), or do
+            nothing (`None`) about unparsed fields.
+        :param mode:
+            how to track remaining fields; see `RawFieldMover`.  With
+            `RawFieldMover.CONSUME`, *raw* is consumed in place, unless it
+            is invalid.
+        :type mode: `str`
+        """
         check_type(raw, Mapping)
         kwargs = {}
-        mover = RawFieldMover(kind=cls.KIND, source=raw, target=kwargs)
-        cls._collect_ctor_args_from_raw(mover)
-        if strict is not None:
-            mover.check_extra(strict=strict)
-        return cls(extras=mover.remaining, **kwargs)
+        mover = RawFieldMover(kind=cls.KIND, source=raw, target=kwargs,
+                              mode=mode)
+        try:
+            cls._collect_ctor_args_from_raw(mover)
+            if strict is not None:
+                mover.check_extra(strict=strict)
+            return cls(extras=mover.remaining, **kwargs)
+        except Exception:
+            mover.restore()
+            raise
+
+
+def jira_resource_type(name):
+    """Return a Jira resource type by name.
 
+    `jira.resources` (and with it the whole `jira` client stack) is imported
+    on the first call, not when jirax is imported.
 
-def raw_to_jira_resource(type, options={}, session=ResilientSession):
+    :param name: the resource type name, e.g. ``'Issue'``.
+    :type name: `str`
+    :return: the resource type.
+    :rtype: `type`
+    """
+    check_type(name, str)
+    from jira import resources
+    return getattr(resources, name)
+
+
+_resource_identity_map = None
+
+
+def set_resource_identity_map(identity_map):
+    """Set the identity map used by `raw_to_jira_resource()` converters.
+
+    Once set, converting raw data equal to that of a previously converted
+    resource of the same type and identity returns the same instance.
+
+    :param identity_map: the identity map, or `None` to disable sharing.
+    :type identity_map: `.identity.ResourceIdentityMap`
+    :return: the previous identity map, if any.
+    :rtype: `.identity.ResourceIdentityMap`
+    """
+    global _resource_identity_map
+    previous = _resource_identity_map
+    _resource_identity_map = identity_map
+    return previous
+
+
+def raw_to_jira_resource(type, options={}, session=None):
     """Return a function that converts raw data into a Jira resource.
 
     :param type:
         the desired Jira resource type (a subclass of
-        `~jira.resources.Resource`).
-    :type type: `type`.
+        `~jira.resources.Resource`), or its name in `jira.resources`.  A name
+        is resolved using `jira_resource_type()` on the first conversion.
+    :type type: `type` or `str`
     :param options: the options to pass to the resource constructor.
     :type options: `~collections.abc.Mapping`
-    :param session: the requests session to pass to the resource constructor.
+    :param session:
+        the requests session to pass to the resource constructor (default:
+        `~jira.resilientsession.ResilientSession`).
     :type session: `~requests.sessions.Session`
     :return: the converter function.
     :rtype: `~collections.abc.Callable`
+
+    If an identity map has been set with `set_resource_identity_map()`, the
+    converter returns shared instances from it.
     """
     type_ = type
     from builtins import type
+    type_name = type_ if isinstance(type_, str) else type_.__name__
 
-    def converter(raw):
+    def create(raw):
+        resource_type = (jira_resource_type(type_) if isinstance(type_, str)
+                         else type_)
+        if session is None:
+            from jira.resilientsession import ResilientSession as session_
+        else:
+            session_ = session
         try:
-            return type_(options=options, session=session, raw=raw)
+            return resource_type(options=options, session=session_, raw=raw)
         except Exception as e:
             raise RawFieldValueError("invalid Jira {}"
-                                     .format(type_.__name__)) from e
+                                     .format(type_name)) from e
+
+    def converter(raw):
+        identity_map = _resource_identity_map
+        if identity_map is None:
+            return create(raw)
+        return identity_map.get_or_create(type_name, raw, create)
 
     return converter
@@ -0,0 +1,344 @@
+"""Multi-process webhook HTTP receiver sharing a port with SO_REUSEPORT."""
+
+import asyncio
+from collections import namedtuple
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+import os
+import signal
+import socket
+import threading
+import time
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .raw import InvalidRawData
+from .util import check_type
+from .webhook import webhook_event_from_bytes
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+ReceiverMetrics = namedtuple('ReceiverMetrics',
+                             'received, handled, invalid, failed')
+ReceiverMetrics.__doc__ = """Request counters of a webhook receiver.
+
+:param received: webhook requests received.
+:param handled: events parsed and handled successfully.
+:param invalid: requests rejected as invalid webhook events.
+:param failed: events that failed to parse unexpectedly, or whose handler
+    raised an exception.
+"""
+
+_RECEIVED, _HANDLED, _INVALID, _FAILED = range(4)
+_COUNTERS = len(ReceiverMetrics._fields)
+
+_REASONS = {204: 'No Content', 400: 'Bad Request', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class _Connection:
+    """HTTP/1.1 connection serving webhook POST requests."""
+
+    def __init__(self, handler, strict, counters, base, max_body):
+        self.handler = handler
+        self.strict = strict
+        self.counters = counters
+        self.base = base
+        self.max_body = max_body
+        self.idle = set()
+        self.closing = False
+
+    def count(self, counter):
+        self.counters[self.base + counter] += 1
+
+    def close_idle(self):
+        """Stop keeping connections alive, and close the idle ones."""
+        self.closing = True
+        for task in self.idle:
+            task.cancel()
+
+    async def serve(self, reader, writer):
+        task = asyncio.current_task()
+        try:
+            while not self.closing:
+                self.idle.add(task)
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                finally:
+                    self.idle.discard(task)
+                if not await self.serve_one(head, reader, writer):
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_one(self, head, reader, writer):
+        lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            method, _, version = lines[0].split(' ', 2)
+            length = int(headers.get('content-length', 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            return await self.respond(writer, 400, False)
+        keep_alive = (version == 'HTTP/1.1' and not self.closing and
+                      headers.get('connection', '').lower() != 'close')
+        if length > self.max_body:
+            status, keep_alive = 413, False
+        else:
+            body = await reader.readexactly(length)
+            status = (self.handle(body) if method == 'POST' else 405)
+        return await self.respond(writer, status, keep_alive)
+
+    async def respond(self, writer, status, keep_alive):
+        writer.write('HTTP/1.1 {} {}\r\nContent-Length: 0\r\n{}\r\n'.format(
+                status, _REASONS[status],
+                '' if keep_alive else 'Connection: close\r\n').encode())
+        await writer.drain()
+        return keep_alive
+
+    def handle(self, body):
+        self.count(_RECEIVED)
+        try:
+            event = webhook_event_from_bytes(body, strict=self.strict)
+        except InvalidRawData as e:
+            self.count(_INVALID)
+            logger.warning("rejecting invalid webhook event: %s", e)
+            return 400
+        except Exception:
+            self.count(_FAILED)
+            logger.exception("failed to parse webhook event")
+            return 500
+        try:
+            self.handler(event)
+        except Exception:
+            self.count(_FAILED)
+            logger.exception("webhook event handler failed")
+            return 500
+        self.count(_HANDLED)
+        return 204
+
+
+async def _serve(host, port, connection, drain_timeout):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    tasks = set()
+
+    def on_connect(reader, writer):
+        task = loop.create_task(connection.serve(reader, writer))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    server = await asyncio.start_server(on_connect, host, port,
+                                        reuse_port=True)
+    await stop.wait()
+    server.close()
+    connection.close_idle()
+    if tasks:
+        _, pending = await asyncio.wait(set(tasks), timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+    await server.wait_closed()
+
+
+def _worker_main(index, host, port, handler, strict, counters, max_body,
+                 drain_timeout):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    connection = _Connection(handler, strict, counters, index * _COUNTERS,
+                             max_body)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(_serve(host, port, connection,
+                                       drain_timeout))
+    finally:
+        loop.close()
+
+
+class MultiWorkerReceiver(CtorRepr):
+    """Webhook HTTP receiver running in several worker processes.
+
+    Each worker process runs its own asyncio event loop, listening on the
+    same address with ``SO_REUSEPORT`` (Linux 3.9 or later) so that the
+    kernel spreads incoming connections among them.  Workers parse each
+    POST body with `.webhook.webhook_event_from_bytes()` and pass the event
+    to *handler*, answering 204 on success, 400 for an invalid event or a
+    malformed request, and 500 if parsing fails unexpectedly or the handler
+    fails.
+
+    `run()` supervises the workers: crashed workers are restarted, and on
+    SIGTERM or SIGINT (or `stop()`), workers stop accepting connections,
+    close idle keep-alive connections, finish the requests in progress for
+    up to *drain_timeout* seconds, and exit.  `metrics()` sums the
+    per-worker counters, which survive worker restarts.
+
+    See ``benchmarks/receiver_load.py`` for a single-machine load test.
+
+    :param handler: called in the worker with each parsed
+        `.webhook.WebhookEvent`; with the ``spawn`` start method it must be
+        picklable.
+    :type handler: `~collections.abc.Callable`
+    :param host: the address to listen on.
+    :type host: `str`
+    :param port: the port to listen on; 0 picks a free one, see `port`.
+    :type port: `int`
+    :param workers: the number of worker processes (default: one per CPU).
+    :type workers: `int`
+    :param strict: see `.webhook.webhook_event_from_raw()`.
+    :type strict: `bool`
+    :param max_body: the maximum request body size, in bytes.
+    :type max_body: `int`
+    :param drain_timeout: how long to wait for requests in progress when
+        stopping, in seconds.
+    :type drain_timeout: `float`
+    :param restart_delay: the minimum time between restarts of a worker,
+        in seconds.
+    :type restart_delay: `float`
+    :param context: the multiprocessing context (default: the default one).
+    """
+
+    def __init__(self, *poargs, handler, host='0.0.0.0', port=8080,
+                 workers=None, strict=True, max_body=10 * 1024 * 1024,
+                 drain_timeout=10.0, restart_delay=1.0, context=None,
+                 **kwargs):
+        """Initialize this instance."""
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        check_type(workers, int)
+        if workers <= 0:
+            raise ValueError("workers {!r} is not positive".format(workers))
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise OSError("SO_REUSEPORT is not supported on this platform")
+        super().__init__(*poargs, **kwargs)
+        self.__handler = handler
+        self.__host = host
+        self.__port = port
+        self.__workers = workers
+        self.__strict = strict
+        self.__max_body = max_body
+        self.__drain_timeout = drain_timeout
+        self.__restart_delay = restart_delay
+        self.__context = context or multiprocessing.get_context()
+        self.__counters = self.__context.Array('Q', workers * _COUNTERS,
+                                               lock=False)
+        self.__processes = [None] * workers
+        self.__started = [0.0] * workers
+        self.__restarts = 0
+        self.__socket = None
+        self.__stopping = threading.Event()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(handler=self.__handler, host=self.__host,
+                      port=self.__port, workers=self.__workers)
+
+    @property
+    def port(self):  # noqa: D401
+        """The port listened on; resolved by `start()` if 0 was given."""
+        return self.__port
+
+    @property
+    def restarts(self):  # noqa: D401
+        """How many times a crashed worker was restarted."""
+        return self.__restarts
+
+    def __spawn(self, index):
+        process = self.__context.Process(
+                target=_worker_main, name='receiver-{}'.format(index),
+                args=(index, self.__host, self.__port, self.__handler,
+                      self.__strict, self.__counters, self.__max_body,
+                      self.__drain_timeout))
+        process.start()
+        self.__processes[index] = process
+        self.__started[index] = time.monotonic()
+
+    def start(self):
+        """Start the worker processes.
+
+        A socket bound to the address, but not listening, is kept open to
+        reserve the port between worker restarts.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.__host, self.__port))
+        self.__socket = sock
+        self.__port = sock.getsockname()[1]
+        for index in range(self.__workers):
+            self.__spawn(index)
+        logger.info("receiving webhooks on %s:%d with %d workers",
+                    self.__host, self.__port, self.__workers)
+
+    def stop(self):
+        """Ask `run()` to stop; safe to call from a signal handler."""
+        self.__stopping.set()
+
+    def run(self):
+        """Start the workers if needed, and supervise them until stopped.
+
+        When called from the main thread, SIGTERM and SIGINT call `stop()`.
+        """
+        if self.__socket is None:
+            self.start()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *args: self.stop())
+        try:
+            while not self.__stopping.is_set():
+                wait([process.sentinel for process in self.__processes],
+                     timeout=0.1)
+                for index, process in enumerate(self.__processes):
+                    if process.is_alive() or self.__stopping.is_set():
+                        continue
+                    if (time.monotonic() - self.__started[index] <
+                            self.__restart_delay):
+                        continue
+                    logger.warning("%s exited with %s; restarting",
+                                   process.name, process.exitcode)
+                    self.__restarts += 1
+                    self.__spawn(index)
+        finally:
+            self.__shutdown()
+
+    def __shutdown(self):
+        for process in self.__processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.__drain_timeout + 5
+        for process in self.__processes:
+            if process is not None:
+                process.join(max(0, deadline - time.monotonic()))
+                if process.is_alive():
+                    logger.warning("killing %s", process.name)
+                    process.kill()
+                    process.join()
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
+        logger.info("webhook receiver stopped")
+
+    def worker_metrics(self):
+        """Return the counters of each worker.
+
+        :return: the counters, by worker index.
+        :rtype: `list` of `ReceiverMetrics`
+        """
+        counters = self.__counters
+        return [ReceiverMetrics(*counters[base:base + _COUNTERS])
+                for base in range(0, len(counters), _COUNTERS)]
+
+    def metrics(self):
+        """Return the counters summed over all workers.
+
+        :rtype: `ReceiverMetrics`
+        """
+        return ReceiverMetrics(*map(sum, zip(*self.worker_metrics())))
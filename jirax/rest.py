@@ -0,0 +1,575 @@
+"""Batched Jira REST access."""
+
+from collections import namedtuple
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+import logging
+from threading import Condition, Thread
+from time import monotonic, sleep
+from urllib.parse import quote
+
+from ctorrepr import CtorRepr
+
+from .changelog import HistoricalChange
+from .logging import LoggerProxy
+from .raw import raw_to_jira_resource
+from .util import check_type
+from .webhook import WithIssue
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+
+def pooled_session(pool_size=10, session=None):
+    """Return a Jira REST session with a connection pool of the given size.
+
+    The default session does not retry by itself, as `get_json()` and
+    `post_json()` do.  Avoid passing a
+    `~jira.resilientsession.ResilientSession`, whose own retries would
+    multiply theirs.
+
+    :param pool_size: the maximum number of pooled connections per host.
+    :type pool_size: `int`
+    :param session:
+        the session to configure, e.g. one with authentication already set
+        up (default: a new `~requests.Session`).
+    :type session: `~requests.Session`
+    :return: the session.
+    :rtype: `~requests.Session`
+    """
+    check_type(pool_size, int)
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+    if session is None:
+        session = Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+"""HTTP status codes that are retried with backoff."""
+
+
+def get_json(session, url, params=None, max_retries=5, backoff=0.5):
+    """GET a JSON document, retrying transient failures with backoff.
+
+    Connection errors and `RETRY_STATUSES` responses are retried up to
+    *max_retries* times, waiting *backoff* seconds before the first retry and
+    doubling the wait each time, or longer if the server sends
+    ``Retry-After``.
+
+    :param session: the REST session.
+    :type session: `~requests.Session`
+    :param url: the URL.
+    :type url: `str`
+    :param params: the query parameters.
+    :type params: `~collections.abc.Mapping`
+    :param max_retries: the maximum number of retries.
+    :type max_retries: `int`
+    :param backoff: the initial retry delay, in seconds.
+    :type backoff: `float`
+    :return: the decoded document.
+    :raise `~requests.RequestException`: if the request ultimately failed.
+    :raise `~jira.exceptions.JIRAError`:
+        if the request ultimately failed using a
+        `~jira.resilientsession.ResilientSession`.
+    """
+    return _request_json(session, 'GET', url, max_retries, backoff,
+                         params=params)
+
+
+def post_json(session, url, json, max_retries=5, backoff=0.5):
+    """POST a JSON document and return the JSON response.
+
+    Only use this for requests that are safe to repeat, such as searches:
+    failures are retried as by `get_json()`.
+
+    :param session: the REST session.
+    :type session: `~requests.Session`
+    :param url: the URL.
+    :type url: `str`
+    :param json: the request body.
+    :param max_retries: see `get_json()`.
+    :type max_retries: `int`
+    :param backoff: see `get_json()`.
+    :type backoff: `float`
+    :return: the decoded document.
+    :raise `~requests.RequestException`: if the request ultimately failed.
+    :raise `~jira.exceptions.JIRAError`:
+        if the request ultimately failed using a
+        `~jira.resilientsession.ResilientSession`.
+    """
+    return _request_json(session, 'POST', url, max_retries, backoff,
+                         json=json)
+
+
+def _status_code(e):
+    response = getattr(e, 'response', None)
+    return None if response is None else response.status_code
+
+
+def _request_json(session, method, url, max_retries, backoff, **kwargs):
+    from jira.exceptions import JIRAError
+    from requests import RequestException
+    attempt = 0
+    while True:
+        retry_after = None
+        try:
+            response = session.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except (RequestException, JIRAError) as e:
+            status_code = _status_code(e)
+            if status_code is not None:
+                if status_code not in RETRY_STATUSES:
+                    raise
+                retry_after = e.response.headers.get('Retry-After')
+            if attempt >= max_retries:
+                raise
+            delay = backoff * 2 ** attempt
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            logger.debug("%s %s failed (%s), retrying in %.1f s",
+                         method, url, e, delay)
+        sleep(delay)
+        attempt += 1
+
+
+class IssueFetcher(CtorRepr):
+    """Fetch Jira issues in batches with JQL ``key in (...)`` searches.
+
+    :param server: the Jira base URL, e.g. ``'https://example.atlassian.net'``.
+    :type server: `str`
+    :param session:
+        the REST session (default: a new `pooled_session()`).
+    :type session: `~requests.Session`
+    :param batch_size: the maximum number of issues per search request.
+    :type batch_size: `int`
+    :param fields: the issue fields to fetch.
+    :type fields: `~collections.abc.Iterable` of `str`
+    :param expand: what to expand in fetched issues, e.g. ``'renderedFields'``.
+    :type expand: `~collections.abc.Iterable` of `str`
+    :param max_retries: see `get_json()`.
+    :type max_retries: `int`
+    :param backoff: see `get_json()`.
+    :type backoff: `float`
+    """
+
+    def __init__(self, *poargs, server, session=None, batch_size=100,
+                 fields=('*all',), expand=(), max_retries=5, backoff=0.5,
+                 **kwargs):
+        """Initialize this instance."""
+        check_type(server, str)
+        check_type(batch_size, int)
+        if batch_size <= 0:
+            raise ValueError("batch_size {!r} is not positive"
+                             .format(batch_size))
+        super().__init__(*poargs, **kwargs)
+        self.__server = server.rstrip('/')
+        self.__session = session if session is not None else pooled_session()
+        self.__batch_size = batch_size
+        self.__fields = list(fields)
+        self.__expand = list(expand)
+        self.__max_retries = max_retries
+        self.__backoff = backoff
+        self.__issue_from_raw = raw_to_jira_resource(
+                'Issue', options={'server': self.__server},
+                session=self.__session)
+        self.__requests = 0
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(server=self.__server, batch_size=self.__batch_size,
+                      fields=self.__fields, expand=self.__expand,
+                      max_retries=self.__max_retries, backoff=self.__backoff)
+
+    @property
+    def server(self):  # noqa: D401
+        """The Jira base URL."""
+        return self.__server
+
+    @property
+    def session(self):  # noqa: D401
+        """The REST session."""
+        return self.__session
+
+    @property
+    def requests(self):  # noqa: D401
+        """How many search requests have been made so far."""
+        return self.__requests
+
+    def __search(self, jql, max_results):
+        url = '{}/rest/api/2/search'.format(self.__server)
+        start_at = 0
+        while True:
+            body = {
+                'jql': jql,
+                'startAt': start_at,
+                'maxResults': max_results,
+                'fields': self.__fields,
+                'validateQuery': 'warn',
+            }
+            if self.__expand:
+                body['expand'] = self.__expand
+            self.__requests += 1
+            page = post_json(self.__session, url, body,
+                             max_retries=self.__max_retries,
+                             backoff=self.__backoff)
+            issues = page.get('issues', [])
+            yield from issues
+            start_at += len(issues)
+            if not issues or start_at >= page.get('total', 0):
+                return
+
+    def fetch_raw(self, keys):
+        """Fetch raw issues.
+
+        :param keys: the issue keys or IDs.
+        :type keys: `~collections.abc.Iterable` of `str`
+        :return: the raw issues found, keyed by both key and ID.
+        :rtype: `dict`
+        """
+        keys = sorted({str(key) for key in keys})
+        found = {}
+        for i in range(0, len(keys), self.__batch_size):
+            chunk = keys[i:i + self.__batch_size]
+            jql = 'key in ({})'.format(
+                    ', '.join('"{}"'.format(key.replace('"', ''))
+                              for key in chunk))
+            for raw in self.__search(jql, len(chunk)):
+                found[raw['key']] = raw
+                found[str(raw['id'])] = raw
+        return found
+
+    def fetch(self, keys):
+        """Fetch issues.
+
+        :param keys: the issue keys or IDs.
+        :type keys: `~collections.abc.Iterable` of `str`
+        :return: the issues found (`~jira.resources.Issue`), keyed by both
+            key and ID.
+        :rtype: `dict`
+        """
+        issues = {}
+        for id_or_key, raw in self.fetch_raw(keys).items():
+            issue = issues.get(raw['key'])
+            if issue is None:
+                issue = self.__issue_from_raw(raw)
+            issues[id_or_key] = issue
+        return issues
+
+
+EnrichedEvent = namedtuple('EnrichedEvent', 'event, issue')
+"""A webhook event paired with its fetched issue (`None` if not found)."""
+
+
+class IssueEnricher(CtorRepr):
+    """Fetch full issues for webhook events in batches.
+
+    Issue keys submitted within *window* seconds of each other (or until
+    *max_batch* keys are pending) are fetched together with one
+    `IssueFetcher.fetch()` call.  Requests for a key that is already pending
+    or being fetched share the same future.
+
+    Use as a context manager, or call `close()` when done.
+
+    :param fetcher: the issue fetcher.
+    :type fetcher: `IssueFetcher`
+    :param window: how long to collect keys before fetching, in seconds.
+    :type window: `float`
+    :param max_batch: how many pending keys trigger an immediate fetch.
+    :type max_batch: `int`
+    :param max_workers: how many batches may be fetched concurrently.
+    :type max_workers: `int`
+    """
+
+    def __init__(self, *poargs, fetcher, window=0.05, max_batch=100,
+                 max_workers=4, **kwargs):
+        """Initialize this instance."""
+        check_type(fetcher, IssueFetcher)
+        check_type(window, (int, float))
+        check_type(max_batch, int)
+        super().__init__(*poargs, **kwargs)
+        self.__fetcher = fetcher
+        self.__window = window
+        self.__max_batch = max_batch
+        self.__max_workers = max_workers
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.__pending = {}
+        self.__in_flight = {}
+        self.__first_pending_at = None
+        self.__closed = False
+        self.__cond = Condition()
+        self.__thread = Thread(target=self.__run, name='IssueEnricher',
+                               daemon=True)
+        self.__thread.start()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(fetcher=self.__fetcher, window=self.__window,
+                      max_batch=self.__max_batch,
+                      max_workers=self.__max_workers)
+
+    def __enter__(self):
+        """Return this instance."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close this instance."""
+        self.close()
+
+    def submit(self, id_or_key):
+        """Request an issue.
+
+        :param id_or_key: the issue key or ID.
+        :type id_or_key: `str`
+        :return: a future for the issue (`~jira.resources.Issue`), which is
+            `None` if the issue was not found.
+        :rtype: `~concurrent.futures.Future`
+        """
+        id_or_key = str(id_or_key)
+        with self.__cond:
+            if self.__closed:
+                raise RuntimeError("{!r} is closed".format(self))
+            future = (self.__in_flight.get(id_or_key) or
+                      self.__pending.get(id_or_key))
+            if future is None:
+                future = self.__pending[id_or_key] = Future()
+                if self.__first_pending_at is None:
+                    self.__first_pending_at = monotonic()
+                self.__cond.notify()
+            return future
+
+    def enrich(self, events):
+        """Fetch the full issues of webhook events.
+
+        :param events: the webhook events; those without an issue are
+            paired with `None`.
+        :type events: `~collections.abc.Iterable` of `.webhook.WebhookEvent`
+        :return: the events paired with their issues, in input order.
+        :rtype: `list` of `EnrichedEvent`
+        """
+        submitted = []
+        for event in events:
+            future = None
+            if isinstance(event, WithIssue):
+                raw = event.issue.raw
+                future = self.submit(raw.get('key') or raw['id'])
+            submitted.append((event, future))
+        return [EnrichedEvent(event,
+                              None if future is None else future.result())
+                for event, future in submitted]
+
+    def close(self):
+        """Fetch the remaining pending issues and stop."""
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify()
+        self.__thread.join()
+        self.__executor.shutdown()
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                while True:
+                    if self.__pending:
+                        due = self.__first_pending_at + self.__window
+                        timeout = due - monotonic()
+                        if (self.__closed or timeout <= 0 or
+                                len(self.__pending) >= self.__max_batch):
+                            break
+                    elif self.__closed:
+                        return
+                    else:
+                        timeout = None
+                    self.__cond.wait(timeout)
+                batch = self.__pending
+                self.__pending = {}
+                self.__first_pending_at = None
+                self.__in_flight.update(batch)
+            self.__executor.submit(self.__fetch, batch)
+
+    def __fetch(self, batch):
+        try:
+            issues = self.__fetcher.fetch(batch)
+        except Exception as e:
+            logger.warning("cannot fetch issues %s: %s",
+                           ", ".join(sorted(batch)), e)
+            for future in batch.values():
+                future.set_exception(e)
+        else:
+            for id_or_key, future in batch.items():
+                future.set_result(issues.get(id_or_key))
+        finally:
+            with self.__cond:
+                for id_or_key in batch:
+                    self.__in_flight.pop(id_or_key, None)
+
+
+BackfilledChange = namedtuple('BackfilledChange', 'issue, change')
+"""A historical changelog entry of an issue."""
+
+
+class ChangelogFetcher(CtorRepr):
+    """Fetch complete issue changelogs from the Jira REST API.
+
+    Changelog pages are fetched from ``/rest/api/2/issue/{key}/changelog``
+    and parsed into `.changelog.HistoricalChange` objects, the same
+    `.changelog.Change` model as webhook changelogs.
+
+    That endpoint only exists on Jira Cloud.  When it answers 404 but the
+    issue itself is found, the changelog is taken from the issue with
+    ``expand=changelog`` instead, as Jira Server and Data Center return it
+    in full there; the fetcher then keeps using that fallback.
+
+    :param server: the Jira base URL.
+    :type server: `str`
+    :param session: the REST session (default: a new `pooled_session()`).
+    :type session: `~requests.Session`
+    :param page_size: how many changelog entries to request per page.
+    :type page_size: `int`
+    :param max_retries: see `get_json()`.
+    :type max_retries: `int`
+    :param backoff: see `get_json()`.
+    :type backoff: `float`
+    :param strict: passed to `.changelog.HistoricalChange.from_raw()`.
+    """
+
+    def __init__(self, *poargs, server, session=None, page_size=100,
+                 max_retries=5, backoff=0.5, strict=True, **kwargs):
+        """Initialize this instance."""
+        check_type(server, str)
+        check_type(page_size, int)
+        super().__init__(*poargs, **kwargs)
+        self.__server = server.rstrip('/')
+        self.__session = session if session is not None else pooled_session()
+        self.__page_size = page_size
+        self.__max_retries = max_retries
+        self.__backoff = backoff
+        self.__strict = strict
+        self.__paged = True
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(server=self.__server, page_size=self.__page_size,
+                      max_retries=self.__max_retries, backoff=self.__backoff,
+                      strict=self.__strict)
+
+    def fetch_raw(self, id_or_key):
+        """Fetch the raw changelog of an issue.
+
+        :param id_or_key: the issue key or ID.
+        :type id_or_key: `str`
+        :return: the raw changelog entries, oldest first.
+        :rtype: `list`
+        """
+        from jira.exceptions import JIRAError
+        from requests import RequestException
+        issue_url = '{}/rest/api/2/issue/{}'.format(
+                self.__server, quote(str(id_or_key), safe=''))
+        if not self.__paged:
+            return self.__fetch_expanded(issue_url)
+        try:
+            return self.__fetch_paged(issue_url)
+        except (RequestException, JIRAError) as e:
+            if _status_code(e) != 404:
+                raise
+        histories = self.__fetch_expanded(issue_url)
+        if self.__paged:
+            logger.info("%s has no changelog endpoint, using "
+                        "expand=changelog", self.__server)
+            self.__paged = False
+        return histories
+
+    def __fetch_paged(self, issue_url):
+        url = '{}/changelog'.format(issue_url)
+        histories = []
+        while True:
+            page = get_json(self.__session, url,
+                            params={'startAt': len(histories),
+                                    'maxResults': self.__page_size},
+                            max_retries=self.__max_retries,
+                            backoff=self.__backoff)
+            values = page.get('values', [])
+            histories.extend(values)
+            if not values:
+                break
+            if 'isLast' in page:
+                if page['isLast']:
+                    break
+            elif len(histories) >= page.get('total', 0):
+                break
+        return histories
+
+    def __fetch_expanded(self, issue_url):
+        issue = get_json(self.__session, issue_url,
+                         params={'fields': 'none', 'expand': 'changelog'},
+                         max_retries=self.__max_retries,
+                         backoff=self.__backoff)
+        return (issue.get('changelog') or {}).get('histories', [])
+
+    def fetch(self, id_or_key):
+        """Fetch the changelog of an issue.
+
+        :param id_or_key: the issue key or ID.
+        :type id_or_key: `str`
+        :return: the changelog entries, oldest first.
+        :rtype: `list` of `.changelog.HistoricalChange`
+        """
+        return [HistoricalChange.from_raw(raw, strict=self.__strict)
+                for raw in self.fetch_raw(id_or_key)]
+
+    def backfill(self, ids_or_keys, max_workers=8, errors=None):
+        """Fetch the changelogs of many issues concurrently.
+
+        At most *max_workers* changelogs are fetched at a time, and issues
+        are taken from *ids_or_keys* only as workers free up, so it may be a
+        long or lazy iterable.
+
+        An issue whose changelog cannot be fetched or parsed (e.g. because it
+        does not exist) is logged and recorded in *errors*, and the backfill
+        goes on with the other issues.
+
+        :param ids_or_keys: the issue keys or IDs.
+        :type ids_or_keys: `~collections.abc.Iterable` of `str`
+        :param max_workers: how many changelogs to fetch concurrently.
+        :type max_workers: `int`
+        :param errors: if given, the exception of each failed issue is
+            stored in it, keyed by issue key or ID.
+        :type errors: `~collections.abc.MutableMapping`
+        :return: the changelog entries of each issue, oldest first; issues
+            are yielded as soon as their changelog is complete.
+        :rtype: iterator of `BackfilledChange`
+        """
+        check_type(max_workers, int)
+        ids_or_keys = iter(ids_or_keys)
+        futures = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            def submit_next():
+                for id_or_key in ids_or_keys:
+                    futures[executor.submit(self.fetch, id_or_key)] = id_or_key
+                    return
+
+            try:
+                for _ in range(max_workers):
+                    submit_next()
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        id_or_key = futures.pop(future)
+                        submit_next()
+                        try:
+                            changes = future.result()
+                        except Exception as e:
+                            logger.warning("cannot backfill changelog of %s: "
+                                           "%s", id_or_key, e)
+                            if errors is not None:
+                                errors[id_or_key] = e
+                            continue
+                        for change in changes:
+                            yield BackfilledChange(id_or_key, change)
+            finally:
+                for future in futures:
+                    future.cancel()
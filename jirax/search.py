@@ -0,0 +1,396 @@
+"""Incremental full-text index over issue comments."""
+
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+import json
+import logging
+import re
+import struct
+import sys
+from threading import RLock
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .util import atomic_open, check_type
+from .webhook import CommentDeletedEvent, CommentEvent, IssueUpdatedEvent
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+_TOKEN_RE = re.compile(r'\w+')
+_QUERY_RE = re.compile(r'"([^"]*)"|([^"\s]+)')
+_COMMENT_ISSUE_RE = re.compile(r'/issue/([^/]+)/comment/')
+
+
+def tokenize(text):
+    """Split text into index terms.
+
+    Terms are runs of word characters, lowercased.
+
+    :param text: the text.
+    :type text: `str`
+    :return: the terms, in order.
+    :rtype: `list`
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _adf_text(node):
+    """Yield the text in an Atlassian Document Format node."""
+    if isinstance(node, dict):
+        if node.get('type') == 'text':
+            yield node.get('text', '')
+        for child in node.get('content') or ():
+            yield from _adf_text(child)
+    elif isinstance(node, list):
+        for child in node:
+            yield from _adf_text(child)
+
+
+def comment_text(raw):
+    """Return the plain text of a raw comment.
+
+    Both wiki markup (REST API v2) and Atlassian Document Format (v3)
+    bodies are supported.
+
+    :param raw: the raw comment.
+    :type raw: `~collections.abc.Mapping`
+    :rtype: `str`
+    """
+    body = raw.get('body')
+    if isinstance(body, str):
+        return body
+    return ' '.join(_adf_text(body))
+
+
+def _comment_issue(raw):
+    """Return the issue ID in the URL of a raw comment, if any."""
+    match = _COMMENT_ISSUE_RE.search(raw.get('self') or '')
+    return match.group(1) if match else None
+
+
+SearchHit = namedtuple('SearchHit', 'issue, comment')
+SearchHit.__doc__ = """A comment matching a search query.
+
+:param issue: the issue ID, if known; otherwise `None`.
+:param comment: the comment ID.
+"""
+
+
+class _Document:
+    __slots__ = ('issue', 'comment', 'terms')
+
+    def __init__(self, issue, comment, terms):
+        self.issue = issue
+        self.comment = comment
+        self.terms = terms
+
+
+class CommentIndex(CtorRepr):
+    """Inverted index over issue comments, maintained from webhook events.
+
+    Feed events to `apply()`; comment created/updated events and issue
+    updated events with a comment add or replace the comment, and comment
+    deleted events remove it.  Query with `search()`.
+
+    Each indexed comment gets an integer document ID, which increases with
+    every addition, so posting lists stay sorted by appending.  Replacing or
+    removing a comment leaves its old postings behind; they are skipped by
+    queries and dropped by `compact()`, which runs automatically once they
+    outnumber the live documents.
+
+    :param max_docs:
+        the maximum number of comments to keep; the least recently indexed
+        comments are removed to make room.
+    :type max_docs: `int`
+    """
+
+    SEGMENT_MAGIC = b'JXCIDX01'
+    """Leading bytes of a saved index segment."""
+
+    COMPACT_MIN_DEAD = 1024
+    """Dead documents tolerated before `compact()` runs automatically."""
+
+    def __init__(self, *poargs, max_docs=100000, **kwargs):
+        """Initialize this instance."""
+        check_type(max_docs, int)
+        if max_docs <= 0:
+            raise ValueError("max_docs {!r} is not positive"
+                             .format(max_docs))
+        super().__init__(*poargs, **kwargs)
+        self.__max_docs = max_docs
+        self.__lock = RLock()
+        self.__reset()
+
+    def __reset(self):
+        self.__terms = {}           # term -> term number
+        self.__postings = []        # term number -> array of doc IDs
+        self.__docs = {}            # doc ID -> _Document
+        self.__by_comment = {}      # comment ID -> doc ID, oldest first
+        self.__next_doc = 0
+        self.__dead = 0
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(max_docs=self.__max_docs)
+
+    @property
+    def max_docs(self):  # noqa: D401
+        """The maximum number of comments to keep."""
+        return self.__max_docs
+
+    def __len__(self):
+        """Return the number of comments indexed."""
+        return len(self.__docs)
+
+    def __contains__(self, comment):
+        """Return whether a comment is indexed."""
+        return str(comment) in self.__by_comment
+
+    def apply(self, event):
+        """Update from a webhook event.
+
+        Other events are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        if isinstance(event, CommentDeletedEvent):
+            self.remove(event.comment.raw['id'])
+        elif isinstance(event, CommentEvent):
+            raw = event.comment.raw
+            self.add(raw['id'], comment_text(raw), issue=_comment_issue(raw))
+        elif (isinstance(event, IssueUpdatedEvent) and
+                event.comment is not None):
+            raw = event.comment.raw
+            self.add(raw['id'], comment_text(raw),
+                     issue=str(event.issue.raw['id']))
+
+    def __term_number(self, term):
+        number = self.__terms.get(term)
+        if number is None:
+            number = self.__terms[term] = len(self.__postings)
+            self.__postings.append(array('I'))
+        return number
+
+    def add(self, comment, text, issue=None):
+        """Index a comment, replacing any previous version.
+
+        :param comment: the comment ID.
+        :param text: the comment text.
+        :type text: `str`
+        :param issue: the issue ID, if known.
+        """
+        comment = str(comment)
+        with self.__lock:
+            self.__remove(comment)
+            while len(self.__docs) >= self.__max_docs:
+                self.__remove(next(iter(self.__by_comment)))
+            doc = self.__next_doc
+            self.__next_doc += 1
+            terms = array('I', map(self.__term_number, tokenize(text)))
+            for number in set(terms):
+                self.__postings[number].append(doc)
+            self.__docs[doc] = _Document(issue, comment, terms)
+            self.__by_comment[comment] = doc
+            self.__maybe_compact()
+
+    def remove(self, comment):
+        """Remove a comment from the index.
+
+        Removing a comment that is not indexed is a no-op.
+
+        :param comment: the comment ID.
+        """
+        with self.__lock:
+            self.__remove(str(comment))
+            self.__maybe_compact()
+
+    def __remove(self, comment):
+        doc = self.__by_comment.pop(comment, None)
+        if doc is not None:
+            del self.__docs[doc]
+            self.__dead += 1
+
+    def __maybe_compact(self):
+        if (self.__dead >= self.COMPACT_MIN_DEAD and
+                self.__dead > len(self.__docs)):
+            self.compact()
+
+    def compact(self):
+        """Drop the postings and terms of removed comments."""
+        with self.__lock:
+            old_terms = list(self.__terms)
+            docs = self.__docs
+            by_comment = self.__by_comment
+            next_doc = self.__next_doc
+            self.__reset()
+            self.__by_comment = by_comment
+            self.__next_doc = next_doc
+            for doc in sorted(docs):
+                document = docs[doc]
+                document.terms = array(
+                        'I', (self.__term_number(old_terms[number])
+                              for number in document.terms))
+                for number in set(document.terms):
+                    self.__postings[number].append(doc)
+                self.__docs[doc] = document
+            logger.debug("compacted comment index to %d terms",
+                         len(self.__terms))
+
+    @staticmethod
+    def __intersect(candidates, postings):
+        result = []
+        lo = 0
+        for doc in candidates:
+            lo = bisect_left(postings, doc, lo)
+            if lo == len(postings):
+                break
+            if postings[lo] == doc:
+                result.append(doc)
+        return result
+
+    @staticmethod
+    def __has_phrase(terms, phrase):
+        n = len(phrase)
+        first = phrase[0]
+        start = 0
+        try:
+            while True:
+                i = terms.index(first, start)
+                if terms[i:i + n] == phrase:
+                    return True
+                start = i + 1
+        except ValueError:
+            return False
+
+    def search(self, query, limit=None):
+        """Find the comments matching a query.
+
+        The query is a list of words and double-quoted phrases, all of which
+        must occur in a matching comment; phrase words must also occur
+        consecutively.  Matching is case-insensitive.
+
+        :param query: the query.
+        :type query: `str`
+        :param limit: the maximum number of hits to return.
+        :type limit: `int`
+        :return: the matching comments, most recently indexed first.
+        :rtype: `list` of `SearchHit`
+        """
+        words = []
+        phrases = []
+        for phrase, word in _QUERY_RE.findall(query):
+            terms = tokenize(phrase or word)
+            words.extend(terms)
+            if phrase and len(terms) > 1:
+                phrases.append(terms)
+        if not words:
+            return []
+        with self.__lock:
+            numbers = {}
+            for term in words:
+                number = self.__terms.get(term)
+                if number is None:
+                    return []
+                numbers[term] = number
+            postings = sorted((self.__postings[number]
+                               for number in set(numbers.values())), key=len)
+            candidates = postings[0]
+            for other in postings[1:]:
+                candidates = self.__intersect(candidates, other)
+            phrases = [array('I', (numbers[term] for term in terms))
+                       for terms in phrases]
+            hits = []
+            for doc in reversed(candidates):
+                document = self.__docs.get(doc)
+                if document is None:
+                    continue
+                if all(self.__has_phrase(document.terms, phrase)
+                       for phrase in phrases):
+                    hits.append(SearchHit(document.issue, document.comment))
+                    if limit is not None and len(hits) >= limit:
+                        break
+            return hits
+
+    def save(self, path):
+        """Save the index to a segment file.
+
+        The segment consists of `SEGMENT_MAGIC`, a 4-byte little-endian
+        header length, a JSON header with the term and document tables, then
+        the posting lists and per-document term numbers as little-endian
+        32-bit unsigned integers, in header order.
+
+        :param path: the segment file path.
+        :type path: `str`
+        """
+        with self.__lock:
+            self.compact()
+            docs = sorted(self.__docs.items())
+            header = {
+                'next_doc': self.__next_doc,
+                'terms': [[term, len(self.__postings[number])]
+                          for term, number in self.__terms.items()],
+                'docs': [[doc, document.issue, document.comment,
+                          len(document.terms)]
+                         for doc, document in docs],
+            }
+            header = json.dumps(header, separators=(',', ':')).encode()
+            with atomic_open(path, 'wb') as f:
+                f.write(self.SEGMENT_MAGIC)
+                f.write(struct.pack('<I', len(header)))
+                f.write(header)
+                for values in self.__postings:
+                    f.write(_to_little_endian(values))
+                for doc, document in docs:
+                    f.write(_to_little_endian(document.terms))
+
+    @classmethod
+    def load(cls, path, max_docs=100000):
+        """Load an index saved with `save()`.
+
+        :param path: the segment file path.
+        :type path: `str`
+        :param max_docs: see `CommentIndex`.
+        :return: the loaded index.
+        :rtype: `CommentIndex`
+        :raise `ValueError`: if the file is not a valid segment.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic_size = len(cls.SEGMENT_MAGIC)
+        if data[:magic_size] != cls.SEGMENT_MAGIC:
+            raise ValueError("{} is not a comment index segment"
+                             .format(path))
+        header_size, = struct.unpack_from('<I', data, magic_size)
+        offset = magic_size + 4
+        header = json.loads(data[offset:offset + header_size].decode())
+        offset += header_size
+        values = array('I')
+        values.frombytes(data[offset:])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        index = cls(max_docs=max_docs)
+        index.__next_doc = header['next_doc']
+        offset = 0
+        for number, (term, count) in enumerate(header['terms']):
+            index.__terms[term] = number
+            index.__postings.append(values[offset:offset + count])
+            offset += count
+        for doc, issue, comment, count in header['docs']:
+            terms = values[offset:offset + count]
+            offset += count
+            index.__docs[doc] = _Document(issue, comment, terms)
+            index.__by_comment[comment] = doc
+        if offset != len(values):
+            raise ValueError("{} is truncated or corrupt".format(path))
+        return index
+
+
+def _to_little_endian(values):
+    if sys.byteorder == 'little':
+        return values.tobytes()
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values.tobytes()
@@ -0,0 +1,364 @@
+"""Multi-process webhook event consumer sharded by issue."""
+
+from bisect import bisect, insort
+from collections import namedtuple
+from collections.abc import Mapping
+from hashlib import md5
+import logging
+import multiprocessing
+import queue
+import time
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .raw import InvalidRawData
+from .util import check_type
+from .webhook import webhook_event_from_raw
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+# How often to check that a worker is alive while its queue is full.
+_POLL_INTERVAL = 0.1
+
+
+def _hash(value):
+    return int.from_bytes(md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing(CtorRepr):
+    """Consistent hash ring mapping keys to nodes.
+
+    Each node is placed on the ring at *replicas* points; a key maps to the
+    node owning the first point at or after the key hash.  Adding or
+    removing a node therefore moves only about 1/N of the keys.
+
+    :param nodes: the initial node names.
+    :type nodes: `~collections.abc.Iterable` of `str`
+    :param replicas: the number of points per node.
+    :type replicas: `int`
+    """
+
+    def __init__(self, *poargs, nodes=(), replicas=64, **kwargs):
+        """Initialize this instance."""
+        check_type(replicas, int)
+        if replicas <= 0:
+            raise ValueError("replicas {!r} is not positive"
+                             .format(replicas))
+        super().__init__(*poargs, **kwargs)
+        self.__replicas = replicas
+        self.__points = []
+        self.__owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(nodes=self.nodes, replicas=self.__replicas)
+
+    @property
+    def nodes(self):  # noqa: D401
+        """The node names, sorted."""
+        return sorted(set(self.__owners.values()))
+
+    def __len__(self):
+        """Return the number of nodes."""
+        return len(set(self.__owners.values()))
+
+    def add(self, node):
+        """Add a node.
+
+        :param node: the node name.
+        :type node: `str`
+        """
+        for replica in range(self.__replicas):
+            point = _hash('{}#{}'.format(node, replica))
+            if point not in self.__owners:
+                insort(self.__points, point)
+            self.__owners[point] = node
+
+    def remove(self, node):
+        """Remove a node.
+
+        :param node: the node name.
+        :type node: `str`
+        """
+        for replica in range(self.__replicas):
+            point = _hash('{}#{}'.format(node, replica))
+            if self.__owners.get(point) == node:
+                del self.__owners[point]
+                self.__points.remove(point)
+
+    def node_for(self, key):
+        """Return the node owning a key.
+
+        :param key: the key.
+        :type key: `str`
+        :return: the node name.
+        :rtype: `str`
+        :raise `LookupError`: if the ring is empty.
+        """
+        if not self.__points:
+            raise LookupError("hash ring is empty")
+        i = bisect(self.__points, _hash(key)) % len(self.__points)
+        return self.__owners[self.__points[i]]
+
+
+def routing_key(raw):
+    """Return the key that orders a raw webhook event.
+
+    This is the issue ID (or key) of issue, comment, worklog and issue link
+    events, and the empty string for other events.  Only the envelope is
+    inspected; the event is not parsed.
+
+    :param raw: the raw webhook event.
+    :type raw: `~collections.abc.Mapping`
+    :rtype: `str`
+    """
+    issue = raw.get('issue')
+    if isinstance(issue, Mapping):
+        key = issue.get('id') or issue.get('key')
+        if key is not None:
+            return str(key)
+    for field, id_field in (('worklog', 'issueId'),
+                            ('issueLink', 'sourceIssueId')):
+        value = raw.get(field)
+        if isinstance(value, Mapping) and value.get(id_field) is not None:
+            return str(value[id_field])
+    comment = raw.get('comment')
+    if isinstance(comment, Mapping):
+        url = comment.get('self')
+        if isinstance(url, str) and '/issue/' in url:
+            return url.split('/issue/', 1)[1].split('/', 1)[0]
+    return ''
+
+
+WorkerStats = namedtuple('WorkerStats', 'submitted, processed, failed, lag')
+WorkerStats.__doc__ = """Counters of a consumer worker process.
+
+:param submitted: events routed to the worker.
+:param processed: events the worker finished with, including failed ones.
+:param failed: events that failed to parse or handle.
+:param lag: events routed to the worker but not processed yet.
+"""
+
+
+def _worker_main(queue, handler, strict, processed, failed):
+    while True:
+        raw = queue.get()
+        if raw is None:
+            return
+        try:
+            handler(webhook_event_from_raw(raw, strict=strict))
+        except InvalidRawData as e:
+            failed.value += 1
+            logger.warning("dropping invalid webhook event: %s", e)
+        except Exception:
+            failed.value += 1
+            logger.exception("webhook event handler failed")
+        processed.value += 1
+
+
+class _Worker:
+
+    __slots__ = ('process', 'queue', 'submitted', 'processed', 'failed')
+
+    def __init__(self, context, name, handler, strict, queue_size):
+        self.queue = context.Queue(queue_size)
+        self.submitted = 0
+        self.processed = context.Value('Q', 0, lock=False)
+        self.failed = context.Value('Q', 0, lock=False)
+        self.process = context.Process(
+                target=_worker_main, name=name, daemon=True,
+                args=(self.queue, handler, strict, self.processed,
+                      self.failed))
+        self.process.start()
+
+    def stats(self):
+        processed = self.processed.value
+        return WorkerStats(self.submitted, processed, self.failed.value,
+                           self.submitted - processed)
+
+    def request_stop(self, deadline):
+        # A dead worker never frees room in its queue, so never block on it.
+        while self.process.is_alive():
+            try:
+                self.queue.put(None, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+
+    def join(self, deadline):
+        self.process.join(None if deadline is None
+                          else max(0, deadline - time.monotonic()))
+        if self.process.is_alive():
+            logger.warning("terminating %s", self.process.name)
+            self.process.terminate()
+            self.process.join()
+        if self.process.exitcode:
+            # Do not wait at exit to flush events nobody will read.
+            self.queue.cancel_join_thread()
+
+
+class ShardedConsumer(CtorRepr):
+    """Parse and handle raw webhook events in several worker processes.
+
+    Each raw event is routed by its `routing_key()` to a worker over a
+    `HashRing`, so events of the same issue always reach the same worker
+    and are handled in submission order.  Workers parse events with
+    `.webhook.webhook_event_from_raw()` and pass them to *handler*; invalid
+    events and handler failures are logged and counted.
+
+    Workers can be added and removed while running.  To keep per-issue
+    ordering across the change, the consumer first waits for all submitted
+    events to be processed, then moves only the keys that the ring assigns
+    to a different worker.
+
+    The handler runs in the worker processes; with the ``spawn`` start
+    method it must be picklable, e.g. a module-level function.
+
+    :param handler: called with each parsed `.webhook.WebhookEvent`.
+    :type handler: `~collections.abc.Callable`
+    :param workers: the initial number of worker processes.
+    :type workers: `int`
+    :param strict: see `.webhook.webhook_event_from_raw()`.
+    :type strict: `bool`
+    :param queue_size:
+        the maximum number of pending events per worker; `submit()` blocks
+        while the worker queue is full.
+    :type queue_size: `int`
+    :param context: the multiprocessing context (default: the default one).
+    """
+
+    def __init__(self, *poargs, handler, workers=None, strict=True,
+                 queue_size=1000, context=None, **kwargs):
+        """Initialize this instance."""
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        check_type(workers, int)
+        if workers <= 0:
+            raise ValueError("workers {!r} is not positive".format(workers))
+        super().__init__(*poargs, **kwargs)
+        self.__handler = handler
+        self.__strict = strict
+        self.__queue_size = queue_size
+        self.__context = context or multiprocessing.get_context()
+        self.__ring = HashRing()
+        self.__workers = {}
+        self.__next_worker = 0
+        for _ in range(workers):
+            self.add_worker()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(handler=self.__handler, workers=len(self.__workers))
+
+    @property
+    def workers(self):  # noqa: D401
+        """The worker names."""
+        return list(self.__workers)
+
+    def __enter__(self):
+        """Return this consumer."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close this consumer."""
+        self.close()
+
+    def submit(self, raw):
+        """Route a raw webhook event to its worker.
+
+        :param raw: the raw webhook event.
+        :type raw: `~collections.abc.Mapping`
+        :return: the worker name.
+        :rtype: `str`
+        """
+        name = self.__ring.node_for(routing_key(raw))
+        worker = self.__workers[name]
+        worker.queue.put(raw)
+        worker.submitted += 1
+        return name
+
+    def drain(self, timeout=None, interval=0.01):
+        """Wait until all submitted events are processed.
+
+        :param timeout: the maximum time to wait, in seconds.
+        :type timeout: `float`
+        :return: whether all events were processed.
+        :rtype: `bool`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(worker.stats().lag for worker in self.__workers.values()):
+            for name, worker in self.__workers.items():
+                if not worker.process.is_alive():
+                    raise RuntimeError("worker {} died".format(name))
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+        return True
+
+    def add_worker(self):
+        """Start a new worker process and give it its share of the keys.
+
+        :return: the worker name.
+        :rtype: `str`
+        """
+        name = 'worker-{}'.format(self.__next_worker)
+        self.__next_worker += 1
+        worker = _Worker(self.__context, name, self.__handler,
+                         self.__strict, self.__queue_size)
+        self.drain()
+        self.__workers[name] = worker
+        self.__ring.add(name)
+        logger.info("added %s", name)
+        return name
+
+    def remove_worker(self, name=None, timeout=None):
+        """Stop a worker process, handing its keys to the others.
+
+        A worker that has not stopped within *timeout* is terminated.
+
+        :param name: the worker name (default: the newest worker).
+        :type name: `str`
+        :param timeout: the maximum time to wait, in seconds.
+        :type timeout: `float`
+        :raise `ValueError`: if this is the last worker.
+        """
+        if name is None:
+            name = next(reversed(list(self.__workers)))
+        if len(self.__workers) == 1:
+            raise ValueError("cannot remove the last worker")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        worker = self.__workers[name]
+        self.__ring.remove(name)
+        worker.request_stop(deadline)
+        worker.join(deadline)
+        del self.__workers[name]
+        logger.info("removed %s", name)
+
+    def stats(self):
+        """Return the counters of each worker.
+
+        :return: the counters, keyed by worker name.
+        :rtype: `dict` of `WorkerStats`
+        """
+        return {name: worker.stats()
+                for name, worker in self.__workers.items()}
+
+    def close(self, timeout=None):
+        """Process the remaining events, then stop all workers.
+
+        Workers that have died are not waited for, and workers that have
+        not stopped within *timeout* are terminated.
+
+        :param timeout: the maximum time to wait, in seconds.
+        :type timeout: `float`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self.__workers.values():
+            worker.request_stop(deadline)
+        for worker in self.__workers.values():
+            worker.join(deadline)
+        self.__workers.clear()
@@ -0,0 +1,216 @@
+"""Shared-memory ring buffer for handing webhook bodies between processes."""
+
+import logging
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import struct
+import time
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .util import check_type
+from .webhook import webhook_event_from_bytes
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+_INDICES = struct.Struct('<QQ')     # write index, claim index
+_SLOT_HEADER = struct.Struct('<II')  # state, payload length
+
+_EMPTY, _FULL, _CLAIMED = range(3)
+
+
+def _shared_memory(**kwargs):
+    if not kwargs.get('create'):
+        try:
+            return SharedMemory(track=False, **kwargs)
+        except TypeError:   # Python < 3.13
+            pass
+    return SharedMemory(**kwargs)
+
+
+class RingFull(Exception):
+    """The shared-memory ring has no free slot."""
+
+
+class SharedMemoryRing(CtorRepr):
+    """Ring of fixed-size slots in shared memory carrying webhook bodies.
+
+    One producer process (typically the HTTP receiver) writes raw webhook
+    request bodies with `put()`, and any number of consumer processes take
+    them with `get_event()`, which parses each body straight from shared
+    memory with `.webhook.webhook_event_from_bytes()`, so no copy or pickle
+    of the body is made.
+
+    Each slot holds a state word, a length prefix and up to *slot_size*
+    payload bytes.  The producer advances the write index without locking;
+    consumers serialize only the claim of the next slot, and parse and
+    release their slots concurrently.  When every slot is in use, `put()`
+    blocks until one is released, or raises `RingFull` after *timeout*.
+
+    Consumers get the ring by passing it to `multiprocessing.Process`;
+    it is reattached by name in the child.  The creating process should
+    call `unlink()` when done.
+
+    :param slots: the number of slots.
+    :type slots: `int`
+    :param slot_size: the maximum body size, in bytes.
+    :type slot_size: `int`
+    :param context: the multiprocessing context (default: the default one).
+    """
+
+    def __init__(self, *poargs, slots=1024, slot_size=65536, context=None,
+                 _attach=None, **kwargs):
+        """Initialize this instance."""
+        check_type(slots, int)
+        check_type(slot_size, int)
+        if slots <= 0 or slot_size <= 0:
+            raise ValueError("slots and slot_size must be positive")
+        super().__init__(*poargs, **kwargs)
+        self.__slots = slots
+        self.__slot_size = slot_size
+        self.__stride = _SLOT_HEADER.size + slot_size
+        size = _INDICES.size + slots * self.__stride
+        if _attach is None:
+            context = context or multiprocessing.get_context()
+            self.__shm = _shared_memory(create=True, size=size)
+            self.__shm.buf[:size] = bytes(size)
+            self.__claim_lock = context.Lock()
+            self.__items = context.Semaphore(0)
+            self.__spaces = context.Semaphore(slots)
+        else:
+            name, self.__claim_lock, self.__items, self.__spaces = _attach
+            self.__shm = _shared_memory(name=name)
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(slots=self.__slots, slot_size=self.__slot_size)
+
+    def __reduce__(self):
+        """Pickle as a reference to the same shared memory."""
+        return (_attach_ring, (self.__slots, self.__slot_size,
+                               (self.__shm.name, self.__claim_lock,
+                                self.__items, self.__spaces)))
+
+    @property
+    def name(self):  # noqa: D401
+        """The shared memory block name."""
+        return self.__shm.name
+
+    @property
+    def slots(self):  # noqa: D401
+        """The number of slots."""
+        return self.__slots
+
+    @property
+    def slot_size(self):  # noqa: D401
+        """The maximum body size, in bytes."""
+        return self.__slot_size
+
+    def __slot_offset(self, index):
+        return _INDICES.size + (index % self.__slots) * self.__stride
+
+    def put(self, body, timeout=None):
+        """Write a webhook body into the next slot.
+
+        Only one process may call this.
+
+        :param body: the raw webhook request body.
+        :type body: `bytes`, `bytearray` or `memoryview`
+        :param timeout: the maximum time to wait for a free slot, in seconds
+            (default: wait forever).
+        :type timeout: `float`
+        :raise `ValueError`: if *body* does not fit in a slot.
+        :raise `RingFull`: if no slot was freed within *timeout*.
+        """
+        length = len(body)
+        if length > self.__slot_size:
+            raise ValueError("body of {} bytes exceeds slot size {}"
+                             .format(length, self.__slot_size))
+        if not self.__spaces.acquire(timeout=timeout):
+            raise RingFull(self.__shm.name)
+        buf = self.__shm.buf
+        write_index, _ = _INDICES.unpack_from(buf, 0)
+        offset = self.__slot_offset(write_index)
+        # Consumers may release slots out of order; wait for this one.
+        while _SLOT_HEADER.unpack_from(buf, offset)[0] != _EMPTY:
+            time.sleep(0.0001)
+        start = offset + _SLOT_HEADER.size
+        buf[start:start + length] = body
+        _SLOT_HEADER.pack_into(buf, offset, _FULL, length)
+        struct.pack_into('<Q', buf, 0, write_index + 1)
+        self.__items.release()
+
+    def __claim(self, timeout):
+        if not self.__items.acquire(timeout=timeout):
+            return None
+        buf = self.__shm.buf
+        with self.__claim_lock:
+            _, claim_index = _INDICES.unpack_from(buf, 0)
+            struct.pack_into('<Q', buf, 8, claim_index + 1)
+        offset = self.__slot_offset(claim_index)
+        state, length = _SLOT_HEADER.unpack_from(buf, offset)
+        assert state == _FULL, state
+        struct.pack_into('<I', buf, offset, _CLAIMED)
+        return offset, length
+
+    def __release(self, offset):
+        struct.pack_into('<I', self.__shm.buf, offset, _EMPTY)
+        self.__spaces.release()
+
+    def get_bytes(self, timeout=None):
+        """Take the next webhook body, copied out of shared memory.
+
+        :param timeout: the maximum time to wait, in seconds (default: wait
+            forever).
+        :type timeout: `float`
+        :return: the body, or `None` on timeout.
+        :rtype: `bytes`
+        """
+        claim = self.__claim(timeout)
+        if claim is None:
+            return None
+        offset, length = claim
+        start = offset + _SLOT_HEADER.size
+        try:
+            return bytes(self.__shm.buf[start:start + length])
+        finally:
+            self.__release(offset)
+
+    def get_event(self, timeout=None, **kwargs):
+        """Take and parse the next webhook body.
+
+        The body is parsed in place; its slot is released afterwards, even
+        if parsing fails.
+
+        :param timeout: the maximum time to wait, in seconds (default: wait
+            forever).
+        :type timeout: `float`
+        :param kwargs: passed to `.webhook.webhook_event_from_bytes()`.
+        :return: the event, or `None` on timeout.
+        :rtype: `.webhook.WebhookEvent`
+        :raise `.webhook.InvalidWebhookEvent`: if the body is invalid.
+        """
+        claim = self.__claim(timeout)
+        if claim is None:
+            return None
+        offset, length = claim
+        start = offset + _SLOT_HEADER.size
+        view = self.__shm.buf[start:start + length]
+        try:
+            return webhook_event_from_bytes(view, **kwargs)
+        finally:
+            view.release()
+            self.__release(offset)
+
+    def close(self):
+        """Detach from the shared memory."""
+        self.__shm.close()
+
+    def unlink(self):
+        """Destroy the shared memory; call once, from the creator."""
+        self.__shm.unlink()
+
+
+def _attach_ring(slots, slot_size, attach):
+    return SharedMemoryRing(slots=slots, slot_size=slot_size, _attach=attach)
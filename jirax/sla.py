@@ -0,0 +1,274 @@
+"""SLA deadline timers driven by webhook events."""
+
+import asyncio
+from collections import OrderedDict, namedtuple
+from heapq import heapify, heappop, heappush
+from itertools import count
+import logging
+from threading import RLock
+import time
+
+from ctorrepr import CtorRepr
+
+from .flow import status_transition
+from .logging import LoggerProxy
+from .util import check_type
+from .webhook import IssueDeletedEvent
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+SlaBreach = namedtuple('SlaBreach', 'issue, status, since, deadline')
+SlaBreach.__doc__ = """An issue that stayed in a status past its deadline.
+
+:param issue: the issue ID.
+:param status: the status name.
+:param since: when the issue entered *status* (POSIX time).
+:param deadline: when the deadline passed (POSIX time).
+"""
+
+# Heap entry fields; entries are lists so that they can be cancelled in place.
+_DEADLINE, _SEQ, _ISSUE, _STATUS, _SINCE = range(5)
+
+
+class SlaScheduler(CtorRepr):
+    """Per-issue SLA deadlines, armed and cancelled by webhook events.
+
+    Feed issue events to `apply()`.  When an issue is created in, or moves
+    into, a status with a target in *targets*, a deadline is armed for it
+    that many seconds later, replacing any previous deadline of the issue;
+    moving into a status without a target, or deleting the issue, cancels
+    it.  Transitions older than the last one applied to the issue are
+    ignored, whether that one armed, replaced or cancelled its deadline.
+    The time of the last transition is remembered for at most *max_issues*
+    issues, forgetting the least recently transitioned ones first.
+
+    Deadlines are kept in a binary heap, so arming and firing take O(log n)
+    time.  Cancelled deadlines stay in the heap until they reach the top or
+    until they outnumber the live ones, when the heap is rebuilt.
+
+    Call `fire_due()` to fire the deadlines that have passed, or run `run()`
+    as an asyncio task to fire them as they pass.
+
+    :param targets: the time allowed in each status, in seconds, keyed by
+        status name.
+    :type targets: `~collections.abc.Mapping`
+    :param callback: called with an `SlaBreach` for each deadline fired.
+    :type callback: `~collections.abc.Callable`
+    :param clock: returns the current POSIX time.
+    :type clock: `~collections.abc.Callable`
+    :param max_issues:
+        how many issues to remember the last transition of; late
+        transitions of a forgotten issue are applied.
+    :type max_issues: `int`
+    """
+
+    def __init__(self, *poargs, targets, callback, clock=time.time,
+                 max_issues=100000, **kwargs):
+        """Initialize this instance."""
+        check_type(max_issues, int)
+        if max_issues < 0:
+            raise ValueError("max_issues {!r} is negative"
+                             .format(max_issues))
+        super().__init__(*poargs, **kwargs)
+        self.__max_issues = max_issues
+        self.__targets = dict(targets)
+        self.__callback = callback
+        self.__clock = clock
+        self.__heap = []
+        self.__armed = {}
+        self.__last = OrderedDict()
+        self.__cancelled = 0
+        self.__seq = count()
+        self.__lock = RLock()
+        self.__loop = None
+        self.__wakeup = None
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(targets=self.__targets, callback=self.__callback,
+                      max_issues=self.__max_issues)
+
+    @property
+    def targets(self):  # noqa: D401
+        """The time allowed in each status, keyed by status name."""
+        return dict(self.__targets)
+
+    @property
+    def max_issues(self):  # noqa: D401
+        """How many issues to remember the last transition of."""
+        return self.__max_issues
+
+    def __len__(self):
+        """Return the number of armed deadlines."""
+        return len(self.__armed)
+
+    def deadline(self, issue):
+        """Return the armed deadline of an issue, if any.
+
+        :param issue: the issue ID.
+        :return: the deadline (POSIX time), or `None`.
+        :rtype: `float`
+        """
+        entry = self.__armed.get(str(issue))
+        return None if entry is None else entry[_DEADLINE]
+
+    def apply(self, event):
+        """Update from a webhook event.
+
+        Other events are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        if isinstance(event, IssueDeletedEvent):
+            issue = str(event.issue.raw['id'])
+            with self.__lock:
+                self.__last.pop(issue, None)
+                self.cancel(issue)
+            return
+        transition = status_transition(event)
+        if transition is None:
+            return
+        self.transition(event.issue.raw['id'], transition[1],
+                        event.timestamp.timestamp())
+
+    def transition(self, issue, status, timestamp):
+        """Arm or cancel the deadline of an issue that entered a status.
+
+        :param issue: the issue ID.
+        :param status: the status name.
+        :type status: `str`
+        :param timestamp: when the issue entered *status* (POSIX time).
+        :type timestamp: `float`
+        """
+        issue = str(issue)
+        with self.__lock:
+            last = self.__last.get(issue)
+            if last is not None and timestamp < last:
+                logger.debug("ignoring stale transition of issue %s to %s",
+                             issue, status)
+                return
+            self.__remember_last(issue, timestamp)
+            target = self.__targets.get(status)
+            if target is None:
+                self.cancel(issue)
+            else:
+                self.arm(issue, status, timestamp, timestamp + target)
+
+    def __remember_last(self, issue, timestamp):
+        last = self.__last
+        last[issue] = timestamp
+        last.move_to_end(issue)
+        while len(last) > self.__max_issues:
+            last.popitem(last=False)
+
+    def arm(self, issue, status, since, deadline):
+        """Arm the deadline of an issue, replacing any previous one.
+
+        :param issue: the issue ID.
+        :param status: the status name.
+        :type status: `str`
+        :param since: when the issue entered *status* (POSIX time).
+        :type since: `float`
+        :param deadline: the deadline (POSIX time).
+        :type deadline: `float`
+        """
+        issue = str(issue)
+        entry = [deadline, next(self.__seq), issue, status, since]
+        with self.__lock:
+            self.__cancel(issue)
+            self.__armed[issue] = entry
+            heappush(self.__heap, entry)
+            earliest = self.__heap[0] is entry
+        if earliest:
+            self.__wake()
+
+    def cancel(self, issue):
+        """Cancel the deadline of an issue, if any.
+
+        :param issue: the issue ID.
+        """
+        with self.__lock:
+            self.__cancel(str(issue))
+            if self.__cancelled > len(self.__armed):
+                self.__heap = list(self.__armed.values())
+                heapify(self.__heap)
+                self.__cancelled = 0
+
+    def __cancel(self, issue):
+        entry = self.__armed.pop(issue, None)
+        if entry is not None:
+            entry[_ISSUE] = None
+            self.__cancelled += 1
+
+    def next_deadline(self):
+        """Return the earliest armed deadline, if any.
+
+        :return: the deadline (POSIX time), or `None`.
+        :rtype: `float`
+        """
+        with self.__lock:
+            heap = self.__heap
+            while heap and heap[0][_ISSUE] is None:
+                heappop(heap)
+                self.__cancelled -= 1
+            return heap[0][_DEADLINE] if heap else None
+
+    def fire_due(self, now=None):
+        """Fire the deadlines that have passed.
+
+        The callback is called outside of the scheduler lock, so it may arm
+        or cancel deadlines.
+
+        :param now: the current POSIX time; defaults to the clock.
+        :type now: `float`
+        :return: the breaches fired.
+        :rtype: `list` of `SlaBreach`
+        """
+        if now is None:
+            now = self.__clock()
+        breaches = []
+        with self.__lock:
+            heap = self.__heap
+            while heap and heap[0][_DEADLINE] <= now:
+                entry = heappop(heap)
+                issue = entry[_ISSUE]
+                if issue is None:
+                    self.__cancelled -= 1
+                    continue
+                del self.__armed[issue]
+                breaches.append(SlaBreach(issue, entry[_STATUS],
+                                          entry[_SINCE], entry[_DEADLINE]))
+        for breach in breaches:
+            try:
+                self.__callback(breach)
+            except Exception:
+                logger.exception("SLA callback failed for %r", breach)
+        return breaches
+
+    def __wake(self):
+        loop, wakeup = self.__loop, self.__wakeup
+        if loop is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def run(self):
+        """Fire deadlines as they pass, until cancelled.
+
+        Deadlines armed from other threads wake this task up if they are
+        earlier than the one it is waiting for.
+        """
+        self.__loop = asyncio.get_running_loop()
+        self.__wakeup = asyncio.Event()
+        try:
+            while True:
+                self.__wakeup.clear()
+                self.fire_due()
+                deadline = self.next_deadline()
+                timeout = (None if deadline is None
+                           else max(0, deadline - self.__clock()))
+                try:
+                    await asyncio.wait_for(self.__wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.__loop = self.__wakeup = None
@@ -0,0 +1,204 @@
+"""Handlers subscribed to issue field changes."""
+
+from collections import namedtuple
+from itertools import count
+import logging
+from threading import RLock
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .webhook import IssueUpdatedEvent
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+ANY = object()
+"""Match any old or new value in `FieldSubscriptions.subscribe()`."""
+
+Subscription = namedtuple('Subscription', 'seq, field, handler, old, new')
+Subscription.__doc__ = """A handler subscribed to a field change.
+
+:param seq: the subscription sequence number, which orders handler calls.
+:param field: the field ID or name.
+:param handler: the handler.
+:param old: the old value to match, or `ANY`.
+:param new: the new value to match, or `ANY`.
+"""
+
+
+class _FieldIndex:
+    """Subscriptions to one field, keyed by the values they match."""
+
+    __slots__ = ('any', 'old', 'new', 'both')
+
+    def __init__(self):
+        self.any = []
+        self.old = {}
+        self.new = {}
+        self.both = {}
+
+    def bucket(self, subscription, create=False):
+        old, new = subscription.old, subscription.new
+        if old is ANY and new is ANY:
+            return self.any
+        if new is ANY:
+            table, key = self.old, old
+        elif old is ANY:
+            table, key = self.new, new
+        else:
+            table, key = self.both, (old, new)
+        if create:
+            return table.setdefault(key, [])
+        return table.get(key, [])
+
+    def __bool__(self):
+        return bool(self.any or self.old or self.new or self.both)
+
+    def collect(self, olds, news, into):
+        into.extend(self.any)
+        for old in olds:
+            into.extend(self.old.get(old, ()))
+        for new in news:
+            into.extend(self.new.get(new, ()))
+        if self.both:
+            for old in olds:
+                for new in news:
+                    into.extend(self.both.get((old, new), ()))
+
+
+def _values(raw, string):
+    if raw is None or raw == string:
+        return (string,)
+    if string is None:
+        return (raw,)
+    return (raw, string)
+
+
+def _changed_fields(change):
+    """Yield the field ID, name, old and new values of each changed field."""
+    for item in change.field_items():
+        yield (item.id, item.name, _values(item.old_raw, item.old_str),
+               _values(item.new_raw, item.new_str))
+
+
+class FieldSubscriptions(CtorRepr):
+    """Registry of handlers subscribed to issue field changes.
+
+    Handlers subscribe to a field, by ID or name, optionally to changes from
+    and/or to a given value (the display string or the raw value, such as an
+    account ID; `None` matches an empty value).  Subscriptions are indexed
+    by field and value, so finding the handlers for a change takes one pass
+    over its changed fields, no matter how many handlers are subscribed.
+
+    Changes are matched through `.changelog.Change.field_items()`, so
+    matching does not parse any field change.
+    """
+
+    def __init__(self, *poargs, **kwargs):
+        """Initialize this instance."""
+        super().__init__(*poargs, **kwargs)
+        self.__fields = {}
+        self.__seq = count()
+        self.__lock = RLock()
+
+    def __len__(self):
+        """Return the number of subscriptions."""
+        return sum(len(bucket) for index in self.__fields.values()
+                   for bucket in self.__buckets(index))
+
+    @staticmethod
+    def __buckets(index):
+        yield index.any
+        for table in (index.old, index.new, index.both):
+            yield from table.values()
+
+    def subscribe(self, field, handler, old=ANY, new=ANY):
+        """Subscribe a handler to changes of a field.
+
+        :param field: the field ID or name.
+        :type field: `str`
+        :param handler: called with the `.webhook.IssueUpdatedEvent`.
+        :type handler: `~collections.abc.Callable`
+        :param old: the old value to match (default: any).
+        :param new: the new value to match (default: any).
+        :return: the subscription, to pass to `unsubscribe()`.
+        :rtype: `Subscription`
+        """
+        subscription = Subscription(next(self.__seq), field, handler,
+                                    old, new)
+        with self.__lock:
+            index = self.__fields.get(field)
+            if index is None:
+                index = self.__fields[field] = _FieldIndex()
+            index.bucket(subscription, create=True).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Cancel a subscription.
+
+        Cancelling a subscription twice is a no-op.
+
+        :param subscription: the subscription returned by `subscribe()`.
+        :type subscription: `Subscription`
+        """
+        with self.__lock:
+            index = self.__fields.get(subscription.field)
+            if index is None:
+                return
+            bucket = index.bucket(subscription)
+            if subscription in bucket:
+                bucket.remove(subscription)
+            for table in (index.old, index.new, index.both):
+                for key in [key for key, value in table.items()
+                            if not value]:
+                    del table[key]
+            if not index:
+                del self.__fields[subscription.field]
+
+    def match(self, change):
+        """Return the subscriptions matching a change.
+
+        :param change: the change.
+        :type change: `.changelog.Change`
+        :return: the matching subscriptions, in subscription order, each
+            once even if several of its fields changed.
+        :rtype: `list` of `Subscription`
+        """
+        matched = []
+        fields = self.__fields
+        with self.__lock:
+            for id, name, olds, news in _changed_fields(change):
+                index = fields.get(id)
+                if index is not None:
+                    index.collect(olds, news, matched)
+                if name != id:
+                    index = fields.get(name)
+                    if index is not None:
+                        index.collect(olds, news, matched)
+        if len(matched) > 1:
+            unique = {subscription.seq: subscription
+                      for subscription in matched}
+            matched = [unique[seq] for seq in sorted(unique)]
+        return matched
+
+    def dispatch(self, event):
+        """Call the handlers subscribed to the changes in an event.
+
+        Events other than issue updated events with a change are ignored.
+        Handler exceptions are logged, and do not stop other handlers.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        :return: the number of handlers called.
+        :rtype: `int`
+        """
+        if not isinstance(event, IssueUpdatedEvent) or event.change is None:
+            return 0
+        subscriptions = self.match(event.change)
+        for subscription in subscriptions:
+            try:
+                subscription.handler(event)
+            except Exception:
+                logger.exception("handler %r failed for %r",
+                                 subscription.handler, event)
+        return len(subscriptions)
@@ -1,5 +1,8 @@
 """Utilities."""
 
+from contextlib import contextmanager
+import os
+
 
 def is_of_type(value, expected_types):
     """Check if the given value is of an expected type.
@@ -53,3 +56,30 @@ def check_type(value, expected_types):
     raise TypeError("type of {!r} is {} but should be one of: {}"
                     .format(value, type(value).__qualname__,
                             ", ".join(type_names(expected_types))))
+
+
+@contextmanager
+def atomic_open(path, mode='w'):
+    """Open a file for writing that replaces *path* only once complete.
+
+    The data is written to ``path + '.tmp'``, which is renamed over *path*
+    when the ``with`` block exits normally, and removed otherwise.  Readers
+    of *path* thus never see a partially written file.
+
+    :param path: the file path.
+    :type path: `str`
+    :param mode: the file mode, ``'w'`` or ``'wb'``.
+    :type mode: `str`
+    :return: a context manager giving the open temporary file.
+    """
+    tmp_path = '{}.tmp'.format(path)
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -1,21 +1,31 @@
 """Jira webhook event."""
 
-from collections.abc import Mapping
+from collections import namedtuple
+from collections.abc import Iterable, Mapping
 from datetime import datetime
 import logging
+from time import perf_counter
 
 from ctorrepr import CtorRepr
-from jira.resources import (User, Project, Board, Issue, Worklog, Comment,
-                            Attachment)
 
 from .changelog import Change
 from .issuelink import IssueLink
 from .logging import LoggerProxy
-from .raw import FromRaw, InvalidRawData, raw_to_jira_resource
+from .raw import (FromRaw, InvalidRawData, RawFieldMover, RawFieldValueError,
+                  RawProjection, jira_resource_type, project_raw,
+                  raw_to_jira_resource)
 from .util import check_type
 
 logger = LoggerProxy(default_logger=logging.getLogger(__name__))
 
+_user_from_raw = raw_to_jira_resource('User')
+_issue_from_raw = raw_to_jira_resource('Issue')
+_comment_from_raw = raw_to_jira_resource('Comment')
+_project_from_raw = raw_to_jira_resource('Project')
+_board_from_raw = raw_to_jira_resource('Board')
+_worklog_from_raw = raw_to_jira_resource('Worklog')
+_attachment_from_raw = raw_to_jira_resource('Attachment')
+
 
 class InvalidWebhookEvent(InvalidRawData):
     """Jira webhook event is invalid."""
@@ -23,6 +33,14 @@ class InvalidWebhookEvent(InvalidRawData):
     KIND = "webhook event"
 
 
+class MalformedWebhookEvent(InvalidWebhookEvent):
+    """Webhook event body could not be decoded into a JSON object."""
+
+    def __str__(self):
+        """Return a nicely printable string representation of this instance."""
+        return super().__str__() + ": not a JSON object"
+
+
 class MissingWebhookEventType(InvalidWebhookEvent):
     """Webhook event is missing the type tag."""
 
@@ -95,7 +113,10 @@ class WebhookEvent(FromRaw, CtorRepr):
 
     @staticmethod
     def __convert_timestamp_into_datetime(timestamp):
-        return datetime.fromtimestamp(timestamp / 1000)
+        try:
+            return datetime.fromtimestamp(timestamp / 1000)
+        except (OverflowError, OSError, ValueError) as e:
+            raise RawFieldValueError from e
 
     @classmethod
     def _collect_ctor_args_from_raw(cls, mover):
@@ -114,7 +135,7 @@ class WithUser(FromRaw, CtorRepr):
 
     def __init__(self, *poargs, user, **kwargs):
         """Initialize this instance."""
-        check_type(user, User)
+        check_type(user, jira_resource_type('User'))
         super().__init__(*poargs, **kwargs)
         self.__user = user
 
@@ -131,7 +152,7 @@ class WithUser(FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('user', type=dict,
-                   filter=raw_to_jira_resource(User))
+                   filter=_user_from_raw)
 
 
 class WithIssue(FromRaw, CtorRepr):
@@ -143,7 +164,7 @@ class WithIssue(FromRaw, CtorRepr):
 
     def __init__(self, *poargs, issue, **kwargs):
         """Initialize this instance."""
-        check_type(issue, Issue)
+        check_type(issue, jira_resource_type('Issue'))
         super().__init__(*poargs, **kwargs)
         self.__issue = issue
 
@@ -160,7 +181,7 @@ class WithIssue(FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('issue', type=dict,
-                   filter=raw_to_jira_resource(Issue))
+                   filter=_issue_from_raw)
 
 
 class WithComment(FromRaw, CtorRepr):
@@ -178,10 +199,8 @@ class WithComment(FromRaw, CtorRepr):
 
     def __init__(self, *poargs, comment, **kwargs):
         """Initialize this instance."""
-        if self.COMMENT_REQUIRED:
-            check_type(comment, Comment)
-        else:
-            check_type(comment, (Comment, 'NoneType'))
+        if self.COMMENT_REQUIRED or comment is not None:
+            check_type(comment, jira_resource_type('Comment'))
         super().__init__(*poargs, **kwargs)
         self.__comment = comment
 
@@ -198,7 +217,7 @@ class WithComment(FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('comment', type=dict,
-                   filter=raw_to_jira_resource(Comment),
+                   filter=_comment_from_raw,
                    required=cls.COMMENT_REQUIRED)
 
 
@@ -228,7 +247,7 @@ class WithIssueLink(FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('issue_link', type=dict, source_name='issueLink',
-                   filter=IssueLink.from_raw)
+                   filter=mover.nested(IssueLink))
 
 
 class UserEvent(WebhookEvent, WithUser):
@@ -256,7 +275,7 @@ class ProjectEvent(WebhookEvent, FromRaw, CtorRepr):
 
     def __init__(self, *poargs, project, **kwargs):
         """Initialize this instance."""
-        check_type(project, Project)
+        check_type(project, jira_resource_type('Project'))
         super().__init__(*poargs, **kwargs)
         self.__project = project
 
@@ -273,7 +292,7 @@ class ProjectEvent(WebhookEvent, FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('project', type=Mapping,
-                   filter=raw_to_jira_resource(Project))
+                   filter=_project_from_raw)
 
 
 class ProjectCreatedEvent(ProjectEvent):
@@ -297,7 +316,7 @@ class BoardEvent(WebhookEvent, FromRaw, CtorRepr):
 
     def __init__(self, *poargs, board, **kwargs):
         """Initialize this instance."""
-        check_type(board, Board)
+        check_type(board, jira_resource_type('Board'))
         super().__init__(*poargs, **kwargs)
         self.__board = board
 
@@ -314,7 +333,7 @@ class BoardEvent(WebhookEvent, FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('board', type=Mapping,
-                   filter=raw_to_jira_resource(Board))
+                   filter=_board_from_raw)
 
 
 class BoardCreatedEvent(BoardEvent):
@@ -395,7 +414,7 @@ class IssueUpdatedEvent(IssueEvent, WithComment, FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('change', source_name='changelog', type=Mapping,
-                   filter=Change.from_raw, required=False)
+                   filter=mover.nested(Change), required=False)
 
 
 class IssueDeletedEvent(IssueEvent):
@@ -415,7 +434,7 @@ class WorklogEvent(WebhookEvent, FromRaw, CtorRepr):
 
     def __init__(self, *poargs, worklog, **kwargs):
         """Initialize this instance."""
-        check_type(worklog, Worklog)
+        check_type(worklog, jira_resource_type('Worklog'))
         super().__init__(*poargs, **kwargs)
         self.__worklog = worklog
 
@@ -432,7 +451,7 @@ class WorklogEvent(WebhookEvent, FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('worklog', type=Mapping,
-                   filter=raw_to_jira_resource(Worklog))
+                   filter=_worklog_from_raw)
 
 
 class WorklogCreatedEvent(WorklogEvent):
@@ -484,7 +503,7 @@ class AttachmentEvent(WebhookEvent, FromRaw, CtorRepr):
 
     def __init__(self, *poargs, attachment, **kwargs):
         """Initialize this instance."""
-        check_type(attachment, Attachment)
+        check_type(attachment, jira_resource_type('Attachment'))
         super().__init__(*poargs, **kwargs)
         self.__attachment = attachment
 
@@ -501,7 +520,7 @@ class AttachmentEvent(WebhookEvent, FromRaw, CtorRepr):
     def _collect_ctor_args_from_raw(cls, mover):
         super()._collect_ctor_args_from_raw(mover)
         mover.move('attachment', type=Mapping,
-                   filter=raw_to_jira_resource(Attachment))
+                   filter=_attachment_from_raw)
 
 
 class AttachmentCreatedEvent(AttachmentEvent):
@@ -540,28 +559,234 @@ KNOWN_WEBHOOK_EVENTS = {
 }
 
 
-def webhook_event_from_raw(raw, strict=True):
+def _webhook_event_class(raw, strict):
+    try:
+        event_type = raw['webhookEvent']
+    except KeyError:
+        raise MissingWebhookEventType(raw=raw) from None
+    try:
+        return KNOWN_WEBHOOK_EVENTS[event_type]
+    except (KeyError, TypeError):
+        exc = UnknownWebhookEventType(raw=raw, type=str(event_type))
+        if strict:
+            raise exc from None
+        elif strict is not None:
+            logger.warning(exc)
+            logger.warning("using generic WebhookEvent")
+        return WebhookEvent
+
+
+def webhook_event_from_raw(raw, strict=True, project=None,
+                           mode=RawFieldMover.COPY):
     """Create a new instance from the given raw representation.
 
     :param raw: the raw representation of a webhook event.
     :type raw: `dict` or ``PropertyHolder``
+    :param project:
+        field projections to apply before parsing, keyed by top-level field
+        name, e.g. ``{'issue': ['key', 'fields.status']}``; see
+        `.raw.project_raw()`.  Dropped subtrees are never turned into Jira
+        resources.
+    :type project: `~collections.abc.Mapping`
+    :param mode:
+        how to keep track of unparsed fields; see `.raw.RawFieldMover`.  Pass
+        `~.raw.RawFieldMover.CONSUME` if *raw* is disposable, to parse it in
+        place without copying.
+    :type mode: `str`
     :return: the created instance.
     :rtype: `WebhookEvent`
     :raise `InvalidWebhookEvent`: if the given raw representation is invalid.
     """
     check_type(raw, Mapping)
+    event_class = _webhook_event_class(raw, strict)
+    if project is not None:
+        raw = project_raw(raw, project)
+    return event_class.from_raw(raw, strict=strict, mode=mode)
+
+
+def _json_decoder():
     try:
-        event_type = raw['webhookEvent']
-    except KeyError:
-        raise MissingWebhookEventType(raw=raw) from None
+        from orjson import loads
+    except ImportError:
+        from json import loads
+
+        def decode(body):
+            if isinstance(body, memoryview):
+                body = body.tobytes()
+            return loads(body)
+
+        return decode
+    return loads
+
+
+_default_decoder = None
+
+
+def default_json_decoder():
+    """Return the default JSON decoder used by `webhook_event_from_bytes()`.
+
+    This is :func:`orjson.loads` if :mod:`orjson` is installed, which decodes
+    `bytes`, `bytearray` and `memoryview` in place.  Otherwise, it is
+    :func:`json.loads`, with `memoryview` bodies copied into `bytes` first.
+
+    :return: the decoder.
+    :rtype: `~collections.abc.Callable`
+    """
+    global _default_decoder
+    if _default_decoder is None:
+        _default_decoder = _json_decoder()
+    return _default_decoder
+
+
+def webhook_event_from_bytes(body, decoder=None, strict=True, project=None,
+                             mode=RawFieldMover.CONSUME):
+    """Create a new instance from the given JSON-encoded webhook body.
+
+    :param body: the UTF-8 JSON webhook request body.
+    :type body: `bytes`, `bytearray` or `memoryview`
+    :param decoder:
+        the JSON decoder, which takes *body* and returns the decoded value
+        (default: `default_json_decoder()`).
+    :type decoder: `~collections.abc.Callable`
+    :param project: field projections; see `webhook_event_from_raw()`.
+    :type project: `~collections.abc.Mapping`
+    :param mode:
+        see `webhook_event_from_raw()`.  The default consumes the freshly
+        decoded data in place; pass `~.raw.RawFieldMover.COPY` if *decoder*
+        may return shared objects.
+    :type mode: `str`
+    :return: the created instance.
+    :rtype: `WebhookEvent`
+    :raise `MalformedWebhookEvent`: if *body* is not a JSON object.
+    :raise `InvalidWebhookEvent`: if the decoded webhook event is invalid.
+    """
+    check_type(body, (bytes, bytearray, memoryview))
+    if decoder is None:
+        decoder = default_json_decoder()
     try:
-        event_class = KNOWN_WEBHOOK_EVENTS[event_type]
-    except KeyError:
-        exc = UnknownWebhookEventType(raw=raw, type=event_type)
-        if strict:
-            raise exc from None
-        elif strict is not None:
-            logger.warning(exc)
-            logger.warning("using generic WebhookEvent")
-        event_class = WebhookEvent
-    return event_class.from_raw(raw, strict=strict)
+        raw = decoder(body)
+    except ValueError as e:
+        # The caller may release a memoryview body once this returns.
+        if isinstance(body, memoryview):
+            body = body.tobytes()
+        raise MalformedWebhookEvent(raw=body) from e
+    if not isinstance(raw, Mapping):
+        raise MalformedWebhookEvent(raw=raw)
+    return webhook_event_from_raw(raw, strict=strict, project=project,
+                                  mode=mode)
+
+
+WebhookEventError = namedtuple('WebhookEventError', 'index, raw, exception')
+"""A webhook event that failed to parse in a batch."""
+
+
+class WebhookEventBatch(CtorRepr):
+    """Result of parsing a batch of webhook events.
+
+    :param events: the successfully parsed events, in input order.
+    :type events: `list` of `WebhookEvent`
+    :param errors: the collected parse errors, in input order.
+    :type errors: `list` of `WebhookEventError`
+    :param elapsed: the time spent parsing, in seconds.
+    :type elapsed: `float`
+    """
+
+    def __init__(self, *poargs, events, errors, elapsed, **kwargs):
+        """Initialize this instance."""
+        check_type(events, list)
+        check_type(errors, list)
+        check_type(elapsed, float)
+        super().__init__(*poargs, **kwargs)
+        self.__events = events
+        self.__errors = errors
+        self.__elapsed = elapsed
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(events=self.__events, errors=self.__errors,
+                      elapsed=self.__elapsed)
+
+    @property
+    def events(self):  # noqa: D401
+        """The successfully parsed events, in input order."""
+        return self.__events
+
+    @property
+    def errors(self):  # noqa: D401
+        """The collected parse errors, in input order."""
+        return self.__errors
+
+    @property
+    def elapsed(self):  # noqa: D401
+        """The time spent parsing, in seconds."""
+        return self.__elapsed
+
+
+ON_ERROR_POLICIES = frozenset({'collect', 'raise', 'skip'})
+"""Valid *on_error* values for `parse_webhook_events()`."""
+
+
+def parse_webhook_events(raws, strict=True, on_error='collect', project=None,
+                         mode=RawFieldMover.COPY):
+    """Parse a batch of raw webhook events.
+
+    Event classes are resolved once per distinct ``webhookEvent`` type and
+    projections are compiled once per batch.  With a non-strict *strict*,
+    unknown event types are warned about once per type, not once per event.
+
+    :param raws: the raw webhook events.
+    :type raws: `~collections.abc.Iterable` of `~collections.abc.Mapping`
+    :param strict: see `webhook_event_from_raw()`.
+    :param on_error:
+        what to do with an event that fails to parse: ``'collect'`` it into
+        `WebhookEventBatch.errors` (default), ``'raise'`` its exception, or
+        ``'skip'`` it silently.
+    :type on_error: `str`
+    :param project: field projections; see `webhook_event_from_raw()`.
+    :type project: `~collections.abc.Mapping`
+    :param mode: see `webhook_event_from_raw()`.
+    :type mode: `str`
+    :return: the parsed events and errors.
+    :rtype: `WebhookEventBatch`
+    :raise `InvalidWebhookEvent`:
+        if an event is invalid and *on_error* is ``'raise'``.
+    """
+    check_type(raws, Iterable)
+    if on_error not in ON_ERROR_POLICIES:
+        raise ValueError("invalid on_error {!r}, should be one of: {}"
+                         .format(on_error,
+                                 ", ".join(sorted(ON_ERROR_POLICIES))))
+    if project is not None:
+        check_type(project, Mapping)
+        project = {name: (projection
+                          if isinstance(projection, RawProjection)
+                          else RawProjection(paths=projection))
+                   for name, projection in project.items()}
+    start = perf_counter()
+    events = []
+    errors = []
+    classes = {}
+    for index, raw in enumerate(raws):
+        try:
+            if not isinstance(raw, Mapping):
+                raise MalformedWebhookEvent(raw=raw)
+            event_type = raw.get('webhookEvent')
+            if isinstance(event_type, str) and event_type in classes:
+                event_class = classes[event_type]
+            else:
+                event_class = _webhook_event_class(raw, strict)
+                if isinstance(event_type, str):
+                    classes[event_type] = event_class
+            if project is not None:
+                event = event_class.from_raw(project_raw(raw, project),
+                                             strict=strict, mode=mode)
+            else:
+                event = event_class.from_raw(raw, strict=strict, mode=mode)
+            events.append(event)
+        except InvalidRawData as e:
+            if on_error == 'raise':
+                raise
+            if on_error == 'collect':
+                errors.append(WebhookEventError(index, raw, e))
+    return WebhookEventBatch(events=events, errors=errors,
+                             elapsed=perf_counter() - start)
@@ -0,0 +1,262 @@
+"""Worklog rollups maintained incrementally from webhook events."""
+
+from collections import Counter, OrderedDict
+from datetime import date, datetime
+import json
+import logging
+from threading import RLock
+
+from ctorrepr import CtorRepr
+
+from .logging import LoggerProxy
+from .util import atomic_open, check_type
+from .webhook import (IssueWorkLogUpdatedEvent, WorklogDeletedEvent,
+                      WorklogEvent)
+
+logger = LoggerProxy(default_logger=logging.getLogger(__name__))
+
+
+def _worklog_user(raw):
+    author = raw.get('author') or {}
+    for field in ('accountId', 'key', 'name'):
+        if author.get(field):
+            return author[field]
+    return None
+
+
+def _worklog_day(raw):
+    started = raw.get('started')
+    if not isinstance(started, str):
+        return None
+    return datetime.strptime(started[:10], '%Y-%m-%d').date().toordinal()
+
+
+class WorklogLedger(CtorRepr):
+    """Time tracking totals maintained incrementally from worklog events.
+
+    Feed worklog events to `apply()`.  Each worklog is recorded by ID, and
+    its time spent is added to per-issue, per-user, per-day and per-user-day
+    totals.  Updates replace the previous version of a worklog and deletes
+    remove it, so applying an event more than once is harmless; updates
+    older than the recorded version, and any update to a recently deleted
+    worklog, are ignored.
+
+    Issue worklog updated events (``jira:worklog_updated``) do not identify
+    the worklog, only the new issue total; that total is recorded as the
+    `reported_time_spent()` of the issue, for reconciliation.
+
+    The state can be saved with `save()` and restored with `load()`.
+
+    :param max_deleted:
+        how many deleted worklog IDs to remember, forgetting the oldest
+        deletions first; late updates to a forgotten worklog recreate it.
+    :type max_deleted: `int`
+    """
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, *poargs, max_deleted=100000, **kwargs):
+        """Initialize this instance."""
+        check_type(max_deleted, int)
+        if max_deleted < 0:
+            raise ValueError("max_deleted {!r} is negative"
+                             .format(max_deleted))
+        super().__init__(*poargs, **kwargs)
+        self.__max_deleted = max_deleted
+        self.__entries = {}
+        self.__deleted = OrderedDict()
+        self.__by_issue = Counter()
+        self.__by_user = Counter()
+        self.__by_day = Counter()
+        self.__by_user_day = Counter()
+        self.__reported = {}
+        self.__lock = RLock()
+
+    def _collect_repr_args(self, poargs, kwargs):
+        super()._collect_repr_args(poargs, kwargs)
+        kwargs.update(max_deleted=self.__max_deleted)
+
+    @property
+    def max_deleted(self):  # noqa: D401
+        """How many deleted worklog IDs to remember."""
+        return self.__max_deleted
+
+    def __len__(self):
+        """Return the number of worklogs recorded."""
+        return len(self.__entries)
+
+    def apply(self, event):
+        """Update from a webhook event.
+
+        Other events are ignored.
+
+        :param event: the event.
+        :type event: `.webhook.WebhookEvent`
+        """
+        if isinstance(event, WorklogDeletedEvent):
+            self.delete(event.worklog.raw['id'])
+        elif isinstance(event, WorklogEvent):
+            self.record(event.worklog.raw)
+        elif (isinstance(event, IssueWorkLogUpdatedEvent) and
+                event.change is not None and
+                'timespent' in event.change.fields):
+            self.__reported[str(event.issue.raw['id'])] = (
+                    event.change.fields['timespent'].new.decoded)
+
+    def __add(self, entry, sign):
+        issue, user, day, seconds, _ = entry
+        delta = sign * seconds
+        for counter, key in ((self.__by_issue, issue),
+                             (self.__by_user, user),
+                             (self.__by_day, day),
+                             (self.__by_user_day, (user, day))):
+            counter[key] += delta
+            if not counter[key]:
+                del counter[key]
+
+    def record(self, raw):
+        """Record a new or updated worklog.
+
+        :param raw: the raw worklog.
+        :type raw: `~collections.abc.Mapping`
+        """
+        id = str(raw['id'])
+        entry = (str(raw.get('issueId')), _worklog_user(raw),
+                 _worklog_day(raw), int(raw.get('timeSpentSeconds') or 0),
+                 raw.get('updated') or '')
+        with self.__lock:
+            if id in self.__deleted:
+                logger.debug("ignoring update to deleted worklog %s", id)
+                return
+            previous = self.__entries.get(id)
+            if previous is not None:
+                if entry[4] < previous[4]:
+                    logger.debug("ignoring stale update to worklog %s", id)
+                    return
+                self.__add(previous, -1)
+            self.__entries[id] = entry
+            self.__add(entry, +1)
+
+    def delete(self, id):
+        """Delete a worklog.
+
+        :param id: the worklog ID.
+        """
+        id = str(id)
+        with self.__lock:
+            self.__remember_deleted(id)
+            entry = self.__entries.pop(id, None)
+            if entry is not None:
+                self.__add(entry, -1)
+
+    def __remember_deleted(self, id):
+        deleted = self.__deleted
+        deleted[id] = None
+        deleted.move_to_end(id)
+        while len(deleted) > self.__max_deleted:
+            deleted.popitem(last=False)
+
+    def issue_total(self, issue):
+        """Return the time logged on an issue, in seconds.
+
+        :param issue: the issue ID.
+        :rtype: `int`
+        """
+        return self.__by_issue[str(issue)]
+
+    def user_total(self, user):
+        """Return the time logged by a user, in seconds.
+
+        :param user: the user account ID (or key or name on Jira Server).
+        :type user: `str`
+        :rtype: `int`
+        """
+        return self.__by_user[user]
+
+    def day_total(self, day, user=None):
+        """Return the time logged on a day, in seconds.
+
+        :param day: the day the work was started on.
+        :type day: `~datetime.date`
+        :param user: if given, only count time logged by this user.
+        :type user: `str`
+        :rtype: `int`
+        """
+        check_type(day, date)
+        if user is None:
+            return self.__by_day[day.toordinal()]
+        return self.__by_user_day[user, day.toordinal()]
+
+    def daily_totals(self, start, end, user=None):
+        """Return the time logged per day in a date range.
+
+        :param start: the first day.
+        :type start: `~datetime.date`
+        :param end: the day after the last day.
+        :type end: `~datetime.date`
+        :param user: if given, only count time logged by this user.
+        :type user: `str`
+        :return: the time in seconds, keyed by day; days without any time
+            logged are omitted.
+        :rtype: `dict`
+        """
+        totals = {}
+        for ordinal in range(start.toordinal(), end.toordinal()):
+            day = date.fromordinal(ordinal)
+            total = self.day_total(day, user=user)
+            if total:
+                totals[day] = total
+        return totals
+
+    def reported_time_spent(self, issue):
+        """Return the issue total last reported by Jira, if any.
+
+        :param issue: the issue ID.
+        :return: the time in seconds, or `None`.
+        :rtype: `int`
+        """
+        return self.__reported.get(str(issue))
+
+    def save(self, path):
+        """Save the state to a file.
+
+        :param path: the snapshot file path.
+        :type path: `str`
+        """
+        with self.__lock:
+            snapshot = {
+                'version': self.SNAPSHOT_VERSION,
+                'entries': self.__entries,
+                'deleted': list(self.__deleted),
+                'reported': self.__reported,
+            }
+            with atomic_open(path) as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path, max_deleted=100000):
+        """Restore the state saved with `save()`.
+
+        Totals are recomputed from the saved worklogs.
+
+        :param path: the snapshot file path.
+        :type path: `str`
+        :param max_deleted: see `WorklogLedger`.
+        :return: the restored ledger.
+        :rtype: `WorklogLedger`
+        :raise `ValueError`: if the snapshot version is not supported.
+        """
+        with open(path) as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != cls.SNAPSHOT_VERSION:
+            raise ValueError("{} is not a version {} snapshot"
+                             .format(path, cls.SNAPSHOT_VERSION))
+        ledger = cls(max_deleted=max_deleted)
+        for id, entry in snapshot['entries'].items():
+            entry = tuple(entry)
+            ledger.__entries[id] = entry
+            ledger.__add(entry, +1)
+        for id in snapshot['deleted']:
+            ledger.__remember_deleted(id)
+        ledger.__reported.update(snapshot['reported'])
+        return ledger
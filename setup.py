@@ -16,6 +16,10 @@ requirements = [
     'ctorrepr',
 ]
 
+extra_requirements = {
+    'fastjson': ['orjson'],
+}
+
 setup_requirements = [
     'pytest-runner',
     # TODO(astralblue): put setup requirements (distutils extensions, etc.)
@@ -24,6 +28,7 @@ setup_requirements = [
 
 test_requirements = [
     'pytest',
+    'orjson',
     # TODO: put package test requirements here
 ]
 
@@ -39,6 +44,7 @@ setup(
     packages=find_packages(include=['jirax']),
     include_package_data=True,
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="BSD license",
     zip_safe=False,
     keywords='jirax',
@@ -48,10 +54,12 @@ setup(
         'License :: OSI Approved :: BSD License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
+    python_requires='>=3.8',
     test_suite='tests',
     tests_require=test_requirements,
     setup_requires=setup_requirements,
@@ -0,0 +1,87 @@
+"""Tests for `jirax.cache`."""
+
+import copy
+import os
+
+import pytest
+
+from jirax.cache import IssueCache, ProjectDirectory, ResourceDirectory
+from jirax.raw import raw_to_jira_resource
+from jirax.webhook import webhook_event_from_raw
+
+from .test_changelog import ISSUE_UPDATED
+
+ISSUE = {'self': 'https://example.atlassian.net/rest/api/2/issue/10001',
+         'id': '10001', 'key': 'TEST-1',
+         'fields': {'summary': 'Old', 'status': {'id': '1', 'name': 'Open'},
+                    'duedate': '2020-01-01'}}
+
+
+def _cache():
+    cache = IssueCache()
+    created = copy.deepcopy(ISSUE_UPDATED)
+    created['webhookEvent'] = 'jira:issue_created'
+    del created['changelog']
+    created['issue'] = copy.deepcopy(ISSUE)
+    cache.apply(webhook_event_from_raw(created))
+    return cache
+
+
+def _change(*items):
+    raw = copy.deepcopy(ISSUE_UPDATED)
+    raw['issue'] = {key: ISSUE[key] for key in ('self', 'id', 'key')}
+    raw['changelog']['items'] = list(items)
+    return webhook_event_from_raw(raw)
+
+
+def test_supported_changes_are_applied():
+    """Changes to plain text fields and labels update the cached issue."""
+    cache = _cache()
+    cache.apply(_change(
+        {'field': 'summary', 'fieldId': 'summary', 'fieldtype': 'jira',
+         'from': None, 'fromString': 'Old', 'to': None, 'toString': 'New'},
+        {'field': 'labels', 'fieldId': 'labels', 'fieldtype': 'jira',
+         'from': None, 'fromString': '', 'to': None, 'toString': 'a b'}))
+    fields = cache.get('TEST-1').raw['fields']
+    assert fields['summary'] == 'New'
+    assert fields['labels'] == ['a', 'b']
+    assert fields['status'] == {'id': '1', 'name': 'Open'}
+
+
+def test_unsupported_changes_evict():
+    """Changes to resource or unknown fields evict the issue."""
+    for item in (
+            {'field': 'status', 'fieldId': 'status', 'fieldtype': 'jira',
+             'from': '1', 'fromString': 'Open', 'to': '3',
+             'toString': 'Done'},
+            {'field': 'assignee', 'fieldId': 'assignee', 'fieldtype': 'jira',
+             'from': None, 'fromString': None, 'to': 'jdoe',
+             'toString': 'J. Doe'},
+            {'field': 'duedate', 'fieldId': 'duedate', 'fieldtype': 'jira',
+             'from': None, 'fromString': None, 'to': '2020-02-01',
+             'toString': '2020-02-01 00:00:00.0'},
+            {'field': 'WorklogId', 'fieldtype': 'jira', 'from': None,
+             'fromString': None, 'to': '10100', 'toString': '10100'}):
+        cache = _cache()
+        cache.apply(_change(item))
+        assert '10001' not in cache
+
+
+def test_resource_directory_is_abstract():
+    """Only concrete directories can be created."""
+    with pytest.raises(TypeError):
+        ResourceDirectory()
+
+
+def test_directory_snapshot_round_trip(tmp_path):
+    """A saved directory loads back, leaving no temporary file behind."""
+    path = str(tmp_path / 'projects.json')
+    directory = ProjectDirectory()
+    directory.put(raw_to_jira_resource('Project')(
+        {'self': 'https://example.atlassian.net/rest/api/2/project/10000',
+         'id': '10000', 'key': 'TEST', 'name': 'Test'}))
+    directory.save(path)
+    assert os.listdir(str(tmp_path)) == ['projects.json']
+    loaded = ProjectDirectory()
+    loaded.load(path)
+    assert loaded.get_by_key('TEST').raw['name'] == 'Test'
@@ -0,0 +1,82 @@
+"""Tests for `jirax.changelog`."""
+
+import json
+
+import pytest
+
+from jirax.filters import compile_filter
+from jirax.raw import RawFieldValueError
+from jirax.subscriptions import FieldSubscriptions
+from jirax.webhook import webhook_event_from_bytes
+
+ISSUE_UPDATED = {
+    'webhookEvent': 'jira:issue_updated',
+    'timestamp': 1525698237764,
+    'user': {'self': 'https://example.atlassian.net/rest/api/2/user?'
+                     'accountId=5b10ac8d82e05b22cc7d4ef5',
+             'accountId': '5b10ac8d82e05b22cc7d4ef5'},
+    'issue': {'self': 'https://example.atlassian.net/rest/api/2/issue/10001',
+              'id': '10001', 'key': 'TEST-1', 'fields': {}},
+    'changelog': {'id': '10100', 'items': [
+        {'field': 'status', 'fieldId': 'status', 'fieldtype': 'jira',
+         'from': '1', 'fromString': 'Open', 'to': '3', 'toString': 'Done'},
+        {'field': 'labels', 'fieldId': 'labels', 'fieldtype': 'jira',
+         'from': None, 'fromString': 'a b', 'to': None, 'toString': 'b c'},
+    ]},
+}
+
+
+def _event(items=None):
+    raw = json.loads(json.dumps(ISSUE_UPDATED))
+    if items is not None:
+        raw['changelog']['items'] = items
+    return webhook_event_from_bytes(json.dumps(raw).encode())
+
+
+def test_lookup_does_not_consume_raw_items():
+    """Looking up a field leaves the raw items for other readers."""
+    event = _event()
+    fields = event.change.fields
+    assert fields['labels'].added == {'c'}
+    assert fields['status'].new.str == 'Done'
+    assert fields.raw['status'][0]['toString'] == 'Done'
+    assert event.change.deltas()['labels'].removed == {'a'}
+    assert compile_filter('status changed to Done')(event)
+    calls = []
+    subscriptions = FieldSubscriptions()
+    subscriptions.subscribe('status', calls.append, new='Done')
+    assert subscriptions.dispatch(event) == 1
+    assert calls == [event]
+
+
+def test_field_items():
+    """field_items() lists the changelog items without parsing them."""
+    event = _event()
+    event.change.fields['status']
+    items = event.change.field_items()
+    assert [(item.id, item.old_str, item.new_str) for item in items] == [
+        ('status', 'Open', 'Done'), ('labels', 'a b', 'b c')]
+
+
+def test_multi_valued_items_are_merged():
+    """Several items of a multi-valued field make up one delta."""
+    def component(old, new):
+        return {'field': 'Component', 'fieldId': 'components',
+                'fieldtype': 'jira', 'from': None, 'fromString': old,
+                'to': None, 'toString': new}
+    event = _event([component(None, 'API'), component(None, 'UI'),
+                    component('DB', None)])
+    change = event.change.fields['components']
+    assert change.added == {'API', 'UI'}
+    assert change.removed == {'DB'}
+    assert event.change.deltas()['components'] == ({'API', 'UI'}, {'DB'})
+    assert len(event.change.field_items()) == 3
+
+
+def test_undecodable_value_raises_raw_field_value_error():
+    """A decoder failing on a malformed raw value raises RawFieldValueError."""
+    event = _event([{'field': 'Sprint', 'fieldtype': 'custom',
+                     'fieldId': 'customfield_10020', 'from': None,
+                     'fromString': None, 'to': 42, 'toString': 'Sprint 1'}])
+    with pytest.raises(RawFieldValueError):
+        event.change.fields['customfield_10020'].new.decoded
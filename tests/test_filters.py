@@ -0,0 +1,22 @@
+"""Tests for `jirax.filters`."""
+
+import copy
+import json
+
+from jirax.filters import compile_filter
+from jirax.webhook import webhook_event_from_bytes
+
+from .test_changelog import ISSUE_UPDATED
+
+
+def test_parsed_and_raw_agree_after_field_lookup():
+    """Looking up a field does not change what a filter sees."""
+    raw = copy.deepcopy(ISSUE_UPDATED)
+    event = webhook_event_from_bytes(json.dumps(raw).encode())
+    event.change.fields['status']
+    for expression in ('status changed to Done',
+                       'status changed from Open to "Done"',
+                       'labels changed and not status changed to Open'):
+        event_filter = compile_filter(expression)
+        assert event_filter(event)
+        assert event_filter.match_raw(raw)
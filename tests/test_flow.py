@@ -0,0 +1,14 @@
+"""Tests for `jirax.flow`."""
+
+from jirax.flow import CumulativeFlow
+
+
+def test_late_transition_is_ignored():
+    """A transition older than the last one does not move the issue."""
+    flow = CumulativeFlow(bucket=60)
+    flow.transition('10001', 'TEST', 'Open', 0, created=True)
+    flow.transition('10001', 'TEST', 'Done', 30000)
+    flow.transition('10001', 'TEST', 'In Progress', 10000)
+    assert flow.current('TEST') == {'Done': 1}
+    assert [bucket.completed for bucket in flow.series('TEST', 30000, 30060)
+            ] == [1]
@@ -0,0 +1,79 @@
+"""Tests for `jirax.lanes`."""
+
+import json
+import os
+
+from jirax.lanes import SPILL, Lane, LaneStats, PriorityLanes
+
+
+def _raw(type, seq):
+    return {'webhookEvent': type, 'timestamp': seq}
+
+
+def test_lanes_share_dequeues_by_weight():
+    """Busy lanes get dequeues in proportion to their weights."""
+    lanes = PriorityLanes(lanes={'fast': Lane(weight=3), 'slow': Lane()},
+                          routes={'jira:issue_created': 'fast'},
+                          default_lane='slow')
+    for seq in range(40):
+        lanes.put(_raw('jira:issue_created', seq))
+        lanes.put(_raw('comment_created', seq))
+    taken = [lanes.get(timeout=0)['webhookEvent'] for _ in range(40)]
+    assert taken.count('jira:issue_created') == 30
+    assert taken.count('comment_created') == 10
+    rest = [lanes.get(timeout=0)['webhookEvent'] for _ in range(40)]
+    assert rest.count('jira:issue_created') == 10
+    assert rest[-20:] == ['comment_created'] * 20
+    assert lanes.get(timeout=0) is None
+
+
+def test_full_lanes_shed_or_spill(tmp_path):
+    """Events for a full lane are dropped or spilled, and counted."""
+    lanes = PriorityLanes(lanes={'shed': Lane(max_depth=2),
+                                 'spill': Lane(max_depth=2, overflow=SPILL)},
+                          routes={'comment_created': 'spill'},
+                          default_lane='shed', spill_dir=str(tmp_path))
+    results = [lanes.put(_raw(type, seq))
+               for type in ('jira:issue_created', 'comment_created')
+               for seq in range(5)]
+    assert results == [True, True, False, False, False] * 2
+    stats = lanes.stats()
+    assert stats['shed'] == LaneStats(depth=2, enqueued=2, dequeued=0,
+                                      shed=3, spilled=0)
+    assert stats['spill'] == LaneStats(depth=2, enqueued=2, dequeued=0,
+                                       shed=0, spilled=3)
+    with open(lanes.spill_path('spill')) as f:
+        assert [json.loads(line)['timestamp'] for line in f] == [2, 3, 4]
+
+
+def test_replay_spill(tmp_path):
+    """Replayed events are queued, and spilled again without counting."""
+    lanes = PriorityLanes(lanes={'spill': Lane(max_depth=5, overflow=SPILL)},
+                          routes={}, default_lane='spill',
+                          spill_dir=str(tmp_path))
+    for seq in range(20):
+        lanes.put(_raw('comment_created', seq))
+    assert [lanes.get(timeout=0)['timestamp'] for _ in range(2)] == [0, 1]
+    assert lanes.replay_spill('spill') == 2
+    assert lanes.stats()['spill'].spilled == 15
+    assert [lanes.get(timeout=0)['timestamp'] for _ in range(5)] == [
+            2, 3, 4, 5, 6]
+    assert lanes.replay_spill('spill') == 5
+    assert lanes.replay_spill('spill') == 0
+    assert [lanes.get(timeout=0)['timestamp'] for _ in range(5)] == [
+            7, 8, 9, 10, 11]
+    assert lanes.stats()['spill'].spilled == 15
+
+
+def test_replay_spill_resumes_interrupted_replay(tmp_path):
+    """Events left by an interrupted replay are not overwritten."""
+    lanes = PriorityLanes(lanes={'spill': Lane(overflow=SPILL)}, routes={},
+                          default_lane='spill', spill_dir=str(tmp_path))
+    path = lanes.spill_path('spill')
+    with open(path + '.replay', 'w') as f:
+        f.write('{"timestamp":1}\n{"timest\n{"timestamp":2}\n')
+    with open(path, 'w') as f:
+        f.write('{"timestamp":3}\n')
+    assert lanes.replay_spill('spill') == 3
+    assert [lanes.get(timeout=0)['timestamp'] for _ in range(3)] == [1, 2, 3]
+    assert os.listdir(str(tmp_path)) == []
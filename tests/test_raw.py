@@ -0,0 +1,28 @@
+"""Tests for `jirax.raw`."""
+
+import copy
+
+from jirax.raw import RawFieldMover
+from jirax.webhook import parse_webhook_events
+
+from .test_changelog import ISSUE_UPDATED
+
+
+def test_consumed_errors_report_whole_raw_data():
+    """Errors in CONSUME mode show the raw data as it was given."""
+    extra = copy.deepcopy(ISSUE_UPDATED)
+    extra['bogus'] = 1
+    bad_id = copy.deepcopy(ISSUE_UPDATED)
+    bad_id['changelog']['id'] = 'abc'
+    expected = copy.deepcopy([extra, bad_id])
+    batch = parse_webhook_events([extra, bad_id], mode=RawFieldMover.CONSUME)
+    assert [error.raw for error in batch.errors] == expected
+    assert batch.errors[0].exception.raw == expected[0]
+    assert batch.errors[1].exception.raw == expected[1]['changelog']
+
+
+def test_consumed_on_success():
+    """CONSUME mode leaves only the unparsed fields in the raw data."""
+    raw = copy.deepcopy(ISSUE_UPDATED)
+    parse_webhook_events([raw], mode=RawFieldMover.CONSUME, strict=False)
+    assert raw == {}
@@ -0,0 +1,146 @@
+"""Tests for `jirax.receiver`."""
+
+import asyncio
+from http.client import HTTPConnection
+import json
+import multiprocessing
+import os
+import signal
+import socket
+from threading import Thread
+import time
+
+from jirax import receiver
+from jirax.receiver import (_COUNTERS, _Connection, MultiWorkerReceiver,
+                            ReceiverMetrics)
+
+from .test_changelog import ISSUE_UPDATED
+
+
+async def _exchange(connection, *requests):
+    server = await asyncio.start_server(connection.serve, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    responses = []
+    for request in requests:
+        writer.write(request)
+        responses.append(await reader.readuntil(b'\r\n\r\n'))
+    return server, reader, writer, responses
+
+
+def _connection(events=None):
+    return _Connection(handler=(events if events is not None else []).append,
+                       strict=True, counters=[0] * _COUNTERS, base=0,
+                       max_body=1024 * 1024)
+
+
+def test_malformed_requests_are_rejected():
+    """Bad request lines and lengths get 400 and close the connection."""
+    async def main(request):
+        server, reader, writer, responses = await _exchange(_connection(),
+                                                            request)
+        closed = await reader.read()
+        writer.close()
+        server.close()
+        return responses[0], closed
+
+    for request in (b'GARBAGE\r\n\r\n',
+                    b'POST / HTTP/1.1\r\nContent-Length: abc\r\n\r\n',
+                    b'POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n'):
+        response, closed = asyncio.run(main(request))
+        assert response.startswith(b'HTTP/1.1 400 ')
+        assert b'Connection: close' in response
+        assert closed == b''
+
+
+def test_idle_connections_are_closed():
+    """close_idle() ends keep-alive connections waiting for a request."""
+    body = json.dumps(ISSUE_UPDATED).encode()
+    request = (b'POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % len(body) +
+               body)
+    events = []
+    connection = _connection(events)
+
+    async def main():
+        server, reader, writer, responses = await _exchange(connection,
+                                                            request)
+        assert responses[0].startswith(b'HTTP/1.1 204 ')
+        connection.close_idle()
+        closed = await asyncio.wait_for(reader.read(), 1)
+        writer.close()
+        server.close()
+        return closed
+
+    assert asyncio.run(main()) == b''
+    assert len(events) == 1
+
+
+def test_unexpected_parse_errors_are_answered_500(monkeypatch):
+    """Parse failures other than invalid data are counted and get 500."""
+    def fail(body, **kwargs):
+        raise RuntimeError("decoder bug")
+
+    monkeypatch.setattr(receiver, 'webhook_event_from_bytes', fail)
+    connection = _connection()
+    assert connection.handle(b'{}') == 500
+    assert ReceiverMetrics(*connection.counters) == ReceiverMetrics(
+            received=1, handled=0, invalid=0, failed=1)
+
+
+def _ignore(event):
+    pass
+
+
+def _post(port, body):
+    client = HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        client.request('POST', '/', body)
+        return client.getresponse().status
+    finally:
+        client.close()
+
+
+def _wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _listening(port):
+    try:
+        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+    except ConnectionRefusedError:
+        return False
+    return True
+
+
+def test_receiver_restarts_crashed_workers():
+    """A killed worker is restarted, and its counters are kept."""
+    body = json.dumps(ISSUE_UPDATED).encode()
+    server = MultiWorkerReceiver(handler=_ignore, host='127.0.0.1', port=0,
+                                 workers=2, drain_timeout=1,
+                                 restart_delay=0.1)
+    server.start()
+    supervisor = Thread(target=server.run)
+    supervisor.start()
+    try:
+        _wait_until(lambda: _listening(server.port))
+        statuses = [_post(server.port, body) for _ in range(10)]
+        statuses.append(_post(server.port, b'[]'))
+        crashed = next(process
+                       for process in multiprocessing.active_children()
+                       if process.name == 'receiver-0')
+        os.kill(crashed.pid, signal.SIGKILL)
+        _wait_until(lambda: server.restarts == 1)
+        statuses += [_post(server.port, body) for _ in range(10)]
+    finally:
+        server.stop()
+        supervisor.join(10)
+    assert not supervisor.is_alive()
+    assert statuses == [204] * 10 + [400] + [204] * 10
+    assert server.restarts == 1
+    assert server.metrics() == ReceiverMetrics(received=21, handled=20,
+                                               invalid=1, failed=0)
+    assert (sum(map(sum, server.worker_metrics())) ==
+            sum(server.metrics()))
@@ -0,0 +1,175 @@
+"""Tests for `jirax.rest`, against a stub Jira server."""
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import copy
+import json
+from threading import Lock, Thread
+
+import pytest
+import requests
+
+from jirax.rest import ChangelogFetcher, IssueEnricher, IssueFetcher
+from jirax.webhook import webhook_event_from_raw
+
+from .test_changelog import ISSUE_UPDATED
+
+
+class _StubJira(HTTPServer):
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.lock = Lock()
+        self.failures = {}      # path -> statuses to answer first
+        self.routes = {}        # path -> document
+        self.requests = []      # (method, path)
+        self.bodies = []        # decoded request bodies
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def answer(self, method, path, body):
+        with self.lock:
+            self.requests.append((method, path))
+            if body:
+                self.bodies.append(json.loads(body.decode()))
+            failures = self.failures.get(path)
+            if failures:
+                return failures.pop(0), {'errorMessages': ['try again']}
+        if path in self.routes:
+            return 200, self.routes[path]
+        return 404, {'errorMessages': ['not found']}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length', 0))
+        status, document = self.server.answer(self.command,
+                                              self.path.split('?')[0],
+                                              self.rfile.read(length))
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_jira():
+    """Run a stub Jira server for the duration of a test."""
+    server = _StubJira()
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_issue_search_retries_transient_failures(stub_jira):
+    """Searches answered with 503 are retried until they succeed."""
+    stub_jira.failures['/rest/api/2/search'] = [503, 503]
+    stub_jira.routes['/rest/api/2/search'] = {
+        'total': 1, 'issues': [{'id': '10001', 'key': 'TEST-1',
+                                'fields': {}}]}
+    fetcher = IssueFetcher(server=stub_jira.url, session=requests.Session(),
+                           backoff=0)
+    assert set(fetcher.fetch_raw(['TEST-1'])) == {'TEST-1', '10001'}
+    assert stub_jira.requests == [('POST', '/rest/api/2/search')] * 3
+
+
+def test_issue_search_gives_up(stub_jira):
+    """Searches fail once the retries are used up."""
+    stub_jira.failures['/rest/api/2/search'] = [503, 503]
+    fetcher = IssueFetcher(server=stub_jira.url, session=requests.Session(),
+                           max_retries=1, backoff=0)
+    with pytest.raises(requests.HTTPError):
+        fetcher.fetch_raw(['TEST-1'])
+    assert len(stub_jira.requests) == 2
+
+
+def _issue(number):
+    return {'id': str(10000 + number), 'key': 'TEST-{}'.format(number),
+            'fields': {}}
+
+
+def _issue_event(number):
+    raw = copy.deepcopy(ISSUE_UPDATED)
+    raw['issue'] = _issue(number)
+    return webhook_event_from_raw(raw)
+
+
+def test_enricher_batches_concurrent_requests(stub_jira):
+    """Concurrent enrich() calls share one search for all their keys."""
+    stub_jira.routes['/rest/api/2/search'] = {
+        'total': 3, 'issues': [_issue(number) for number in (1, 2, 3)]}
+    fetcher = IssueFetcher(server=stub_jira.url, session=requests.Session(),
+                           backoff=0)
+    results = {}
+    with IssueEnricher(fetcher=fetcher, window=0.5) as enricher:
+
+        def enrich(name, numbers):
+            results[name] = enricher.enrich(
+                    [_issue_event(number) for number in numbers])
+
+        threads = [Thread(target=enrich, args=('a', (1, 2))),
+                   Thread(target=enrich, args=('b', (2, 3)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert stub_jira.requests == [('POST', '/rest/api/2/search')]
+    assert stub_jira.bodies[0]['jql'] == (
+            'key in ("TEST-1", "TEST-2", "TEST-3")')
+    assert [enriched.issue.key for enriched in results['a']] == [
+            'TEST-1', 'TEST-2']
+    assert [enriched.issue.key for enriched in results['b']] == [
+            'TEST-2', 'TEST-3']
+    assert results['a'][1].issue is results['b'][0].issue
+
+
+def _history(id):
+    return {'id': id, 'created': '2020-01-01T10:00:00.000+0000',
+            'items': [{'field': 'status', 'fieldId': 'status',
+                       'fieldtype': 'jira', 'from': '1', 'fromString': 'Open',
+                       'to': '3', 'toString': 'Done'}]}
+
+
+def test_backfill_retries_and_collects_failures(stub_jira):
+    """A 503 is retried, and a missing issue does not stop the others."""
+    path = '/rest/api/2/issue/TEST-1/changelog'
+    stub_jira.failures[path] = [503]
+    stub_jira.routes[path] = {'values': [_history('100')], 'isLast': True}
+    fetcher = ChangelogFetcher(server=stub_jira.url,
+                               session=requests.Session(), backoff=0)
+    errors = {}
+    changes = list(fetcher.backfill(['TEST-9', 'TEST-1'], max_workers=1,
+                                    errors=errors))
+    assert [(backfilled.issue, backfilled.change.id)
+            for backfilled in changes] == [('TEST-1', 100)]
+    assert list(errors) == ['TEST-9']
+    assert errors['TEST-9'].response.status_code == 404
+    assert stub_jira.requests.count(('GET', path)) == 2
+
+
+def test_changelog_falls_back_to_expand(stub_jira):
+    """Without the changelog endpoint, the issue changelog is expanded."""
+    stub_jira.routes['/rest/api/2/issue/TEST-2'] = {
+        'id': '10002', 'key': 'TEST-2',
+        'changelog': {'startAt': 0, 'maxResults': 1, 'total': 1,
+                      'histories': [_history('200')]}}
+    fetcher = ChangelogFetcher(server=stub_jira.url,
+                               session=requests.Session(), backoff=0)
+    assert [change.id for change in fetcher.fetch('TEST-2')] == [200]
+    assert [change.id for change in fetcher.fetch('TEST-2')] == [200]
+    assert stub_jira.requests == [
+        ('GET', '/rest/api/2/issue/TEST-2/changelog'),
+        ('GET', '/rest/api/2/issue/TEST-2'),
+        ('GET', '/rest/api/2/issue/TEST-2')]
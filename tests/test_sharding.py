@@ -0,0 +1,100 @@
+"""Tests for `jirax.sharding`."""
+
+import copy
+from functools import partial
+import multiprocessing
+
+import pytest
+
+from jirax.sharding import HashRing, ShardedConsumer
+
+from .test_changelog import ISSUE_UPDATED
+
+
+def _raw_event(issue, seq):
+    raw = copy.deepcopy(ISSUE_UPDATED)
+    raw['issue'] = {'id': str(issue), 'key': 'TEST-{}'.format(issue),
+                    'fields': {'seq': seq}}
+    return raw
+
+
+def _record(path, event):
+    with open(path, 'a') as f:
+        f.write('{} {}\n'.format(event.issue.raw['id'],
+                                 event.issue.raw['fields']['seq']))
+
+
+def _wait(gate, event):
+    gate.wait()
+
+
+def test_hash_ring_moves_only_the_keys_of_the_changed_node():
+    """Adding or removing a node moves only the keys it owns."""
+    ring = HashRing(nodes=['a', 'b', 'c'])
+    keys = [str(10000 + i) for i in range(1000)]
+    before = {key: ring.node_for(key) for key in keys}
+    ring.add('d')
+    after = {key: ring.node_for(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    assert moved and all(after[key] == 'd' for key in moved)
+    assert len(moved) < len(keys) / 2
+    ring.remove('d')
+    assert {key: ring.node_for(key) for key in keys} == before
+    ring.remove('a')
+    assert all(ring.node_for(key) == before[key]
+               for key in keys if before[key] != 'a')
+    assert ring.nodes == ['b', 'c']
+
+
+def test_events_of_an_issue_are_handled_in_order(tmp_path):
+    """Events of an issue are handled in order, across worker changes."""
+    path = str(tmp_path / 'handled')
+    with ShardedConsumer(handler=partial(_record, path),
+                         workers=3) as consumer:
+        for seq in range(20):
+            for issue in range(8):
+                consumer.submit(_raw_event(issue, seq))
+            if seq == 10:
+                consumer.add_worker()
+            if seq == 15:
+                consumer.remove_worker('worker-0')
+        assert consumer.drain(timeout=10)
+    handled = {}
+    with open(path) as f:
+        for line in f:
+            issue, seq = line.split()
+            handled.setdefault(issue, []).append(int(seq))
+    assert handled == {str(issue): list(range(20)) for issue in range(8)}
+
+
+def test_stats_report_lag():
+    """Events routed to a worker count as lag until processed."""
+    gate = multiprocessing.Event()
+    with ShardedConsumer(handler=partial(_wait, gate),
+                         workers=2) as consumer:
+        name = consumer.submit(_raw_event(1, 0))
+        consumer.submit(_raw_event(1, 1))
+        assert consumer.stats()[name].lag == 2
+        assert consumer.drain(timeout=0.1) is False
+        gate.set()
+        assert consumer.drain(timeout=10)
+        stats = consumer.stats()
+    assert stats[name].submitted == stats[name].processed == 2
+    assert stats[name].lag == stats[name].failed == 0
+
+
+def test_close_does_not_wait_for_dead_workers():
+    """Closing does not block on the full queue of a dead worker."""
+    gate = multiprocessing.Event()
+    consumer = ShardedConsumer(handler=partial(_wait, gate), workers=2,
+                               queue_size=1)
+    name = consumer.submit(_raw_event(1, 0))
+    consumer.submit(_raw_event(1, 1))
+    process, = [process for process in multiprocessing.active_children()
+                if process.name == name]
+    process.kill()
+    process.join()
+    with pytest.raises(RuntimeError):
+        consumer.drain()
+    consumer.close(timeout=10)
+    assert consumer.workers == []
@@ -0,0 +1,104 @@
+"""Tests for `jirax.shm`."""
+
+import json
+import multiprocessing
+from threading import Event, Thread
+
+import pytest
+
+from jirax.shm import RingFull, SharedMemoryRing
+from jirax.webhook import IssueUpdatedEvent, MalformedWebhookEvent
+
+from .test_changelog import ISSUE_UPDATED
+
+
+@pytest.fixture
+def ring():
+    """Create a small ring, unlinked after the test."""
+    ring = SharedMemoryRing(slots=2, slot_size=4096)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def _consume(ring, results):
+    while True:
+        body = ring.get_bytes(timeout=10)
+        if not body:
+            break
+        results.put(body)
+    ring.close()
+
+
+def test_consumers_share_the_bodies(ring):
+    """Each body written is taken by exactly one consumer process."""
+    results = multiprocessing.Queue()
+    consumers = [multiprocessing.Process(target=_consume,
+                                         args=(ring, results))
+                 for _ in range(3)]
+    for consumer in consumers:
+        consumer.start()
+    bodies = [str(i).encode() for i in range(100)]
+    for body in bodies + [b''] * len(consumers):
+        ring.put(body, timeout=10)
+    taken = [results.get(timeout=10) for _ in bodies]
+    for consumer in consumers:
+        consumer.join(10)
+        assert consumer.exitcode == 0
+    assert sorted(taken, key=int) == bodies
+
+
+def test_put_times_out_when_full(ring):
+    """put() raises RingFull once no slot is freed in time."""
+    ring.put(b'1')
+    ring.put(b'2')
+    with pytest.raises(RingFull):
+        ring.put(b'3', timeout=0.05)
+    assert ring.get_bytes() == b'1'
+    ring.put(b'3', timeout=0.05)
+    assert [ring.get_bytes(), ring.get_bytes()] == [b'2', b'3']
+    assert ring.get_bytes(timeout=0.01) is None
+    with pytest.raises(ValueError):
+        ring.put(bytes(4097))
+
+
+def test_slots_released_out_of_order(ring):
+    """A slot released early is not reused before the older ones."""
+    claimed, proceed = Event(), Event()
+    events = []
+
+    def slow_decoder(body):
+        claimed.set()
+        proceed.wait(10)
+        return json.loads(bytes(body))
+
+    ring.put(json.dumps(ISSUE_UPDATED).encode())
+    ring.put(b'second')
+    slow = Thread(target=lambda: events.append(
+            ring.get_event(decoder=slow_decoder)))
+    slow.start()
+    assert claimed.wait(10)
+    assert ring.get_bytes() == b'second'
+    put = Thread(target=ring.put, args=(b'third',))
+    put.start()
+    put.join(0.1)
+    assert put.is_alive()
+    proceed.set()
+    slow.join(10)
+    put.join(10)
+    assert not put.is_alive()
+    assert ring.get_bytes() == b'third'
+    assert isinstance(events[0], IssueUpdatedEvent)
+
+
+def test_get_event_releases_slot_of_invalid_body(ring):
+    """A body that fails to parse does not keep its slot."""
+    ring.put(b'not json')
+    ring.put(json.dumps(ISSUE_UPDATED).encode())
+    with pytest.raises(MalformedWebhookEvent):
+        ring.get_event()
+    ring.put(b'third', timeout=0.05)
+    event = ring.get_event()
+    assert isinstance(event, IssueUpdatedEvent)
+    assert event.issue.raw['id'] == '10001'
+    assert ring.get_bytes() == b'third'
@@ -0,0 +1,46 @@
+"""Tests for `jirax.sla`."""
+
+import asyncio
+
+from jirax.sla import SlaScheduler
+
+
+def test_late_transition_after_cancel_is_ignored():
+    """A transition older than a cancelling one does not re-arm."""
+    breaches = []
+    scheduler = SlaScheduler(targets={'Open': 100}, callback=breaches.append)
+    scheduler.transition('10001', 'Open', 0)
+    scheduler.transition('10001', 'Done', 50)
+    scheduler.transition('10001', 'Open', 10)
+    assert scheduler.deadline('10001') is None
+    assert scheduler.fire_due(now=1000) == []
+
+
+def test_last_transitions_are_bounded():
+    """Only the most recently transitioned issues are remembered."""
+    breaches = []
+    scheduler = SlaScheduler(targets={'Open': 100}, callback=breaches.append,
+                             max_issues=2)
+    scheduler.transition('10001', 'Done', 50)
+    scheduler.transition('10002', 'Done', 50)
+    scheduler.transition('10001', 'Done', 60)
+    scheduler.transition('10003', 'Done', 50)
+    scheduler.transition('10001', 'Open', 10)
+    scheduler.transition('10002', 'Open', 10)
+    assert scheduler.deadline('10001') is None
+    assert scheduler.deadline('10002') == 110
+
+
+def test_run_fires_deadlines():
+    """The run() task fires deadlines as they pass."""
+    breaches = []
+    scheduler = SlaScheduler(targets={'Open': 0}, callback=breaches.append)
+
+    async def main():
+        task = asyncio.ensure_future(scheduler.run())
+        scheduler.transition('10001', 'Open', 0)
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(main())
+    assert [breach.issue for breach in breaches] == ['10001']
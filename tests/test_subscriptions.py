@@ -0,0 +1,22 @@
+"""Tests for `jirax.subscriptions`."""
+
+import json
+
+from jirax.subscriptions import FieldSubscriptions
+from jirax.webhook import webhook_event_from_bytes
+
+from .test_changelog import ISSUE_UPDATED
+
+
+def test_dispatch_after_field_lookup():
+    """Handlers still match after a field change has been parsed."""
+    event = webhook_event_from_bytes(json.dumps(ISSUE_UPDATED).encode())
+    calls = []
+    subscriptions = FieldSubscriptions()
+    subscriptions.subscribe('status', lambda e: calls.append('any'))
+    subscriptions.subscribe('status', lambda e: calls.append('done'),
+                            old='Open', new='Done')
+    subscriptions.subscribe('assignee', lambda e: calls.append('assignee'))
+    event.change.fields['status']
+    assert subscriptions.dispatch(event) == 2
+    assert calls == ['any', 'done']
@@ -0,0 +1,35 @@
+"""Tests for `jirax.webhook`."""
+
+import copy
+
+import pytest
+
+from jirax.raw import InvalidRawFieldValue
+from jirax.webhook import (MalformedWebhookEvent, parse_webhook_events,
+                           webhook_event_from_bytes)
+
+from .test_changelog import ISSUE_UPDATED
+
+
+def test_batch_collects_invalid_field_values():
+    """Bad values that fail in field filters become per-item errors."""
+    bad_id = copy.deepcopy(ISSUE_UPDATED)
+    bad_id['changelog']['id'] = 'abc'
+    bad_timestamp = copy.deepcopy(ISSUE_UPDATED)
+    bad_timestamp['timestamp'] = 1e20
+    batch = parse_webhook_events([bad_id, ISSUE_UPDATED, bad_timestamp])
+    assert len(batch.events) == 1
+    assert [error.index for error in batch.errors] == [0, 2]
+    for error in batch.errors:
+        assert isinstance(error.exception, InvalidRawFieldValue)
+
+
+def test_malformed_memoryview_body_is_copied():
+    """The error keeps the body readable after its buffer is released."""
+    buffer = bytearray(b'GARBAGE')
+    view = memoryview(buffer)
+    with pytest.raises(MalformedWebhookEvent) as info:
+        webhook_event_from_bytes(view)
+    view.release()
+    buffer[:] = b'x'
+    assert info.value.raw == b'GARBAGE'
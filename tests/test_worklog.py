@@ -0,0 +1,27 @@
+"""Tests for `jirax.worklog`."""
+
+from jirax.worklog import WorklogLedger
+
+
+def _worklog(id, updated):
+    return {'id': id, 'issueId': '10001', 'author': {'accountId': 'u1'},
+            'started': '2020-01-01T10:00:00.000+0000',
+            'timeSpentSeconds': 60, 'updated': updated}
+
+
+def test_deleted_worklogs_are_bounded(tmp_path):
+    """Only the most recent deletions are remembered, also across saves."""
+    ledger = WorklogLedger(max_deleted=2)
+    for id in ('1', '2', '3'):
+        ledger.record(_worklog(id, '2020-01-01'))
+        ledger.delete(id)
+    assert ledger.issue_total('10001') == 0
+    ledger.record(_worklog('3', '2020-01-02'))
+    assert ledger.issue_total('10001') == 0
+    path = str(tmp_path / 'worklogs.json')
+    ledger.save(path)
+    ledger = WorklogLedger.load(path, max_deleted=2)
+    ledger.record(_worklog('2', '2020-01-02'))
+    assert ledger.issue_total('10001') == 0
+    ledger.record(_worklog('1', '2020-01-02'))
+    assert ledger.issue_total('10001') == 60